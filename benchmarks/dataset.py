@@ -0,0 +1,206 @@
+import hashlib
+import io
+import random
+import pandas as pd
+from types import SimpleNamespace
+from src.extract import build_queries
+
+
+# OLD DB module ids (extract's "modules" table)
+OLD_MODULES = {1: "assign", 5: "choice", 7: "feedback", 8: "folder", 9: "forum", 13: "label", 16: "page", 17: "quiz", 18: "resource", 21: "url",
+               27: "hvp", 29: "customcert", 30: "reengagement"}
+MODULE_IDS = {name: module_id for module_id, name in OLD_MODULES.items()}
+# modules cycled through the lesson sections
+LESSON_MODULES = ["page", "url", "resource", "label"]
+QTYPES = ["multichoice", "truefalse", "shortanswer", "essay", "match", "gapselect", "ddwtos"]
+LESSON_HTML = ('<p>Conteúdo da aula {number}.</p><p><a href="https://www.example.com/aula/{number}">Material complementar</a></p>'
+               '<p>{filler}</p>')
+
+
+def get_dataset_config(courses=10, sections=5, modules_per_section=4, quizzes=1, questions_per_quiz=10, qtype_mix=None, answers=4,
+                       file_size=64 * 1024, customcert_images=False, seed=42, start_id=100):
+    # qtype_mix: {qtype: weight}, "multichoice=6,truefalse=2,match=1" on the command line
+    return SimpleNamespace(
+        courses=courses,
+        sections=sections,
+        modules_per_section=modules_per_section,
+        quizzes=max(1, quizzes),
+        questions_per_quiz=questions_per_quiz,
+        qtype_mix=qtype_mix or {"multichoice": 6, "truefalse": 2, "shortanswer": 1, "essay": 1},
+        answers=answers,
+        file_size=file_size,
+        customcert_images=customcert_images,  # customcert images are OCR'd by downloading(), off unless asked for
+        seed=seed,
+        start_id=start_id,
+    )
+
+
+def get_qtype_mix(value):
+    if not value:
+        return None
+    mix = {}
+    for item in value.split(","):
+        qtype, _, weight = item.partition("=")
+        if qtype.strip() not in QTYPES:
+            raise ValueError(f"Unknown qtype '{qtype}' (one of {', '.join(QTYPES)}).")
+        mix[qtype.strip()] = float(weight or "1")
+    return mix
+
+
+def certificate_image(rng, text):
+    # small landscape PNG, the customcert "conteúdo programático" image
+    from PIL import Image, ImageDraw
+    image = Image.new("RGB", (1200, 850), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    for line in range(12):
+        draw.text((60 + 600 * (line % 2), 80 + 60 * (line // 2)), f"{text} {line + 1}: {rng.randint(1, 99)}h", fill=(0, 0, 0))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def generate_dataset(config):
+    # synthetic OLD DB extraction: the keys extract(conn, prefix, "old", ids) returns, with the columns the loader reads,
+    # plus the files the FTP stand-in serves ({contenthash: bytes}, contenthash = SHA-1 of the content like Moodle's file store)
+    rng = random.Random(config.seed)
+    rows = {table: [] for table in build_queries("mdl", "old")}
+    files = {}
+    next_ids = {}
+
+    def next_id(table):
+        next_ids[table] = next_ids.get(table, 1000) + 1
+        return next_ids[table]
+
+    def add_file(content):
+        contenthash = hashlib.sha1(content).hexdigest()
+        files[contenthash] = content
+        return contenthash
+
+    qtypes, weights = zip(*config.qtype_mix.items())
+    for course_id in range(config.start_id, config.start_id + config.courses):
+        shortname = f"SYN{course_id}"
+        fullname = f"Curso Sintético {course_id}"
+        context_id = next_id("context")
+        rows["course"].append(dict(id=course_id, category=3, sortorder=0, fullname=fullname, shortname=shortname, idnumber="", summary="<p>Resumo</p>",
+                                   summaryformat=1, format="topics", newsitems=0, startdate=0, enddate=0, visible=1, timecreated=0, timemodified=0,
+                                   enablecompletion=1, showcompletionconditions=1, originalcourseid=None))
+        rows["context_course"].append(dict(id=context_id, contextlevel=50, instanceid=course_id, path=f"/1/3/{context_id}", depth=3, locked=0))
+        for field_id in range(1, 9):
+            rows["customfield_data"].append(dict(id=next_id("customfield_data"), fieldid=field_id, instanceid=course_id, intvalue=None, decvalue=None,
+                                                 shortcharvalue=None, charvalue=None, value=str(rng.choice([8, 16, 20, 40])) if field_id == 8 else f"valor {field_id}",
+                                                 valueformat=0, valuetrust=0, timecreated=0, timemodified=0, contextid=context_id))
+        rows["enrol"].append(dict(id=next_id("enrol"), enrol="manual", status=0, courseid=course_id, sortorder=0, timecreated=0, timemodified=0))
+
+        def instance(table, **columns):
+            instance_id = next_id(table)
+            rows[table].append(dict(id=instance_id, course=course_id, **columns))
+            return instance_id
+
+        def course_module(module, instance_id, completion=0, completionview=0):
+            cm_id = next_id("course_modules")
+            rows["course_modules"].append(dict(id=cm_id, course=course_id, module=MODULE_IDS[module], instance=instance_id, section=0, added=0, score=0,
+                                               indent=0, visible=1, visibleold=1, groupmode=0, groupingid=0, completion=completion,
+                                               completiongradeitemnumber=None, completionview=completionview, completionexpected=0, availability=None,
+                                               showdescription=0))
+            return cm_id
+
+        def lesson_module(module, number):
+            if module == "page":
+                content = LESSON_HTML.format(number=number, filler=" ".join(rng.choice(["segurança", "norma", "procedimento", "risco", "controle"])
+                                                                             for _ in range(rng.randint(20, 120))))
+                return course_module("page", instance("page", name=f"Aula {number}", intro="", introformat=1, content=content, contentformat=1,
+                                                      display=5, displayoptions="", revision=1, timemodified=0), 2, 1)
+            if module == "url":
+                return course_module("url", instance("url", name=f"Link {number}", intro="", introformat=1, externalurl=f"https://www.example.com/{number}",
+                                                     display=0, displayoptions="", parameters="", timemodified=0))
+            if module == "resource":
+                resource_id = instance("resource", name=f"Apostila {number}", intro="", introformat=1, timemodified=0)
+                cm_id = course_module("resource", resource_id)
+                content = rng.randbytes(config.file_size)
+                rows["resource_content_hash_info"].append(dict(resource_context_id=next_id("context"), contenthash=add_file(content),
+                                                               filename=f"apostila_{number}.pdf", filesize=len(content), resource_id=resource_id, resource_name=f"Apostila {number}",
+                                                               course=fullname, course_id=course_id))
+                return cm_id
+            return course_module("label", instance("label", name=f"Rótulo {number}", intro="<p>Rótulo</p>", introformat=1, timemodified=0))
+
+        category_id = next_id("question_categories")
+        rows["question_categories"].append(dict(id=category_id, name="Padrão", contextid=context_id, info="", infoformat=0, stamp=f"synthetic+{category_id}",
+                                                parent=0, sortorder=999, idnumber=None))
+
+        def quiz(name):
+            quiz_id = instance("quiz", name=name, intro="", introformat=1, timelimit=3600, attempts=2, sumgrades=config.questions_per_quiz,
+                               grade=10, timecreated=0, timemodified=0, completionpass=1)
+            rows["quiz_sections"].append(dict(id=next_id("quiz_sections"), quizid=quiz_id, firstslot=1, heading="", shufflequestions=0))
+            for slot in range(1, config.questions_per_quiz + 1):
+                add_question(quiz_id, slot, rng.choices(qtypes, weights)[0])
+            return course_module("quiz", quiz_id, 2, 1)
+
+        def add_question(quiz_id, slot, qtype):
+            question_id = next_id("question")
+            rows["question"].append(dict(id=question_id, category=category_id, parent=0, name=f"Questão {question_id}", questiontext=f"<p>Enunciado {question_id}</p>",
+                                         questiontextformat=1, generalfeedback="", generalfeedbackformat=1, defaultmark=1.0, penalty=0.3333333, qtype=qtype,
+                                         length=1, stamp=f"synthetic+{question_id}", timecreated=0, timemodified=0,
+                                         createdby=2, modifiedby=2, version=f"synthetic+{question_id}", hidden=0, idnumber=None))
+            rows["quiz_slots"].append(dict(id=next_id("quiz_slots"), slot=slot, quizid=quiz_id, page=slot, requireprevious=0, maxmark=1.0, questionid=question_id,
+                                           questioncategoryid=None, includingsubcategories=None))
+            answers = {"multichoice": config.answers, "truefalse": 2, "shortanswer": 2, "essay": 0, "match": 0, "gapselect": 3, "ddwtos": 3}[qtype]
+            answer_ids = []
+            for number in range(answers):
+                answer_ids.append(next_id("question_answers"))
+                rows["question_answers"].append(dict(id=answer_ids[-1], question=question_id, answer=f"Alternativa {number + 1}", answerformat=1,
+                                                     fraction=1.0 if number == 0 else 0.0, feedback="", feedbackformat=1))
+            if qtype == "multichoice":
+                rows["qtype_multichoice_options"].append(dict(id=next_id("qtype_multichoice_options"), questionid=question_id, layout=0, single=1,
+                                                              shuffleanswers=1, answernumbering="abc"))
+            elif qtype == "truefalse":
+                rows["question_truefalse"].append(dict(id=next_id("question_truefalse"), question=question_id, trueanswer=answer_ids[0],
+                                                       falseanswer=answer_ids[1], showstandardinstruction=0))
+            elif qtype == "shortanswer":
+                rows["qtype_shortanswer_options"].append(dict(id=next_id("qtype_shortanswer_options"), questionid=question_id, usecase=0))
+            elif qtype == "essay":
+                rows["qtype_essay_options"].append(dict(id=next_id("qtype_essay_options"), questionid=question_id, responseformat="editor", responsefieldlines=15))
+            elif qtype == "match":
+                rows["qtype_match_options"].append(dict(id=next_id("qtype_match_options"), questionid=question_id, shuffleanswers=1))
+                for number in range(3):
+                    rows["qtype_match_subquestions"].append(dict(id=next_id("qtype_match_subquestions"), questionid=question_id,
+                                                                 questiontext=f"<p>Item {number + 1}</p>", answertext=f"Par {number + 1}"))
+            else:
+                rows[f"question_{qtype}"].append(dict(id=next_id(f"question_{qtype}"), questionid=question_id, shuffleanswers=1))
+
+        # sections: about, content, the lessons (their modules + the intermediate quizzes), final assessments, certificate
+        sequences = [("Sobre o curso", [lesson_module("label", 0)]), ("Conteúdo", [])]
+        for lesson in range(1, config.sections + 1):
+            sequence = [lesson_module(LESSON_MODULES[(lesson + number) % len(LESSON_MODULES)], lesson * 100 + number) for number in range(config.modules_per_section)]
+            if lesson <= config.quizzes - 1:
+                sequence.append(quiz(f"Avaliação intermediária {lesson}"))
+            sequences.append((f"Aula {lesson}", sequence))
+
+        choice_id = instance("choice", name="Enquete", intro="", introformat=1, timemodified=0)
+        for number in range(3):
+            rows["choice_options"].append(dict(id=next_id("choice_options"), choiceid=choice_id, text=f"Opção {number + 1}", maxanswers=0, timemodified=0))
+        sequences.append(("Avaliações Finais", [quiz("Avaliação Final"), course_module("choice", choice_id), course_module("feedback", next_id("feedback"))]))
+
+        customcert_id = next_id("customcert")
+        certificate = [course_module("customcert", customcert_id),
+                       course_module("forum", instance("forum", type="news", name="Avisos", intro="", introformat=1, timemodified=0)),
+                       course_module("reengagement", instance("reengagement", name="Alerta de continuação do curso", timecreated=0, timemodified=0,
+                                                              duration=604800, suppresstarget=0))]
+        sequences.append(("Certificado", certificate))
+        if config.customcert_images:
+            rows["customcert_image_hash_info"].append(dict(context_id=next_id("context"), file_id=next_id("files"), element_id=next_id("customcert_elements"),
+                                                           filename="conteudo.png", contenthash=add_file(certificate_image(rng, fullname)),
+                                                           page_id=next_id("customcert_pages"), mimetype="image/png", course_id=course_id, fullname=fullname))
+
+        for number, (name, sequence) in enumerate(sequences):
+            section_id = next_id("course_sections")
+            rows["course_sections"].append(dict(id=section_id, course=course_id, section=number, name=name, summary="{course_field_carga_horaria}",
+                                                summaryformat=1, sequence=",".join(str(cm_id) for cm_id in sequence), visible=1, availability=None, timemodified=0))
+            if number < 2:
+                rows["course_format_options"].append(dict(id=next_id("course_format_options"), courseid=course_id, format="topics", sectionid=section_id,
+                                                          name="hiddensections", value="0"))
+        rows["course_format_options"].append(dict(id=next_id("course_format_options"), courseid=course_id, format="topics", sectionid=0,
+                                                  name="coursedisplay", value="0"))
+
+    dataframes = {table: pd.DataFrame(table_rows) for table, table_rows in rows.items()}
+    dataframes["modules"] = pd.DataFrame({"id": list(OLD_MODULES), "name": list(OLD_MODULES.values()), "visible": 1})
+    return dataframes, files
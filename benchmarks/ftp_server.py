@@ -0,0 +1,127 @@
+import os
+import posixpath
+import socket
+import threading
+from types import SimpleNamespace
+
+
+# the few FTP commands ftplib's login / cwd / retrbinary / voidcmd send, served from a local directory (read-only, passive mode only)
+def start_ftp_server(root, user="benchmark", password="benchmark", host="127.0.0.1"):
+    listener = socket.create_server((host, 0))
+    server = SimpleNamespace(root=os.path.abspath(root), user=user, password=password, host=host, port=listener.getsockname()[1],
+                             listener=listener, lock=threading.Lock(), stats={"connections": 0, "commands": 0, "files": 0, "bytes": 0})
+    threading.Thread(target=accept_loop, args=(server,), daemon=True).start()
+    return server
+
+
+def stop_ftp_server(server):
+    server.listener.close()
+
+
+def accept_loop(server):
+    while True:
+        try:
+            client, _ = server.listener.accept()
+        except OSError:
+            return
+        with server.lock:
+            server.stats["connections"] += 1
+        threading.Thread(target=handle_client, args=(server, client), daemon=True).start()
+
+
+def local_path(server, cwd, path):
+    # FTP path (absolute or relative to cwd) -> file under the server root, never outside of it
+    virtual = posixpath.normpath(posixpath.join(cwd, path or "."))
+    return virtual, os.path.join(server.root, *[part for part in virtual.split("/") if part and part != ".."])
+
+
+def handle_client(server, client):
+    # replies go out as soon as they are written (Nagle would hold "226" back until the client's delayed ACK, ~40 ms per file)
+    client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    reader = client.makefile("rb")
+
+    def reply(line):
+        client.sendall(f"{line}\r\n".encode("utf-8"))
+
+    cwd, passive, logged_in, user = "/", None, False, None
+    reply("220 benchmark FTP stand-in ready")
+    try:
+        for raw in reader:
+            command, _, argument = raw.decode("utf-8").strip().partition(" ")
+            command = command.upper()
+            with server.lock:
+                server.stats["commands"] += 1
+            if command == "USER":
+                user = argument
+                reply("331 password required")
+            elif command == "PASS":
+                logged_in = user == server.user and argument == server.password
+                reply("230 logged in" if logged_in else "530 login incorrect")
+            elif command == "QUIT":
+                reply("221 bye")
+                break
+            elif not logged_in:
+                reply("530 not logged in")
+            elif command in ("NOOP", "TYPE", "MODE", "STRU"):
+                reply("200 ok")
+            elif command == "SYST":
+                reply("215 UNIX Type: L8")
+            elif command == "PWD":
+                reply(f'257 "{cwd}"')
+            elif command == "CWD":
+                virtual, path = local_path(server, cwd, argument)
+                if os.path.isdir(path):
+                    cwd = virtual
+                    reply("250 directory changed")
+                else:
+                    reply("550 no such directory")
+            elif command == "SIZE":
+                _, path = local_path(server, cwd, argument)
+                reply(f"213 {os.path.getsize(path)}" if os.path.isfile(path) else "550 no such file")
+            elif command in ("PASV", "EPSV"):
+                if passive is not None:
+                    passive.close()
+                passive = socket.create_server((server.host, 0))
+                port = passive.getsockname()[1]
+                if command == "EPSV":
+                    reply(f"229 entering extended passive mode (|||{port}|)")
+                else:
+                    reply(f"227 entering passive mode ({server.host.replace('.', ',')},{port >> 8},{port & 255})")
+            elif command == "RETR":
+                _, path = local_path(server, cwd, argument)
+                if passive is None:
+                    reply("425 use PASV first")
+                elif not os.path.isfile(path):
+                    reply("550 no such file")
+                else:
+                    reply("150 opening binary mode data connection")
+                    data, _ = passive.accept()
+                    with data, open(path, "rb") as f:
+                        sent = 0
+                        while chunk := f.read(64 * 1024):
+                            data.sendall(chunk)
+                            sent += len(chunk)
+                    passive.close()
+                    passive = None
+                    with server.lock:
+                        server.stats["files"] += 1
+                        server.stats["bytes"] += sent
+                    reply("226 transfer complete")
+            else:
+                reply(f"502 {command} not implemented")
+    except (OSError, UnicodeDecodeError):
+        pass
+    finally:
+        if passive is not None:
+            passive.close()
+        reader.close()
+        client.close()
+
+
+def publish_files(root, base_dir, files):
+    # Moodle file store layout under FTP_BASE_DIR: <base>/<hash[:2]>/<hash[2:4]>/<hash>
+    for contenthash, content in files.items():
+        directory = os.path.join(root, base_dir.strip("/"), contenthash[:2], contenthash[2:4])
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, contenthash), "wb") as f:
+            f.write(content)
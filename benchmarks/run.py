@@ -0,0 +1,181 @@
+# End-to-end benchmark on a synthetic dataset (no OLD/NEW DB, no FTP server needed):
+#   python -m benchmarks.run --courses 50 --questions-per-quiz 20 --repeat 3
+#   python -m benchmarks.run --courses 50 --compare benchmarks/results/benchmark_20250101-120000.json
+# times optimize_dtypes + transform, the catalog, downloading (local FTP stand-in), if_table_course (SQLite stand-in of the NEW DB,
+# per phase) and the Excel export, and saves the results as JSON; --compare exits with 1 when a stage got slower than --tolerance
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+import pandas as pd
+import sqlalchemy
+from benchmarks.dataset import get_dataset_config, get_qtype_mix, generate_dataset
+from benchmarks.ftp_server import start_ftp_server, stop_ftp_server, publish_files
+from src.optimize import optimize_dtypes
+from src.transform import transform
+from src.catalog import build_catalog
+from src.reference import load_reference_data, reference_dataframes
+from src.simulate import create_simulation_engine, simulation_report, table_counts
+from src.load import if_table_course, downloading, load, get_target_lookups
+from src.ftp_pool import close_ftp_pool
+from src.logging import start
+
+
+logger = start()
+
+TARGET_DB = SimpleNamespace(prefix="mdl", host="simulation", port=0, name="benchmark")
+CATEGORY = 1
+CC_TEMPLATE = ["galaxia_navegacao"]
+LANGUAGE = "ptbr"
+FTP_BASE_DIR = "/filedir"
+STAGES = ["optimize_dtypes", "transform", "reference", "catalog", "downloading", "load", "excel_export"]
+
+
+def skip_loading(*args, **kwargs):
+    # load() course_loader that writes nothing: what is left of load() is the Excel export
+    return None
+
+
+def run_once(config, dataframes, workdir, ftp):
+    timings = {}
+
+    def timed(stage, function, *args, **kwargs):
+        start_time = time.perf_counter()
+        result = function(*args, **kwargs)
+        timings[stage] = time.perf_counter() - start_time
+        return result
+
+    ids = list(range(config.start_id, config.start_id + config.courses))
+    frames = {table: df.copy() for table, df in dataframes.items()}
+    frames = timed("optimize_dtypes", optimize_dtypes, frames)
+    frames = timed("transform", transform, frames)
+
+    engine = create_simulation_engine(os.path.join(workdir, "target.sqlite"), TARGET_DB.prefix)
+    with engine.connect() as conn:
+        reference = timed("reference", load_reference_data, conn, TARGET_DB, None)
+    frames.update(reference_dataframes(reference))
+    catalog = timed("catalog", build_catalog, frames)
+
+    downloads_before = dict(ftp.stats)
+    image_texts = timed("downloading", downloading, frames, ids, catalog)
+    downloads = {key: ftp.stats[key] - downloads_before[key] for key in ftp.stats}
+
+    engine.simulation["phases"].clear()
+    with engine.begin() as conn:
+        lookups = get_target_lookups(conn, TARGET_DB, CATEGORY, reference)
+        timed("load", if_table_course, conn, image_texts, "course", ids, frames, new_db=TARGET_DB, category=CATEGORY,
+              cc_template_to_use=CC_TEMPLATE, course_language=LANGUAGE, catalog=catalog, lookups=lookups)
+    phases = simulation_report(engine)
+    rows = table_counts(engine, TARGET_DB.prefix)
+    engine.dispose()
+
+    timed("excel_export", load, frames, None, TARGET_DB, ids, image_texts, CATEGORY, CC_TEMPLATE, LANGUAGE, catalog,
+          course_loader=skip_loading, reference=reference)
+    return SimpleNamespace(timings=timings, phases=phases, downloads=downloads, rows=rows)
+
+
+def run_benchmark(config, repeat):
+    generation_start = time.perf_counter()
+    dataframes, files = generate_dataset(config)
+    generation = time.perf_counter() - generation_start
+    logger.info(f"Benchmark dataset: {config.courses} course(s), {sum(len(df) for df in dataframes.values())} row(s), {len(files)} file(s), "
+                f"generated in {generation:.2f}s.")
+
+    cwd = os.getcwd()
+    runs = []
+    with tempfile.TemporaryDirectory(prefix="etl_benchmark_") as workdir:
+        ftp_root = os.path.join(workdir, "ftp")
+        publish_files(ftp_root, FTP_BASE_DIR, files)
+        ftp = start_ftp_server(ftp_root)
+        os.environ.update({"FTP_HOST": ftp.host, "FTP_PORT": str(ftp.port), "FTP_USER": ftp.user, "FTP_PASSWORD": ftp.password,
+                           "FTP_BASE_DIR": FTP_BASE_DIR})
+        try:
+            for number in range(repeat):
+                # every repetition in its own directory: downloading() skips the files that are already on disk
+                run_dir = os.path.join(workdir, f"run_{number + 1}")
+                os.makedirs(run_dir)
+                os.chdir(run_dir)
+                runs.append(run_once(config, dataframes, run_dir, ftp))
+                logger.info(f"Benchmark run {number + 1}/{repeat}: " + ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in runs[-1].timings.items()))
+        finally:
+            os.chdir(cwd)
+            close_ftp_pool()
+            stop_ftp_server(ftp)
+
+    stages = {}
+    for stage in STAGES:
+        samples = [run.timings[stage] for run in runs]
+        stages[stage] = {"runs": [round(sample, 4) for sample in samples], "min": round(min(samples), 4), "median": round(statistics.median(samples), 4)}
+    last = runs[-1]
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "config": vars(config),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "pandas": pd.__version__,
+                        "sqlalchemy": sqlalchemy.__version__},
+        "dataset": {"generation_seconds": round(generation, 4), "rows": {table: len(df) for table, df in dataframes.items() if not df.empty},
+                    "files": len(files), "file_bytes": sum(len(content) for content in files.values())},
+        "stages": stages,
+        "courses_per_second": round(config.courses / stages["load"]["median"], 2) if stages["load"]["median"] else None,
+        "load_phases": last.phases,
+        "downloads": last.downloads,
+        "target_rows": {table: count for table, count in last.rows.items() if count},
+    }
+
+
+def compare_results(current, baseline, tolerance):
+    # stages whose median got more than `tolerance` (0.10 = 10%) slower than the baseline's
+    regressions = []
+    for stage, entry in current["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if not before or not before["median"]:
+            continue
+        ratio = entry["median"] / before["median"]
+        print(f"{stage:>16}: {before['median']:.4f}s -> {entry['median']:.4f}s ({ratio - 1:+.1%})")
+        if ratio > 1 + tolerance:
+            regressions.append(stage)
+    if current["config"] != baseline.get("config"):
+        print("Warning: the baseline was run with another dataset configuration.")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Times the ETL stages on a synthetic dataset.")
+    parser.add_argument("--courses", type=int, default=10)
+    parser.add_argument("--sections", type=int, default=5, help="lesson sections per course")
+    parser.add_argument("--modules-per-section", type=int, default=4)
+    parser.add_argument("--quizzes", type=int, default=1, help="quizzes per course (the final one included)")
+    parser.add_argument("--questions-per-quiz", type=int, default=10)
+    parser.add_argument("--qtype-mix", help="qtype weights, e.g. multichoice=6,truefalse=2,match=1,essay=1")
+    parser.add_argument("--file-size", type=int, default=64 * 1024, help="bytes per resource file served by the FTP stand-in")
+    parser.add_argument("--customcert-images", action="store_true", help="also download (and OCR) a customcert image per course")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", f"benchmark_{datetime.now():%Y%m%d-%H%M%S}.json"))
+    parser.add_argument("--compare", help="earlier result file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="slowdown allowed by --compare (0.10 = 10%%)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    config = get_dataset_config(args.courses, args.sections, args.modules_per_section, args.quizzes, args.questions_per_quiz,
+                                get_qtype_mix(args.qtype_mix), file_size=args.file_size, customcert_images=args.customcert_images, seed=args.seed)
+    output = os.path.abspath(args.output)
+    result = run_benchmark(config, max(1, args.repeat))
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    for stage, entry in result["stages"].items():
+        print(f"{stage:>16}: median {entry['median']:.4f}s, min {entry['min']:.4f}s")
+    print(f"Results saved: {output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare_results(result, json.load(f), args.tolerance)
+        if regressions:
+            print(f"Regression: {', '.join(regressions)} slower than {args.tolerance:.0%} over the baseline.")
+            raise SystemExit(1)
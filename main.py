@@ -1,9 +1,22 @@
+import argparse
 from dotenv import load_dotenv
+from functools import partial
 import os
+import time
 from sqlalchemy import create_engine
-from src.extract import extract, extract_old_course_ids_from_csv
+from src.extract import extract, extract_parallel, extract_old_course_ids_from_csv
+from src.incremental import extract_incremental
+from src.optimize import optimize_dtypes
 from src.transform import transform
-from src.load import load, downloading
+from src.load import load, downloading, load_parallel, load_committing, if_table_course
+from src.planner import load_batch
+from src.catalog import build_catalog
+from src.reference import load_reference_data, reference_dataframes
+from src.journal import open_journal, finished_courses, mark_committed, discard_loaded, close_journal
+from src.simulate import create_simulation_engine, save_simulation_report
+from src.metrics import start_run, record, save_run_report
+from src.profiler import attach_profiler, save_profile_report
+from src.ftp_pool import close_ftp_pool
 from src.logging import start
 from urllib.parse import quote_plus
 from types import SimpleNamespace
@@ -23,8 +36,57 @@ def get_env_variable(db_nickname):
         prefix=os.getenv(f"{db_nickname}_DB_PREFIX")
     )
 
+def get_memory_limits(value):
+    # "1024" applies to every table, "question=256,question_answers=512,default=1024" sets per-table ceilings
+    if not value:
+        return None
+    if "=" not in value:
+        return int(value)
+    limits = {}
+    for item in value.split(","):
+        table, mb = item.split("=")
+        limits[table.strip()] = int(mb)
+    return limits
+
+def get_cache_options(db):
+    # EXTRACT_CACHE_MAX_AGE (seconds) turns the snapshot cache on: tables extracted less than that long ago are read from disk
+    max_age = os.getenv("EXTRACT_CACHE_MAX_AGE")
+    if not max_age:
+        return None
+    return SimpleNamespace(
+        dir=os.getenv("EXTRACT_CACHE_DIR", "src/cache"),
+        db_name=f"{db.host}:{db.port}/{db.name}",
+        db_prefix=db.prefix,
+        max_age=int(max_age),
+        max_bytes=int(os.getenv("EXTRACT_CACHE_MAX_MB", "2048")) * 1024 * 1024,
+        # uncompressed files are memory-mapped without a copy; "zstd" (or "lz4") trades that for a smaller cache on disk
+        compression=os.getenv("EXTRACT_CACHE_COMPRESSION", "uncompressed")
+    )
+
+def get_snapshot_options(db):
+    # EXTRACT_INCREMENTAL=1 keeps a local snapshot of the OLD DB and only fetches rows changed since the last run
+    if os.getenv("EXTRACT_INCREMENTAL", "0") != "1":
+        return None
+    return SimpleNamespace(
+        dir=os.getenv("EXTRACT_SNAPSHOT_DIR", "src/snapshot"),
+        db_name=f"{db.host}:{db.port}/{db.name}",
+        db_prefix=db.prefix,
+        compression=os.getenv("EXTRACT_CACHE_COMPRESSION", "uncompressed")
+    )
+
+def get_commit_policy(value):
+    # "run" (one transaction for the whole load), "course", "courses:N" or "rows:N"
+    mode, _, every = (value or "run").partition(":")
+    if mode == "course":
+        mode, every = "courses", "1"
+    if mode not in ("run", "courses", "rows"):
+        raise ValueError(f"Unknown LOAD_COMMIT policy '{value}'.")
+    return SimpleNamespace(mode=mode, every=max(1, int(every or "1")))
+
 old_db = get_env_variable("OLD")
 new_db = get_env_variable("NEW")
+old_cache = get_cache_options(old_db)
+old_snapshot = get_snapshot_options(old_db)
 
 # Connection pool configuration to ensure stability and prevent idle disconnects
 engine_options = {
@@ -34,6 +96,33 @@ engine_options = {
     "max_overflow": 10       # Additional temporary connections allowed during high demand
 }
 
+# Extraction workers (each one borrows its own pooled connection, so keep it <= pool_size + max_overflow)
+# - EXTRACT_WORKERS=1 runs the queries one at a time on a single connection
+# - EXTRACT_LOCK_TABLES=1 briefly holds FLUSH TABLES WITH READ LOCK so every worker snapshot is the same point in time
+extract_workers = int(os.getenv("EXTRACT_WORKERS", "5"))
+extract_lock_tables = os.getenv("EXTRACT_LOCK_TABLES", "0") == "1"
+# Streaming extraction: EXTRACT_CHUNKSIZE reads tables through a server-side cursor in chunks of N rows,
+# EXTRACT_MEMORY_LIMIT_MB is the per-table in-memory ceiling before chunks are spilled to disk
+extract_chunksize = int(os.getenv("EXTRACT_CHUNKSIZE", "0")) or None
+extract_memory_limits = get_memory_limits(os.getenv("EXTRACT_MEMORY_LIMIT_MB"))
+# LOAD_MODE=batch writes every table once for all the courses (table at a time) instead of course by course
+load_mode = os.getenv("LOAD_MODE", "course")
+# LOAD_WORKERS > 1 loads courses in parallel, one pooled connection + one transaction per course each (keep it < pool_size + max_overflow)
+load_workers = int(os.getenv("LOAD_WORKERS", "1"))
+# LOAD_COMMIT=run|course|courses:N|rows:N commits the NEW DB writes every course, every N courses or once N rows were written
+# (default "run": one transaction for the whole load); every commit is recorded in the run journal
+load_commit = get_commit_policy(os.getenv("LOAD_COMMIT", "run"))
+# Run journal (SQLite): every course committed to the NEW DB is recorded there with its old -> new id mappings
+# (with LOAD_SIMULATE, <simulation db>_journal.sqlite instead)
+run_journal_path = os.getenv("RUN_JOURNAL", "src/run/journal.sqlite")
+# NEW DB reference data kept on disk between runs (REFERENCE_CACHE_DIR= empty reads it from the DB every run)
+reference_cache_dir = os.getenv("REFERENCE_CACHE_DIR", "src/cache/reference")
+# LOAD_SIMULATE=<sqlite path> loads into a local SQLite stand-in of the NEW DB (src/simulation schema + reference rows) instead of MySQL
+# and writes a report of statements, rows and time per phase next to it
+load_simulate = os.getenv("LOAD_SIMULATE")
+# SQL_PROFILE=1 times every statement of both engines per template and per course (src/logs/sql_profile.json: p95, slowest, N+1 patterns)
+sql_profile = os.getenv("SQL_PROFILE", "0") == "1"
+
 # Create engines with connection stability settings
 old_engine = create_engine(
     f"mysql+pymysql://{old_db.user}:{old_db.password}@{old_db.host}:{old_db.port}/{old_db.name}?charset=utf8mb4",
@@ -41,10 +130,32 @@ old_engine = create_engine(
 )
 new_engine = create_engine(
     f"mysql+pymysql://{new_db.user}:{new_db.password}@{new_db.host}:{new_db.port}/{new_db.name}?charset=utf8mb4",
+    connect_args={"local_infile": True},  # LOAD DATA LOCAL INFILE fast path for large tables (LOAD_INFILE_MIN_ROWS)
     **engine_options
 )
+if load_simulate:
+    new_engine = create_simulation_engine(load_simulate, new_db.prefix or "mdl")
+    new_db.prefix = new_db.prefix or "mdl"
+    reference_cache_dir = None
+    # the stand-in starts empty every run, so does its own journal next to it: RUN_JOURNAL (what --resume trusts) is never touched
+    run_journal_path = ":memory:" if load_simulate == ":memory:" else f"{os.path.splitext(load_simulate)[0]}_journal.sqlite"
+    for suffix in ("", "-wal", "-shm"):
+        if run_journal_path != ":memory:" and os.path.exists(f"{run_journal_path}{suffix}"):
+            os.remove(f"{run_journal_path}{suffix}")
+if sql_profile:
+    attach_profiler(old_engine, "old")
+    attach_profiler(new_engine, "new")
 
-def main():
+def parse_args():
+    parser = argparse.ArgumentParser(description="Copies the courses listed in src/utils/teste_3.csv from the OLD to the NEW Moodle DB.")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip the courses the run journal already has as committed and reuse the files (and OCR texts) earlier runs downloaded")
+    parser.add_argument("--journal", default=run_journal_path, help=f"run journal path (default: {run_journal_path}, env RUN_JOURNAL)")
+    return parser.parse_args()
+
+def main(resume=False, journal_path=run_journal_path):
+    journal = open_journal(journal_path, resume)
+    status = "failed"
     try:
         logger.debug("------------------------------------------ NEW ETL RUN ------------------------------------------")
         logger.debug("ETL process started...")
@@ -52,6 +163,8 @@ def main():
         # close any previous connection pool to start clean
         old_engine.dispose()
         new_engine.dispose()
+        if load_simulate:
+            logger.info(f"Simulation: the NEW DB writes go to {load_simulate}, nothing is written to {new_db.host}.")
 
         # Use connection context managers
         # - old_engine.connect(): read-only, better for performance (no locking/transactions)
@@ -66,23 +179,66 @@ def main():
         """
         csv = 'src/utils/teste_3.csv'
         id_list = extract_old_course_ids_from_csv(csv)
+        if resume:
+            finished = finished_courses(journal)
+            skipped = [course_id for course_id in id_list if course_id in finished]
+            id_list = [course_id for course_id in id_list if course_id not in finished]
+            logger.info(f"Resuming: {len(skipped)} course(s) already committed by an earlier run are skipped, {len(id_list)} left.")
+            if not id_list:
+                logger.info("ETL process completed successfully! Nothing left to load.")
+                status = "completed"
+                return
+        # per stage / table / course metrics, written as JSON next to src/logs/etl.log (with the ETA while courses load)
+        start_run(len(id_list))
+
+        stage_start = time.perf_counter()
+        incremental_dataframes = {}
+        if old_snapshot is not None:
+            with old_engine.connect() as old_conn:
+                incremental_dataframes = extract_incremental(old_conn, old_db.prefix, id_list, old_snapshot)
+
+        if extract_workers > 1:
+            old_dataframes = extract_parallel(old_engine, old_db.prefix, "old", id_list, extract_workers, extract_lock_tables,
+                                              extract_chunksize, extract_memory_limits, old_cache, exclude=incremental_dataframes)
+        else:
+            with old_engine.connect() as old_conn:
+                old_dataframes = extract(old_conn, old_db.prefix, "old", id_list, extract_chunksize, extract_memory_limits, old_cache,
+                                         exclude=incremental_dataframes)
 
-        with old_engine.connect() as old_conn:
-            old_dataframes = extract(old_conn, old_db.prefix, "old")
-        
-        with new_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as new_conn:
-            new_dataframes = extract(new_conn, new_db.prefix, "new")
+        # NEW DB reference data (modules, category contexts, customcert/feedback templates...): a few batched queries, or the
+        # copy on disk while its checksum still matches
+        with new_engine.connect() as new_conn:
+            reference = load_reference_data(new_conn, new_db, reference_cache_dir)
+        new_dataframes = reference_dataframes(reference)
 
-        dataframes = {**old_dataframes, **new_dataframes}
+        dataframes = {**incremental_dataframes, **old_dataframes, **new_dataframes}
+        record("run", "extract", time.perf_counter() - stage_start, rows_out=sum(len(df) for df in dataframes.values()))
 
+        stage_start = time.perf_counter()
+        dataframes = optimize_dtypes(dataframes)
         dataframes = transform(dataframes)
+        catalog = build_catalog(dataframes)
+        record("run", "transform", time.perf_counter() - stage_start, rows_out=sum(len(df) for df in dataframes.values()))
         """
         image_texts_1 = downloading(dataframes, id_list_1)
         image_texts_2 = downloading(dataframes, id_list_2)
         image_texts = {**image_texts_1, **image_texts_2}
         """
-        image_texts = downloading(dataframes, id_list)
-        with new_engine.begin() as write_conn:
+        stage_start = time.perf_counter()
+        image_texts = downloading(dataframes, id_list, catalog, journal)
+        record("run", "download", time.perf_counter() - stage_start, rows_in=len(id_list))
+        stage_start = time.perf_counter()
+        # load_parallel and load_committing commit on connections of their own (and journal every commit): `write_conn` only reads
+        # the lookups then, one transaction around them would only hold a pooled connection open for the whole load
+        course_loader = load_batch if load_mode == "batch" else if_table_course
+        commits_itself = load_commit.mode != "run" or (load_mode != "batch" and load_workers > 1)
+        if load_mode != "batch" and load_workers > 1:
+            if load_commit.mode != "run":
+                logger.warning(f"LOAD_WORKERS={load_workers} commits course by course, LOAD_COMMIT is ignored.")
+            course_loader = partial(load_parallel, max_workers=load_workers)
+        elif load_commit.mode != "run":
+            course_loader = partial(load_committing, policy=load_commit, course_loader=course_loader)
+        with (new_engine.connect() if commits_itself else new_engine.begin()) as write_conn:
             """
                 categories by int id (NEW DB CATEGORY ID):
                     1 = 'QSMS'
@@ -109,15 +265,30 @@ def main():
                     'en'
                     'ptbr'
             """
-            load(dataframes, write_conn, new_db, id_list, image_texts, 1, ["galaxia_navegacao"], "ptbr")
+            load(dataframes, write_conn, new_db, id_list, image_texts, 1, ["galaxia_navegacao"], "ptbr", catalog, course_loader=course_loader,
+                 journal=journal, reference=reference)
+        if not commits_itself:
+            # the write transaction committed: so did every course it loaded
+            mark_committed(journal)
+        record("run", "load", time.perf_counter() - stage_start, rows_in=len(id_list))
+        if load_simulate:
+            save_simulation_report(new_engine, new_db.prefix, f"{os.path.splitext(load_simulate)[0]}_report.json")
+        status = "completed"
         logger.info("ETL process completed successfully!")
     except Exception as e:
+        discard_loaded(journal)
         logger.critical(f"ETL process failed: {e}.")
     finally:
+        close_ftp_pool()
+        save_run_report()
+        if sql_profile:
+            save_profile_report()
+        close_journal(journal, status)
         # close any previous connection pool to start clean
         old_engine.dispose()
         new_engine.dispose()
         logger.debug("Disposed all database connections after ETL run.")
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    main(args.resume, args.journal)
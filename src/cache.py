@@ -0,0 +1,159 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import pyarrow.feather as feather
+from dotenv import load_dotenv
+from src.logging import start
+
+
+logger = start()
+index_lock = threading.Lock()
+
+
+def cache_key(db_name, db_prefix, query):
+    # same DB + prefix + query text = same snapshot entry
+    normalized_query = " ".join(query.split())
+    return hashlib.sha1(f"{db_name}|{db_prefix}|{normalized_query}".encode("utf-8")).hexdigest()
+
+
+def cache_path(cache_dir, key):
+    return os.path.join(cache_dir, f"{key}.feather")
+
+
+def read_frame(path):
+    # memory-mapped read: uncompressed files are mapped straight from the page cache
+    return feather.read_table(path, memory_map=True).to_pandas()
+
+
+def write_frame(path, df, compression="uncompressed"):
+    # write to a temp file first so a crash never leaves a half-written frame behind
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        feather.write_feather(df.reset_index(drop=True), temp_path, compression=compression)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def read_index(cache_dir):
+    index_path = os.path.join(cache_dir, "index.json")
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_index(cache_dir, index):
+    os.makedirs(cache_dir, exist_ok=True)
+    index_path = os.path.join(cache_dir, "index.json")
+    temp_path = f"{index_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    os.replace(temp_path, index_path)
+
+
+def read_cached(cache, table, query):
+    key = cache_key(cache.db_name, cache.db_prefix, query)
+    path = cache_path(cache.dir, key)
+    with index_lock:
+        entry = read_index(cache.dir).get(key)
+    if entry is None or not os.path.exists(path):
+        return None
+    age = time.time() - entry["created"]
+    if cache.max_age is not None and age > cache.max_age:
+        logger.debug(f"Cached {table.upper()} is {age:.0f}s old (freshness window {cache.max_age}s), ignoring it.")
+        return None
+    try:
+        df = read_frame(path)
+        os.utime(path)  # mtime marks the last use for the eviction order
+        logger.info(f"Loaded {len(df)} rows of {table.upper()} from cache ({age:.0f}s old).")
+        return df
+    except Exception as e:
+        logger.warning(f"Could not read cached {table.upper()} ({path}): {e}.")
+        return None
+
+
+def write_cached(cache, table, query, df):
+    key = cache_key(cache.db_name, cache.db_prefix, query)
+    path = cache_path(cache.dir, key)
+    try:
+        write_frame(path, df, cache.compression)
+    except Exception as e:
+        logger.warning(f"Could not cache {table.upper()}: {e}.")
+        return
+    with index_lock:
+        index = read_index(cache.dir)
+        index[key] = {
+            "db": cache.db_name,
+            "prefix": cache.db_prefix,
+            "table": table,
+            "query": " ".join(query.split()),
+            "created": time.time(),
+            "rows": len(df),
+            "bytes": os.path.getsize(path)
+        }
+        write_index(cache.dir, index)
+        evict(cache.dir, cache.max_bytes, index)
+
+
+def evict(cache_dir, max_bytes, index=None):
+    # least recently used entries go first until the cache fits in max_bytes
+    if not max_bytes:
+        return
+    index = read_index(cache_dir) if index is None else index
+    entries = []
+    for key in list(index):
+        path = cache_path(cache_dir, key)
+        if not os.path.exists(path):
+            index.pop(key)
+            continue
+        entries.append((os.path.getmtime(path), key, os.path.getsize(path)))
+    total = sum(size for _, _, size in entries)
+    for _, key, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(cache_path(cache_dir, key))
+        logger.info(f"Evicted cached {index[key]['table'].upper()} ({size} bytes) from {cache_dir}.")
+        index.pop(key)
+        total -= size
+    write_index(cache_dir, index)
+
+
+def invalidate(cache_dir, db_name=None, table=None):
+    with index_lock:
+        index = read_index(cache_dir)
+        removed = 0
+        for key, entry in list(index.items()):
+            if db_name and entry["db"] != db_name:
+                continue
+            if table and entry["table"] != table:
+                continue
+            path = cache_path(cache_dir, key)
+            if os.path.exists(path):
+                os.remove(path)
+            index.pop(key)
+            removed += 1
+        write_index(cache_dir, index)
+    logger.info(f"Invalidated {removed} cached table(s) in {cache_dir}.")
+    return removed
+
+
+if __name__ == "__main__":
+    # python -m src.cache invalidate [--db NAME] [--table TABLE]
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Manage the extraction snapshot cache.")
+    parser.add_argument("command", choices=["invalidate", "evict"])
+    parser.add_argument("--dir", default=os.getenv("EXTRACT_CACHE_DIR", "src/cache"))
+    parser.add_argument("--db", help="only entries extracted from this DB name")
+    parser.add_argument("--table", help="only entries of this table (e.g. question)")
+    parser.add_argument("--max-mb", type=int, default=int(os.getenv("EXTRACT_CACHE_MAX_MB", "2048")))
+    args = parser.parse_args()
+    if args.command == "invalidate":
+        print(f"{invalidate(args.dir, args.db, args.table)} cached table(s) invalidated.")
+    else:
+        evict(args.dir, args.max_mb * 1024 * 1024)
@@ -0,0 +1,102 @@
+from typing import Dict
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+from src.logging import start
+
+
+logger = start()
+
+# table: parent key columns the loader slices it by (every table is also indexed by "id" when it has one)
+GROUP_KEYS = {
+    "course": ["id"],
+    "context_course": ["instanceid"],
+    "customfield_data": ["instanceid"],
+    "course_sections": ["course"],
+    "course_modules": ["course"],
+    "course_format_options": ["courseid"],
+    "page": ["course"],
+    "label": ["course"],
+    "url": ["course"],
+    "enrol": ["courseid"],
+    "resource": ["course"],
+    "hvp": ["course"],
+    "quiz": ["course"],
+    "forum": ["course"],
+    "reengagement": ["course"],
+    "choice": ["course"],
+    "choice_options": ["choiceid"],
+    "question_categories": ["contextid"],
+    "question": ["category"],
+    "question_answers": ["question"],
+    "quiz_slots": ["quizid"],
+    "quiz_sections": ["quizid"],
+    "qtype_ddimageortext": ["questionid"],
+    "qtype_ddimageortext_drags": ["questionid"],
+    "qtype_ddimageortext_drops": ["questionid"],
+    "qtype_ddmarker": ["questionid"],
+    "qtype_ddmarker_drags": ["questionid"],
+    "qtype_ddmarker_drops": ["questionid"],
+    "qtype_essay_options": ["questionid"],
+    "qtype_match_options": ["questionid"],
+    "qtype_match_subquestions": ["questionid"],
+    "qtype_multichoice_options": ["questionid"],
+    "qtype_randomsamatch_options": ["questionid"],
+    "qtype_shortanswer_options": ["questionid"],
+    "question_ddwtos": ["questionid"],
+    "question_gapselect": ["questionid"],
+    "question_truefalse": ["question"],
+    "customcert_image_hash_info": ["course_id"],
+    "resource_content_hash_info": ["course_id"],
+    "hvp_content_hash_info": ["course_id"],
+}
+
+
+def build_catalog(dataframes: Dict[str, pd.DataFrame]):
+    # built once after transform(): groups hold row positions (no copies), so a course slice is one dict lookup + iloc
+    logger.debug("Building the in-memory catalog...")
+    groups = {}
+    by_id = {}
+    for table, columns in GROUP_KEYS.items():
+        df = dataframes.get(table)
+        if df is None or df.empty:
+            continue
+        for column in columns:
+            if column in df.columns:
+                groups[(table, column)] = df.groupby(column, sort=False, observed=True).indices
+        if "id" in df.columns and df["id"].is_unique:
+            by_id[table] = df.set_index("id", drop=False)
+    logger.info(f"Catalog built: {len(groups)} grouped key(s), {len(by_id)} table(s) indexed by id.")
+    return SimpleNamespace(dataframes=dataframes, groups=groups, by_id=by_id)
+
+
+def get_table(catalog, table):
+    return catalog.dataframes.get(table, pd.DataFrame())
+
+
+def get_slice(catalog, table, column, value):
+    # rows of `table` whose `column` equals `value` (a copy, safe to modify)
+    return get_slices(catalog, table, column, [value])
+
+
+def get_slices(catalog, table, column, values):
+    # rows of `table` whose `column` is in `values`, in the table's original order
+    df = get_table(catalog, table)
+    if df.empty or column not in df.columns:
+        return df.copy()
+    group = catalog.groups.get((table, column))
+    if group is None:
+        # table not pre-grouped by this column, fall back to a scan
+        return df[df[column].isin(list(values))].copy()
+    positions = [group[value] for value in values if value in group]
+    if not positions:
+        return df.iloc[0:0].copy()
+    return df.iloc[np.sort(np.concatenate(positions))].copy()
+
+
+def get_by_id(catalog, table):
+    # the table indexed by its primary key ("id" kept as a column too)
+    if table in catalog.by_id:
+        return catalog.by_id[table]
+    df = get_table(catalog, table)
+    return df.set_index("id", drop=False) if "id" in df.columns else df
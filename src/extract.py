@@ -1,5 +1,15 @@
 import pandas as pd
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+import pyarrow.feather as feather
 from src.logging import start
+from src.optimize import optimize_frame
+from src.cache import read_cached, write_cached
+from src.metrics import record
+from src.reference import CUSTOMCERT_TEMPLATES, FEEDBACK_TEMPLATES, CUSTOMFIELD_CATEGORY
 
 
 logger = start()
@@ -11,55 +21,104 @@ def extract_old_course_ids_from_csv(csv):
     return ids_list
 
 
-def extract(conn, db_prefix, origin: str):
-    logger.debug(f"-------------------- Starting the {origin.upper()} extraction process... --------------------")
-    dataframes = {}
+def course_scope(db_prefix, id_list):
+    # SQL conditions restricting each OLD DB query to the courses being migrated
+    if not id_list:
+        return {}
+    ids = ", ".join(str(int(course_id)) for course_id in id_list)
+    course_contexts = f"SELECT id FROM {db_prefix}_context WHERE contextlevel = 50 AND instanceid IN ({ids})"
+    course_categories = f"SELECT category FROM {db_prefix}_course WHERE id IN ({ids})"
+    question_categories = f"SELECT id FROM {db_prefix}_question_categories WHERE contextid IN ({course_contexts})"
+    questions = f"SELECT id FROM {db_prefix}_question WHERE category IN ({question_categories})"
+    quizzes = f"SELECT id FROM {db_prefix}_quiz WHERE course IN ({ids})"
+    choices = f"SELECT id FROM {db_prefix}_choice WHERE course IN ({ids})"
+
+    scope = {
+        "context_course": f"instanceid IN ({ids})",
+        "context_category": f"instanceid IN ({course_categories})",
+        "course_categories": f"id IN ({course_categories})",
+        "course": f"id IN ({ids})",
+        "customfield_data": f"instanceid IN ({ids})",
+        "enrol": f"courseid IN ({ids})",
+        "course_format_options": f"courseid IN ({ids})",
+        "choice_options": f"choiceid IN ({choices})",
+        "quiz_slots": f"quizid IN ({quizzes})",
+        "quiz_sections": f"quizid IN ({quizzes})",
+        "question_categories": f"contextid IN ({course_contexts})",
+        "question": f"category IN ({question_categories})",
+        "question_answers": f"question IN ({questions})",
+        "question_truefalse": f"question IN ({questions})",
+        "customcert_image_hash_info": f"cc.course IN ({ids})",
+        "resource_content_hash_info": f"r.course IN ({ids})",
+        "hvp_content_hash_info": f"h.course IN ({ids})",
+        "course_modules_sections": f"cm.course IN ({ids})",
+    }
+    for table in ["course_sections", "course_modules", "page", "choice", "quiz", "url", "forum", "label", "folder", "resource", "hvp", "reengagement"]:
+        scope[table] = f"course IN ({ids})"
+    for table in ["qtype_ddimageortext", "qtype_ddimageortext_drags", "qtype_ddimageortext_drops", "qtype_ddmarker", "qtype_ddmarker_drags",
+                  "qtype_ddmarker_drops", "qtype_essay_options", "qtype_match_options", "qtype_match_subquestions", "qtype_multichoice_options",
+                  "qtype_randomsamatch_options", "qtype_shortanswer_options", "question_ddwtos", "question_gapselect"]:
+        scope[table] = f"questionid IN ({questions})"
+    for type in ["page", "feedback", "quiz", "url", "forum", "reengagement"]:
+        scope[f"course_{type}_instances"] = f"cm.course IN ({ids})"
+    return scope
+
+
+def build_queries(db_prefix, origin: str, id_list=None):
+    # id_list=None extracts the whole DB, otherwise only the rows belonging to these courses
+    scope = course_scope(db_prefix, id_list) if origin == "old" else {}
+
+    def where(table):
+        return f" WHERE {scope[table]}" if table in scope else ""
+
+    def and_where(table):
+        return f" AND {scope[table]}" if table in scope else ""
 
     specific_joins = ["page", "feedback", "quiz", "url", "forum", "reengagement"]
     
     if origin == "old":
         queries = {
-            "context_course": f"SELECT * FROM {db_prefix}_context WHERE contextlevel = 50",
-            "context_category": f"SELECT * FROM {db_prefix}_context WHERE contextlevel = 40",
-            "course_categories": f"SELECT * FROM {db_prefix}_course_categories",
-            "course": f"SELECT * FROM {db_prefix}_course WHERE format <> 'site'",
+            "context_course": f"SELECT * FROM {db_prefix}_context WHERE contextlevel = 50{and_where('context_course')}",
+            "context_category": f"SELECT * FROM {db_prefix}_context WHERE contextlevel = 40{and_where('context_category')}",
+            "course_categories": f"SELECT * FROM {db_prefix}_course_categories{where('course_categories')}",
+            "course": f"SELECT * FROM {db_prefix}_course WHERE format <> 'site'{and_where('course')}",
             "customfield_field_old": f"SELECT * FROM {db_prefix}_customfield_field WHERE categoryid = 2 ORDER BY FIELD(id, 8, 1, 2, 3, 4, 5, 6, 7)",
-            "customfield_data": f"SELECT * FROM {db_prefix}_customfield_data ORDER BY FIELD(fieldid, 8, 1, 2, 3, 4, 5, 6, 7)",
-            "course_sections": f"SELECT * FROM {db_prefix}_course_sections ORDER BY section ASC",
-            "course_modules": f"SELECT * FROM {db_prefix}_course_modules",
+            "customfield_data": f"SELECT * FROM {db_prefix}_customfield_data{where('customfield_data')} ORDER BY FIELD(fieldid, 8, 1, 2, 3, 4, 5, 6, 7)",
+            "course_sections": f"SELECT * FROM {db_prefix}_course_sections{where('course_sections')} ORDER BY section ASC",
+            "course_modules": f"SELECT * FROM {db_prefix}_course_modules{where('course_modules')}",
             "modules": f"SELECT * FROM {db_prefix}_modules",
-            "page": f"SELECT * FROM {db_prefix}_page",
-            "choice": f"SELECT * FROM {db_prefix}_choice ORDER BY id ASC",
-            "choice_options": f"SELECT * FROM {db_prefix}_choice_options ORDER BY choiceid ASC",
-            "quiz": f"SELECT * FROM {db_prefix}_quiz",
-            "quiz_slots": f"SELECT * FROM {db_prefix}_quiz_slots",
-            "quiz_sections": f"SELECT * FROM {db_prefix}_quiz_sections ORDER BY quizid ASC",
-            "question_categories": f"SELECT * FROM {db_prefix}_question_categories",
-            "question": f"SELECT * FROM {db_prefix}_question",
-            "question_answers": f"SELECT * FROM {db_prefix}_question_answers",
-            "qtype_ddimageortext": f"SELECT * FROM {db_prefix}_qtype_ddimageortext",
-            "qtype_ddimageortext_drags": f"SELECT * FROM {db_prefix}_qtype_ddimageortext_drags",
-            "qtype_ddimageortext_drops": f"SELECT * FROM {db_prefix}_qtype_ddimageortext_drops",
-            "qtype_ddmarker": f"SELECT * FROM {db_prefix}_qtype_ddmarker",
-            "qtype_ddmarker_drags": f"SELECT * FROM {db_prefix}_qtype_ddmarker_drags",
-            "qtype_ddmarker_drops": f"SELECT * FROM {db_prefix}_qtype_ddmarker_drops",
-            "qtype_essay_options": f"SELECT * FROM {db_prefix}_qtype_essay_options",
-            "qtype_match_options": f"SELECT * FROM {db_prefix}_qtype_match_options",
-            "qtype_match_subquestions": f"SELECT * FROM {db_prefix}_qtype_match_subquestions",
-            "qtype_multichoice_options": f"SELECT * FROM {db_prefix}_qtype_multichoice_options",
-            "qtype_randomsamatch_options": f"SELECT * FROM {db_prefix}_qtype_randomsamatch_options",
-            "qtype_shortanswer_options": f"SELECT * FROM {db_prefix}_qtype_shortanswer_options",
-            "question_ddwtos": f"SELECT * FROM {db_prefix}_question_ddwtos",
-            "question_gapselect": f"SELECT * FROM {db_prefix}_question_gapselect",
-            "question_truefalse": f"SELECT * FROM {db_prefix}_question_truefalse",
-            "url": f"SELECT * FROM {db_prefix}_url",
-            "enrol": f"SELECT * FROM {db_prefix}_enrol ORDER BY courseid ASC",
-            "forum": f"SELECT * FROM {db_prefix}_forum",
-            "label": f"SELECT * FROM {db_prefix}_label",
-            "folder": f"SELECT * FROM {db_prefix}_folder",
-            "resource": f"SELECT * FROM {db_prefix}_resource",
-            "hvp": f"SELECT * FROM {db_prefix}_hvp WHERE main_library_id IN (84, 140, 143)",
-            "reengagement": f"SELECT * FROM {db_prefix}_reengagement",
+            "page": f"SELECT * FROM {db_prefix}_page{where('page')}",
+            "choice": f"SELECT * FROM {db_prefix}_choice{where('choice')} ORDER BY id ASC",
+            "choice_options": f"SELECT * FROM {db_prefix}_choice_options{where('choice_options')} ORDER BY choiceid ASC",
+            "quiz": f"SELECT * FROM {db_prefix}_quiz{where('quiz')}",
+            "quiz_slots": f"SELECT * FROM {db_prefix}_quiz_slots{where('quiz_slots')}",
+            "quiz_sections": f"SELECT * FROM {db_prefix}_quiz_sections{where('quiz_sections')} ORDER BY quizid ASC",
+            "question_categories": f"SELECT * FROM {db_prefix}_question_categories{where('question_categories')}",
+            "question": f"SELECT * FROM {db_prefix}_question{where('question')}",
+            "question_answers": f"SELECT * FROM {db_prefix}_question_answers{where('question_answers')}",
+            "qtype_ddimageortext": f"SELECT * FROM {db_prefix}_qtype_ddimageortext{where('qtype_ddimageortext')}",
+            "qtype_ddimageortext_drags": f"SELECT * FROM {db_prefix}_qtype_ddimageortext_drags{where('qtype_ddimageortext_drags')}",
+            "qtype_ddimageortext_drops": f"SELECT * FROM {db_prefix}_qtype_ddimageortext_drops{where('qtype_ddimageortext_drops')}",
+            "qtype_ddmarker": f"SELECT * FROM {db_prefix}_qtype_ddmarker{where('qtype_ddmarker')}",
+            "qtype_ddmarker_drags": f"SELECT * FROM {db_prefix}_qtype_ddmarker_drags{where('qtype_ddmarker_drags')}",
+            "qtype_ddmarker_drops": f"SELECT * FROM {db_prefix}_qtype_ddmarker_drops{where('qtype_ddmarker_drops')}",
+            "qtype_essay_options": f"SELECT * FROM {db_prefix}_qtype_essay_options{where('qtype_essay_options')}",
+            "qtype_match_options": f"SELECT * FROM {db_prefix}_qtype_match_options{where('qtype_match_options')}",
+            "qtype_match_subquestions": f"SELECT * FROM {db_prefix}_qtype_match_subquestions{where('qtype_match_subquestions')}",
+            "qtype_multichoice_options": f"SELECT * FROM {db_prefix}_qtype_multichoice_options{where('qtype_multichoice_options')}",
+            "qtype_randomsamatch_options": f"SELECT * FROM {db_prefix}_qtype_randomsamatch_options{where('qtype_randomsamatch_options')}",
+            "qtype_shortanswer_options": f"SELECT * FROM {db_prefix}_qtype_shortanswer_options{where('qtype_shortanswer_options')}",
+            "question_ddwtos": f"SELECT * FROM {db_prefix}_question_ddwtos{where('question_ddwtos')}",
+            "question_gapselect": f"SELECT * FROM {db_prefix}_question_gapselect{where('question_gapselect')}",
+            "question_truefalse": f"SELECT * FROM {db_prefix}_question_truefalse{where('question_truefalse')}",
+            "url": f"SELECT * FROM {db_prefix}_url{where('url')}",
+            "enrol": f"SELECT * FROM {db_prefix}_enrol{where('enrol')} ORDER BY courseid ASC",
+            "forum": f"SELECT * FROM {db_prefix}_forum{where('forum')}",
+            "label": f"SELECT * FROM {db_prefix}_label{where('label')}",
+            "folder": f"SELECT * FROM {db_prefix}_folder{where('folder')}",
+            "resource": f"SELECT * FROM {db_prefix}_resource{where('resource')}",
+            "hvp": f"SELECT * FROM {db_prefix}_hvp WHERE main_library_id IN (84, 140, 143){and_where('hvp')}",
+            "reengagement": f"SELECT * FROM {db_prefix}_reengagement{where('reengagement')}",
             "customcert_image_hash_info": f"""
                                                 SELECT ctx.id AS context_id,
                                                     f.id as file_id,
@@ -79,13 +138,14 @@ def extract(conn, db_prefix, origin: str):
                                                 INNER JOIN {db_prefix}_course c ON c.id = cc.course
                                                 INNER JOIN {db_prefix}_files f ON f.component = 'mod_customcert' AND f.filearea = 'image' and f.mimetype like '%%image%%' and f.contextid = cctx.id
                                                 where e.name = 'conteúdo programático'
-                                                AND JSON_UNQUOTE(JSON_EXTRACT(e.data, '$.filename')) = f.filename
+                                                AND JSON_UNQUOTE(JSON_EXTRACT(e.data, '$.filename')) = f.filename{and_where('customcert_image_hash_info')}
                                                 ORDER BY c.fullname ASC
                                         """,
             "resource_content_hash_info": f"""
                                                 SELECT ctx.id AS resource_context_id,
                                                     f.contenthash,
                                                     f.filename,
+                                                    f.filesize,
                                                     r.id as resource_id,
                                                     r.name as resource_name,
                                                     c.fullname as course,
@@ -95,13 +155,14 @@ def extract(conn, db_prefix, origin: str):
                                                 INNER JOIN {db_prefix}_context ctx ON ctx.instanceid = cm.id
                                                 INNER JOIN {db_prefix}_course c ON c.id = r.course
                                                 INNER JOIN {db_prefix}_files f ON f.component = 'mod_resource' AND f.contextid = ctx.id
-                                                WHERE f.filename <> '.'
+                                                WHERE f.filename <> '.'{and_where('resource_content_hash_info')}
                                                 ORDER BY c.fullname ASC
                                         """,
             "hvp_content_hash_info": f"""
                                                 SELECT ctx.id AS resource_context_id,
                                                     f.contenthash,
                                                     f.filename,
+                                                    f.filesize,
                                                     h.id as hvp_id,
                                                     h.name as hvp_name,
                                                     c.fullname as course,
@@ -111,10 +172,10 @@ def extract(conn, db_prefix, origin: str):
                                                 INNER JOIN {db_prefix}_context ctx ON ctx.instanceid = cm.id
                                                 INNER JOIN {db_prefix}_course c ON c.id = h.course
                                                 INNER JOIN {db_prefix}_files f ON f.component = 'mod_hvp' AND f.contextid = ctx.id
-                                                WHERE f.filename <> '.'
+                                                WHERE f.filename <> '.'{and_where('hvp_content_hash_info')}
                                                 ORDER BY c.fullname ASC
                                     """,
-            "course_format_options": f"SELECT * FROM {db_prefix}_course_format_options ORDER BY sectionid ASC",
+            "course_format_options": f"SELECT * FROM {db_prefix}_course_format_options{where('course_format_options')} ORDER BY sectionid ASC",
             "course_modules_sections": f"""
                                         SELECT
                                         c.id AS course_id,
@@ -129,7 +190,7 @@ def extract(conn, db_prefix, origin: str):
                                         FROM {db_prefix}_course_modules cm
                                         JOIN {db_prefix}_course c ON c.id = cm.course
                                         JOIN {db_prefix}_course_sections cs ON cs.id = cm.section
-                                        JOIN {db_prefix}_modules m ON m.id = cm.module
+                                        JOIN {db_prefix}_modules m ON m.id = cm.module{where('course_modules_sections')}
                                         """
         }
 
@@ -147,45 +208,186 @@ def extract(conn, db_prefix, origin: str):
                 JOIN {db_prefix}_course c ON c.id = cm.course
                 JOIN {db_prefix}_course_sections cs ON cs.id = cm.section
                 JOIN {db_prefix}_modules m ON m.id = cm.module
-                JOIN {db_prefix}_{type} t ON t.id = cm.instance AND m.name = '{type}'
+                JOIN {db_prefix}_{type} t ON t.id = cm.instance AND m.name = '{type}'{where(f'course_{type}_instances')}
             """
     else:
-        queries = {
-            "cc_templates_default_ptbr": f"SELECT * FROM {db_prefix}_customcert_templates WHERE id = 2 LIMIT 1",
-            "cc_pages_default_ptbr": f"SELECT * FROM {db_prefix}_customcert_pages WHERE templateid = 2 ORDER BY id, sequence ASC",
-            "cc_elements_default_ptbr": f"SELECT * FROM {db_prefix}_customcert_elements WHERE pageid IN (3, 10) ORDER BY pageid, sequence ASC",
-            "cc_templates_default_en": f"SELECT * FROM {db_prefix}_customcert_templates WHERE id = 15 LIMIT 1",
-            "cc_pages_default_en": f"SELECT * FROM {db_prefix}_customcert_pages WHERE templateid = 15 ORDER BY id, sequence ASC",
-            "cc_elements_default_en": f"SELECT * FROM {db_prefix}_customcert_elements WHERE pageid IN (222, 223) ORDER BY pageid, sequence ASC",
-            "cc_templates_antigo_vertical": f"SELECT * FROM {db_prefix}_customcert_templates WHERE id = 237 LIMIT 1",
-            "cc_pages_antigo_vertical": f"SELECT * FROM {db_prefix}_customcert_pages WHERE templateid = 237 ORDER BY id, sequence ASC",
-            "cc_elements_antigo_vertical": f"SELECT * FROM {db_prefix}_customcert_elements WHERE pageid IN (679) ORDER BY pageid, sequence ASC",
-            "cc_templates_dica": f"SELECT * FROM {db_prefix}_customcert_templates WHERE id = 238 LIMIT 1",
-            "cc_pages_dica": f"SELECT * FROM {db_prefix}_customcert_pages WHERE templateid = 238 ORDER BY id, sequence ASC",
-            "cc_elements_dica": f"SELECT * FROM {db_prefix}_customcert_elements WHERE pageid IN (680, 681) ORDER BY pageid, sequence ASC",
-            "cc_templates_galaxia_maritima": f"SELECT * FROM {db_prefix}_customcert_templates WHERE id = 239 LIMIT 1",
-            "cc_pages_galaxia_maritima": f"SELECT * FROM {db_prefix}_customcert_pages WHERE templateid = 239 ORDER BY id, sequence ASC",
-            "cc_elements_galaxia_maritima": f"SELECT * FROM {db_prefix}_customcert_elements WHERE pageid IN (682, 683) ORDER BY pageid, sequence ASC",
-            "cc_templates_galaxia_navegacao": f"SELECT * FROM {db_prefix}_customcert_templates WHERE id = 240 LIMIT 1",
-            "cc_pages_galaxia_navegacao": f"SELECT * FROM {db_prefix}_customcert_pages WHERE templateid = 240 ORDER BY id, sequence ASC",
-            "cc_elements_galaxia_navegacao": f"SELECT * FROM {db_prefix}_customcert_elements WHERE pageid IN (684, 685) ORDER BY pageid, sequence ASC",
-            "cc_templates_rvelasquez": f"SELECT * FROM {db_prefix}_customcert_templates WHERE id = 241 LIMIT 1",
-            "cc_pages_rvelasquez": f"SELECT * FROM {db_prefix}_customcert_pages WHERE templateid = 241 ORDER BY id, sequence ASC",
-            "cc_elements_rvelasquez": f"SELECT * FROM {db_prefix}_customcert_elements WHERE pageid IN (686, 687) ORDER BY pageid, sequence ASC",
-            "customfield_field_new": f"SELECT * FROM {db_prefix}_customfield_field WHERE categoryid = 7 ORDER BY id ASC",
-            "feedback_item_ptbr": f"SELECT * FROM {db_prefix}_feedback_item WHERE template = 2 AND feedback = 0",
-            "feedback_item_en": f"SELECT * FROM {db_prefix}_feedback_item WHERE template = 4 AND feedback = 0"
-        }
+        # the same rows src.reference reads in batched queries, one query per template / language here
+        queries = {}
+        for name, (template_id, page_ids) in CUSTOMCERT_TEMPLATES.items():
+            queries[f"cc_templates_{name}"] = f"SELECT * FROM {db_prefix}_customcert_templates WHERE id = {template_id} LIMIT 1"
+            queries[f"cc_pages_{name}"] = f"SELECT * FROM {db_prefix}_customcert_pages WHERE templateid = {template_id} ORDER BY id, sequence ASC"
+            queries[f"cc_elements_{name}"] = (f"SELECT * FROM {db_prefix}_customcert_elements WHERE pageid IN ({', '.join(str(page_id) for page_id in page_ids)}) "
+                                              f"ORDER BY pageid, sequence ASC")
+        queries["customfield_field_new"] = f"SELECT * FROM {db_prefix}_customfield_field WHERE categoryid = {CUSTOMFIELD_CATEGORY} ORDER BY id ASC"
+        for language, template in FEEDBACK_TEMPLATES.items():
+            queries[f"feedback_item_{language}"] = f"SELECT * FROM {db_prefix}_feedback_item WHERE template = {template} AND feedback = 0"
 
-    for table, query in queries.items():
-        try:
-            logger.debug(f"Running query for '{table.upper()}'...")
+    return queries
+
+
+def table_memory_limit(memory_limit_mb, table):
+    # memory_limit_mb may be a single value for every table or a {table: mb} dict ("default" as fallback)
+    if isinstance(memory_limit_mb, dict):
+        return memory_limit_mb.get(table, memory_limit_mb.get("default"))
+    return memory_limit_mb
+
+
+def spill_chunks(chunks, spill_path, part):
+    # uncompressed Feather, categoricals written as plain strings: every part has the same column types whatever its categories
+    os.makedirs(spill_path, exist_ok=True)
+    part_path = os.path.join(spill_path, f"part_{part:05d}.feather")
+    df = pd.concat(chunks, ignore_index=True)
+    df = df.astype({column: object for column in df.select_dtypes("category").columns})
+    feather.write_feather(df, part_path, compression="uncompressed")
+    return part_path
+
+
+def read_spilled(parts):
+    # parts memory-mapped and concatenated in Arrow (ints of different widths promoted), one conversion to pandas
+    table = pa.concat_tables([feather.read_table(part_path, memory_map=True) for part_path in parts], promote_options="permissive")
+    df = table.to_pandas()
+    del table
+    return df
+
+
+def read_query_chunked(conn, table, query, origin: str, chunksize, memory_limit_mb=None, spill_dir="src/extracted/spill"):
+    # unbuffered server-side cursor (SSCursor): the driver no longer holds the raw result set next to the DataFrame
+    conn.execution_options(stream_results=True)
+    limit_bytes = table_memory_limit(memory_limit_mb, table)
+    limit_bytes = limit_bytes * 1024 * 1024 if limit_bytes else None
+    spill_path = os.path.join(spill_dir, f"{origin}_{table}")
+    chunks, held_bytes, parts = [], 0, []
+    try:
+        for chunk in pd.read_sql(query, conn, chunksize=chunksize):
+            # compact dtypes chunk by chunk (optimize_dtypes does the same on the whole frame later): the raw chunk is never held
+            chunk = optimize_frame(chunk, table)
+            chunks.append(chunk)
+            held_bytes += int(chunk.memory_usage(deep=True).sum())
+            # over the table's ceiling: move what is held in memory to disk and keep streaming
+            if limit_bytes and held_bytes > limit_bytes:
+                parts.append(spill_chunks(chunks, spill_path, len(parts)))
+                logger.debug(f"{table.upper()} ({origin.upper()}) exceeded {limit_bytes // (1024 * 1024)} MB, spilled part {len(parts)} to disk.")
+                chunks, held_bytes = [], 0
+    finally:
+        conn.execution_options(stream_results=False)
+
+    if parts:
+        if chunks:
+            parts.append(spill_chunks(chunks, spill_path, len(parts)))
+            chunks = []
+        df = optimize_frame(read_spilled(parts), table)
+        for part_path in parts:
+            os.remove(part_path)
+        logger.info(f"{table.upper()} ({origin.upper()}) was rebuilt from {len(parts)} spilled part(s).")
+        return df
+    # an empty result still yields one (empty) chunk with the columns
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def read_query(conn, table, query, origin: str, chunksize=None, memory_limit_mb=None, cache=None):
+    try:
+        start_time = time.perf_counter()
+        if cache is not None:
+            df = read_cached(cache, table, query)
+            if df is not None:
+                elapsed = time.perf_counter() - start_time
+                record("extract", table, elapsed, rows_out=len(df))
+                return df, elapsed
+        logger.debug(f"Running query for '{table.upper()}'...")
+        if chunksize:
+            df = read_query_chunked(conn, table, query, origin, chunksize, memory_limit_mb)
+        else:
             df = pd.read_sql(query, conn)
-            logger.info(f"Extracted {len(df)} rows from {table.upper()} ({origin.upper()}).")
+        elapsed = time.perf_counter() - start_time
+        if cache is not None:
+            write_cached(cache, table, query, df)
+        logger.info(f"Extracted {len(df)} rows from {table.upper()} ({origin.upper()}) in {elapsed:.2f}s.")
+        record("extract", table, elapsed, rows_out=len(df))
+        return df, elapsed
+    except Exception as e:
+        record("extract", table, time.perf_counter() - start_time, error=True)
+        logger.error(f"Query for {table.upper()} failed: {query}.")
+        logger.error(f"Error extracting {table.upper()} from {origin.upper()} DB: {e}.")
+        return None, None
+
+
+def extract(conn, db_prefix, origin: str, id_list=None, chunksize=None, memory_limit_mb=None, cache=None, exclude=None):
+    logger.debug(f"-------------------- Starting the {origin.upper()} extraction process... --------------------")
+    dataframes = {}
+
+    # exclude: tables already extracted some other way (e.g. incrementally)
+    queries = {table: query for table, query in build_queries(db_prefix, origin, id_list).items() if table not in (exclude or [])}
+    for table, query in queries.items():
+        df, _ = read_query(conn, table, query, origin, chunksize, memory_limit_mb, cache)
+        if df is not None:
             dataframes[table] = df
-        except Exception as e:
-            logger.error(f"Query for {table.upper()} failed: {query}.")
-            logger.error(f"Error extracting {table.upper()} from {origin.upper()} DB: {e}.")
             
     logger.info(f"-------------------- End of {origin.upper()} extraction process. --------------------")
     return dataframes
+
+
+def open_snapshot_connections(engine, how_many, lock_tables=False):
+    # every worker gets its own pooled connection, all of them reading from the same point in time
+    # - START TRANSACTION WITH CONSISTENT SNAPSHOT only applies to REPEATABLE READ
+    # - lock_tables=True holds FLUSH TABLES WITH READ LOCK while the snapshots are opened (needs RELOAD privilege),
+    #   otherwise the snapshots are opened back-to-back and may differ by the writes committed in between
+    connections = []
+    try:
+        for _ in range(how_many):
+            connections.append(engine.connect().execution_options(isolation_level="REPEATABLE READ"))
+        if lock_tables:
+            connections[0].exec_driver_sql("FLUSH TABLES WITH READ LOCK")
+        try:
+            for conn in connections:
+                conn.exec_driver_sql("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+        finally:
+            if lock_tables:
+                connections[0].exec_driver_sql("UNLOCK TABLES")
+    except Exception:
+        for conn in connections:
+            conn.close()
+        raise
+    return connections
+
+
+def extract_parallel(engine, db_prefix, origin: str, id_list=None, max_workers=5, lock_tables=False, chunksize=None, memory_limit_mb=None, cache=None, exclude=None):
+    logger.debug(f"-------------------- Starting the {origin.upper()} parallel extraction process ({max_workers} workers)... --------------------")
+    dataframes = {}
+    timings = {}
+
+    queries = {table: query for table, query in build_queries(db_prefix, origin, id_list).items() if table not in (exclude or [])}
+    pending = queue.Queue()
+    for table, query in queries.items():
+        pending.put((table, query))
+
+    def worker(conn):
+        while True:
+            try:
+                table, query = pending.get_nowait()
+            except queue.Empty:
+                return
+            df, elapsed = read_query(conn, table, query, origin, chunksize, memory_limit_mb, cache)
+            if df is not None:
+                dataframes[table] = df
+                timings[table] = elapsed
+
+    start_time = time.perf_counter()
+    connections = open_snapshot_connections(engine, min(max_workers, len(queries)), lock_tables)
+    try:
+        with ThreadPoolExecutor(max_workers=len(connections)) as executor:
+            for future in [executor.submit(worker, conn) for conn in connections]:
+                future.result()
+    finally:
+        for conn in connections:
+            conn.rollback()
+            conn.close()
+    elapsed = time.perf_counter() - start_time
+
+    # keep the same table order as the sequential extraction
+    dataframes = {table: dataframes[table] for table in queries if table in dataframes}
+    for table, seconds in sorted(timings.items(), key=lambda item: item[1], reverse=True):
+        logger.debug(f"Query time for {table.upper()} ({origin.upper()}): {seconds:.2f}s.")
+    logger.info(f"{len(dataframes)}/{len(queries)} {origin.upper()} queries extracted in {elapsed:.2f}s wall time "
+                f"({sum(timings.values()):.2f}s summed query time).")
+    logger.info(f"-------------------- End of {origin.upper()} parallel extraction process. --------------------")
+    return dataframes
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import shutil
+import threading
+from src.ftp_pool import retrieve
+from src.logging import start
+
+
+logger = start()
+
+# Moodle files downloaded once per contenthash (<dir>/aa/bb/<sha1>), whatever the number of courses using them
+STORE_DIR = os.getenv("FILE_STORE_DIR", "src/cache/files")
+# evict_file_store() removes the least recently used objects above this size (0 = no limit); an object still hardlinked from a
+# per-course path frees no disk when removed, it is never evicted (with FILE_STORE_LINK=hardlink only the objects no course file
+# uses any more count as freeable)
+MAX_BYTES = int(os.getenv("FILE_STORE_MAX_MB", "10240")) * 1024 * 1024
+# how the per-course paths point at the objects: hardlink (falls back to symlink, then copy), symlink or copy
+LINK_MODE = os.getenv("FILE_STORE_LINK", "hardlink")
+# FILE_STORE_VERIFY=1 hashes the objects again every time they are reused, not only when they are stored
+VERIFY_HITS = os.getenv("FILE_STORE_VERIFY", "0") == "1"
+
+lock = threading.Lock()
+object_locks = {}  # contenthash -> lock, two workers never fetch the same object at once
+stats = {"hits": 0, "misses": 0, "bytes": 0, "corrupt": 0, "evicted": 0}
+
+
+def object_path(contenthash):
+    return os.path.join(STORE_DIR, contenthash[:2], contenthash[2:4], contenthash)
+
+
+def has_object(contenthash):
+    return os.path.exists(object_path(contenthash))
+
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fetch(contenthash):
+    # path of the verified object, downloaded when it is not in the store yet; returns (path, downloaded)
+    with lock:
+        object_lock = object_locks.setdefault(contenthash, threading.Lock())
+    with object_lock:
+        path = object_path(contenthash)
+        if os.path.exists(path):
+            if VERIFY_HITS and file_sha1(path) != contenthash:
+                logger.warning(f"Stored file {contenthash} does not match its hash, downloading it again.")
+                os.remove(path)
+                with lock:
+                    stats["corrupt"] += 1
+            else:
+                os.utime(path)
+                with lock:
+                    stats["hits"] += 1
+                return path, False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                retrieve(contenthash, f)
+            # the temp file was just written: hashing it reads from the page cache
+            digest = file_sha1(temp_path)
+            if digest != contenthash:
+                with lock:
+                    stats["corrupt"] += 1
+                raise ValueError(f"downloaded file does not match its contenthash {contenthash} (got {digest})")
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        with lock:
+            stats["misses"] += 1
+            stats["bytes"] += os.path.getsize(path)
+        return path, True
+
+
+def link_object(path, target):
+    # the per-course file: a hardlink costs no disk and outlives the object's eviction, a symlink is left dangling by it
+    if os.path.lexists(target):
+        os.remove(target)
+    modes = {"hardlink": ["hardlink", "symlink", "copy"], "symlink": ["symlink", "copy"]}.get(LINK_MODE, ["copy"])
+    for mode in modes:
+        try:
+            if mode == "hardlink":
+                os.link(path, target)
+            elif mode == "symlink":
+                os.symlink(os.path.abspath(path), target)
+            else:
+                shutil.copyfile(path, target)
+            return mode
+        except OSError as e:
+            logger.debug(f"Could not {mode} {path} to {target}: {e}.")
+    raise OSError(f"could not link {path} to {target}")
+
+
+def evict_file_store(max_bytes=MAX_BYTES):
+    # least recently used objects go first until the store fits in max_bytes, skipping the ones a per-course hardlink still holds
+    if not max_bytes or not os.path.isdir(STORE_DIR):
+        return
+    entries = []
+    for directory, _, filenames in os.walk(STORE_DIR):
+        for filename in filenames:
+            if filename.endswith(".tmp"):
+                continue
+            path = os.path.join(directory, filename)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, path, stat.st_size, stat.st_nlink))
+    total = sum(size for _, _, size, _ in entries)
+    linked = 0
+    for _, path, size, links in sorted(entries):
+        if total <= max_bytes:
+            break
+        if links > 1:
+            linked += size
+            continue
+        os.remove(path)
+        logger.info(f"Evicted stored file {os.path.basename(path)} ({size} bytes) from {STORE_DIR}.")
+        total -= size
+        with lock:
+            stats["evicted"] += 1
+    if total > max_bytes:
+        logger.warning(f"File store {STORE_DIR} is {total} bytes (limit {max_bytes}): {linked} byte(s) are objects still hardlinked from course files, "
+                       f"they are freed once those files are removed.")
+
+
+def file_store_summary():
+    with lock:
+        return dict(stats)
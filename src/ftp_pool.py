@@ -0,0 +1,150 @@
+import ftplib
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from src.logging import start
+from src.metrics import record
+
+
+logger = start()
+
+# errors after which a session is dropped (and the transfer retried on a new one)
+CONNECTION_ERRORS = (OSError, EOFError, ftplib.error_temp, ftplib.error_reply)
+
+
+def get_ftp_config():
+    # FTP_POOL_SIZE: sessions kept open (and the most that can be borrowed at once)
+    # FTP_POOL_IDLE_CHECK: a session idle for longer than this (seconds) gets a NOOP before it is lent again
+    # FTP_RETRIES: new sessions tried after a transfer's connection dropped (waiting FTP_RETRY_DELAY, doubled every time)
+    return SimpleNamespace(
+        host=os.getenv("FTP_HOST"),
+        port=int(os.getenv("FTP_PORT", "21")),
+        user=os.getenv("FTP_USER"),
+        password=os.getenv("FTP_PASSWORD"),
+        base_dir=os.getenv("FTP_BASE_DIR", ""),
+        size=max(1, int(os.getenv("FTP_POOL_SIZE", "4"))),
+        idle_check=float(os.getenv("FTP_POOL_IDLE_CHECK", "15")),
+        timeout=float(os.getenv("FTP_TIMEOUT", "60")),
+        retries=max(0, int(os.getenv("FTP_RETRIES", "2"))),
+        retry_delay=float(os.getenv("FTP_RETRY_DELAY", "1")),
+    )
+
+
+pool = None
+pool_lock = threading.Lock()
+
+
+def get_pool():
+    global pool
+    with pool_lock:
+        if pool is None:
+            config = get_ftp_config()
+            pool = SimpleNamespace(config=config, idle=queue.LifoQueue(), slots=threading.BoundedSemaphore(config.size), lock=threading.Lock(),
+                                   stats={"opened": 0, "reused": 0, "dropped": 0, "retries": 0})
+            logger.info(f"FTP pool for {config.host}:{config.port}: up to {config.size} session(s).")
+        return pool
+
+
+def open_session(ftp_pool):
+    config = ftp_pool.config
+    start_time = time.perf_counter()
+    ftp = ftplib.FTP(timeout=config.timeout)
+    ftp.connect(config.host, config.port)
+    ftp.login(user=config.user, passwd=config.password)
+    record("download", "ftp_login", time.perf_counter() - start_time)
+    with ftp_pool.lock:
+        ftp_pool.stats["opened"] += 1
+    return SimpleNamespace(ftp=ftp, last_used=time.monotonic())
+
+
+def close_session(session):
+    try:
+        session.ftp.quit()
+    except Exception:
+        session.ftp.close()
+
+
+def is_alive(ftp_pool, session):
+    if time.monotonic() - session.last_used < ftp_pool.config.idle_check:
+        return True
+    try:
+        session.ftp.voidcmd("NOOP")
+        return True
+    except Exception:
+        return False
+
+
+@contextmanager
+def ftp_session():
+    # borrow a logged-in session (waits while all FTP_POOL_SIZE are lent), opening one when none is idle or the idle one is dead
+    ftp_pool = get_pool()
+    ftp_pool.slots.acquire()
+    session = None
+    try:
+        while session is None:
+            try:
+                session = ftp_pool.idle.get_nowait()
+            except queue.Empty:
+                session = open_session(ftp_pool)
+                break
+            if is_alive(ftp_pool, session):
+                with ftp_pool.lock:
+                    ftp_pool.stats["reused"] += 1
+            else:
+                close_session(session)
+                with ftp_pool.lock:
+                    ftp_pool.stats["dropped"] += 1
+                session = None
+        try:
+            yield session.ftp
+        except CONNECTION_ERRORS:
+            close_session(session)
+            with ftp_pool.lock:
+                ftp_pool.stats["dropped"] += 1
+            session = None
+            raise
+    finally:
+        if session is not None:
+            session.last_used = time.monotonic()
+            ftp_pool.idle.put(session)
+        ftp_pool.slots.release()
+
+
+def content_path(contenthash):
+    # full path of a file in Moodle's file store: one RETR, no CWD, so a session can be reused for any file
+    return f"{get_pool().config.base_dir.rstrip('/')}/{contenthash[:2]}/{contenthash[2:4]}/{contenthash}"
+
+
+def retrieve(contenthash, target):
+    # RETR into the open binary file `target`; a dropped connection is retried (from the start) on a new session
+    config = get_pool().config
+    for attempt in range(config.retries + 1):
+        try:
+            with ftp_session() as ftp:
+                ftp.retrbinary(f"RETR {content_path(contenthash)}", target.write)
+            return
+        except CONNECTION_ERRORS as e:
+            if attempt == config.retries:
+                raise
+            delay = config.retry_delay * 2 ** attempt
+            logger.warning(f"FTP connection lost while downloading {contenthash} ({e}), retrying on a new session in {delay:.0f}s.")
+            with get_pool().lock:
+                get_pool().stats["retries"] += 1
+            target.seek(0)
+            target.truncate()
+            time.sleep(delay)
+
+
+def close_ftp_pool():
+    global pool
+    with pool_lock:
+        ftp_pool, pool = pool, None
+    if ftp_pool is None:
+        return
+    while not ftp_pool.idle.empty():
+        close_session(ftp_pool.idle.get_nowait())
+    logger.info(f"FTP pool closed: {ftp_pool.stats['opened']} session(s) opened, {ftp_pool.stats['reused']} reuse(s), "
+                f"{ftp_pool.stats['dropped']} dropped, {ftp_pool.stats['retries']} retried transfer(s).")
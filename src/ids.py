@@ -0,0 +1,56 @@
+import os
+from sqlalchemy import text
+from src.logging import start
+from src.writer import insert_rows
+
+
+logger = start()
+
+
+def allocation_strategy(conn):
+    # "lastrowid": one multi-row INSERT gets consecutive ids starting at lastrowid (innodb_autoinc_lock_mode 0 or 1, increment 1)
+    # "select": the ids are read back after every INSERT, inside the load transaction (lock mode 2: a multi-row INSERT's ids may
+    #           interleave with other sessions' inserts; auto_increment_increment > 1: lastrowid is no longer the start of a range)
+    # LOAD_ID_ALLOCATION=lastrowid|select skips the probe
+    if "id_allocation" in conn.info:
+        return conn.info["id_allocation"]
+    strategy = os.getenv("LOAD_ID_ALLOCATION", "auto")
+    if strategy not in ("lastrowid", "select"):
+        if conn.dialect.name == "mysql":
+            lock_mode, increment = conn.execute(text("SELECT @@innodb_autoinc_lock_mode, @@auto_increment_increment")).one()
+            strategy = "lastrowid" if int(lock_mode) in (0, 1) and int(increment) == 1 else "select"
+            logger.info(f"innodb_autoinc_lock_mode = {lock_mode}, auto_increment_increment = {increment}, allocating new ids with '{strategy}'.")
+        else:
+            # single writer (e.g. SQLite): ids of one INSERT are always consecutive
+            strategy = "lastrowid"
+    conn.info["id_allocation"] = strategy
+    return strategy
+
+
+def select_ids(conn, table_name, batches):
+    # ids of the rows each INSERT just wrote: from its first id (LAST_INSERT_ID), as many as it wrote, in row order
+    # under REPEATABLE READ the load transaction only sees, above that id, its own rows: the rows other sessions committed before
+    # its snapshot took lower ids, the ones they insert meanwhile (interleaved ids included) are not visible to it
+    new_ids = []
+    for first_id, count in batches:
+        new_ids.extend(conn.execute(text(f"SELECT id FROM {table_name} WHERE id >= :first_id ORDER BY id LIMIT {int(count)}"),
+                                    {"first_id": int(first_id)}).scalars())
+    return new_ids
+
+
+def insert_with_ids(conn, table_name, df):
+    # inserts `df` (without an "id" column) and returns the new ids in row order
+    if df.empty:
+        return []
+    batches = insert_rows(conn, table_name, df)
+    if allocation_strategy(conn) == "select":
+        return select_ids(conn, table_name, batches)
+    new_ids = []
+    for first_id, count in batches:
+        new_ids.extend(range(int(first_id), int(first_id) + count))
+    return new_ids
+
+
+def insert_with_mapping(conn, table_name, df, old_ids):
+    # old id -> new id of the rows just inserted
+    return dict(zip(old_ids, insert_with_ids(conn, table_name, df)))
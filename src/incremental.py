@@ -0,0 +1,140 @@
+import json
+import os
+import pandas as pd
+from src.logging import start
+from src.cache import cache_key, read_frame, write_frame
+from src.extract import build_queries, read_query
+
+
+logger = start()
+
+# table: (watermark column, (parent table, column pointing to the parent), columns the full query is ordered by)
+# - rows are fetched when their own watermark column moved OR when their parent row changed
+# - children without a watermark column are fully replaced for every changed parent (so deleted children go away too)
+# - deleted parent rows are not detected, invalidate the snapshot (or run without EXTRACT_INCREMENTAL) to drop them
+# - tables left out are fully read by the normal extraction every run: course_modules (its only date, "added", never moves, and
+#   Moodle does not bump course.timemodified when a module is hidden, moved or deleted) and quiz_slots (no date at all, slot edits
+#   do not bump quiz.timemodified)
+INCREMENTAL_TABLES = {
+    "course_categories": ("timemodified", None, None),
+    "course": ("timemodified", None, None),
+    "customfield_data": ("timemodified", None, None),
+    "course_sections": ("timemodified", None, ["section"]),
+    "page": ("timemodified", None, None),
+    "choice": ("timemodified", None, ["id"]),
+    "choice_options": ("timemodified", ("choice", "choiceid"), ["choiceid"]),
+    "quiz": ("timemodified", None, None),
+    "quiz_sections": (None, ("quiz", "quizid"), ["quizid"]),
+    "question": ("timemodified", None, None),
+    "question_answers": (None, ("question", "question"), None),
+    "qtype_ddimageortext": (None, ("question", "questionid"), None),
+    "qtype_ddimageortext_drags": (None, ("question", "questionid"), None),
+    "qtype_ddimageortext_drops": (None, ("question", "questionid"), None),
+    "qtype_ddmarker": (None, ("question", "questionid"), None),
+    "qtype_ddmarker_drags": (None, ("question", "questionid"), None),
+    "qtype_ddmarker_drops": (None, ("question", "questionid"), None),
+    "qtype_essay_options": (None, ("question", "questionid"), None),
+    "qtype_match_options": (None, ("question", "questionid"), None),
+    "qtype_match_subquestions": (None, ("question", "questionid"), None),
+    "qtype_multichoice_options": (None, ("question", "questionid"), None),
+    "qtype_randomsamatch_options": (None, ("question", "questionid"), None),
+    "qtype_shortanswer_options": (None, ("question", "questionid"), None),
+    "question_ddwtos": (None, ("question", "questionid"), None),
+    "question_gapselect": (None, ("question", "questionid"), None),
+    "question_truefalse": (None, ("question", "question"), None),
+    "url": ("timemodified", None, None),
+    "enrol": ("timemodified", None, ["courseid"]),
+    "forum": ("timemodified", None, None),
+    "label": ("timemodified", None, None),
+    "folder": ("timemodified", None, None),
+    "resource": ("timemodified", None, None),
+    "hvp": ("timemodified", None, None),
+    "reengagement": ("timemodified", None, None),
+    "course_format_options": (None, ("course", "courseid"), ["sectionid"]),
+}
+
+
+def read_watermarks(snapshot_dir):
+    path = os.path.join(snapshot_dir, "watermarks.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_watermarks(snapshot_dir, watermarks):
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = os.path.join(snapshot_dir, "watermarks.json")
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(watermarks, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def merge_delta(snapshot_df, delta_df, key, key_values, order=None):
+    # drop every snapshot row the delta replaces, then append the fresh rows
+    merged = pd.concat([snapshot_df[~snapshot_df[key].isin(key_values)], delta_df], ignore_index=True)
+    if order:
+        merged = merged.sort_values(order, kind="stable", ignore_index=True)
+    return merged
+
+
+def extract_incremental(conn, db_prefix, id_list, snapshot):
+    # only the OLD DB is read incrementally, the NEW DB reference queries are tiny
+    logger.debug(f"-------------------- Starting the OLD incremental extraction process... --------------------")
+    dataframes = {}
+    changed_ids = {}  # table: ids of the rows fetched in this run, used to refresh their children
+    watermarks = read_watermarks(snapshot.dir)
+    queries = build_queries(db_prefix, "old", id_list)
+
+    for table, query in queries.items():
+        if table not in INCREMENTAL_TABLES:
+            continue
+        column, parent, order = INCREMENTAL_TABLES[table]
+        key = cache_key(snapshot.db_name, snapshot.db_prefix, query)
+        path = os.path.join(snapshot.dir, f"{key}.feather")
+        watermark = watermarks.get(key)
+        parent_ready = parent is None or parent[0] in changed_ids
+
+        if not os.path.exists(path) or (column and watermark is None) or not parent_ready:
+            # first run for this table (or its parent was not read incrementally): full read
+            df, _ = read_query(conn, table, query, "old")
+            if df is None:
+                continue
+            changed_ids[table] = df["id"].tolist() if "id" in df.columns else []
+        else:
+            snapshot_df = read_frame(path)
+            conditions = []
+            if column:
+                conditions.append(f"delta.{column} >= {int(watermark)}")
+            if parent and changed_ids[parent[0]]:
+                parent_ids = ", ".join(str(int(parent_id)) for parent_id in changed_ids[parent[0]])
+                conditions.append(f"delta.{parent[1]} IN ({parent_ids})")
+            if not conditions:
+                delta_df = snapshot_df.iloc[0:0]
+            else:
+                delta_query = f"SELECT * FROM ({query}) AS delta WHERE {' OR '.join(conditions)}"
+                delta_df, _ = read_query(conn, f"{table}_delta", delta_query, "old")
+                if delta_df is None:
+                    continue
+
+            if column:
+                # rows are replaced by id; children of changed parents are replaced as a whole
+                df = merge_delta(snapshot_df, delta_df, "id", delta_df["id"], order)
+                if parent and changed_ids[parent[0]]:
+                    refreshed = delta_df[delta_df[parent[1]].isin(changed_ids[parent[0]])]
+                    df = df[~(df[parent[1]].isin(changed_ids[parent[0]]) & ~df["id"].isin(refreshed["id"]))].reset_index(drop=True)
+            else:
+                df = merge_delta(snapshot_df, delta_df, parent[1], changed_ids[parent[0]], order)
+            changed_ids[table] = delta_df["id"].tolist() if "id" in delta_df.columns else []
+            logger.info(f"{table.upper()}: {len(delta_df)} changed row(s) merged into a snapshot of {len(snapshot_df)} row(s), now {len(df)}.")
+
+        # snapshot first, watermark second: a crash in between only means re-reading a few rows next time
+        write_frame(path, df, snapshot.compression)
+        if column and not df.empty:
+            watermarks[key] = int(df[column].max())
+            write_watermarks(snapshot.dir, watermarks)
+        dataframes[table] = df
+
+    logger.info(f"-------------------- End of OLD incremental extraction process. --------------------")
+    return dataframes
@@ -0,0 +1,188 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+from dotenv import load_dotenv
+from src.logging import start
+
+
+logger = start()
+
+# course status: "loaded" (written in an open target transaction) -> "committed" (target transaction committed) | "failed"
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started REAL NOT NULL,
+    finished REAL,
+    status TEXT NOT NULL,
+    resumed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS courses (
+    old_course_id INTEGER PRIMARY KEY,
+    new_course_id INTEGER,
+    status TEXT NOT NULL,
+    error TEXT,
+    run_id INTEGER NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS id_map (
+    entity TEXT NOT NULL,
+    old_id INTEGER NOT NULL,
+    new_id INTEGER,
+    old_course_id INTEGER NOT NULL,
+    PRIMARY KEY (entity, old_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS id_map_course ON id_map (old_course_id);
+CREATE INDEX IF NOT EXISTS id_map_new ON id_map (entity, new_id);
+CREATE TABLE IF NOT EXISTS commits (
+    run_id INTEGER NOT NULL,
+    number INTEGER NOT NULL,
+    courses INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    total_courses INTEGER NOT NULL,
+    total_rows INTEGER NOT NULL,
+    committed REAL NOT NULL,
+    PRIMARY KEY (run_id, number)
+);
+CREATE TABLE IF NOT EXISTS downloads (
+    old_course_id INTEGER PRIMARY KEY,
+    image_text TEXT,
+    run_id INTEGER NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+def open_journal(path, resume=False):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)  # autocommit: every record is durable once written
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(SCHEMA)
+    run_id = conn.execute("INSERT INTO runs (started, status, resumed) VALUES (?, 'running', ?)", (time.time(), int(resume))).lastrowid
+    # rows "loaded" by a run that never committed them are not in the target DB
+    stale = conn.execute("UPDATE courses SET status = 'failed', error = 'target transaction never committed' WHERE status = 'loaded'").rowcount
+    if stale:
+        logger.warning(f"Run journal: {stale} course(s) loaded by an interrupted run were never committed, they will be loaded again.")
+    logger.info(f"Run journal {path} opened (run {run_id}{', resuming' if resume else ''}).")
+    return SimpleNamespace(conn=conn, lock=threading.Lock(), run_id=run_id, path=path, resume=resume)
+
+
+def finished_courses(journal):
+    with journal.lock:
+        return {row[0] for row in journal.conn.execute("SELECT old_course_id FROM courses WHERE status = 'committed'")}
+
+
+def record_course(journal, old_course_id, new_course_id, mappings=None):
+    # mappings: {entity: {old id: new id}} of this course, they become the persistent id map once the course is committed
+    with journal.lock:
+        journal.conn.execute("BEGIN")
+        journal.conn.execute("INSERT OR REPLACE INTO courses (old_course_id, new_course_id, status, error, run_id, updated) VALUES (?, ?, 'loaded', NULL, ?, ?)",
+                             (int(old_course_id), int(new_course_id), journal.run_id, time.time()))
+        journal.conn.execute("DELETE FROM id_map WHERE old_course_id = ?", (int(old_course_id),))
+        journal.conn.executemany("INSERT OR REPLACE INTO id_map (entity, old_id, new_id, old_course_id) VALUES (?, ?, ?, ?)",
+                                 [(entity, int(old_id), None if new_id is None else int(new_id), int(old_course_id))
+                                  for entity, mapping in (mappings or {}).items() for old_id, new_id in mapping.items() if old_id is not None])
+        journal.conn.execute("COMMIT")
+
+
+def record_failure(journal, old_course_id, error):
+    with journal.lock:
+        journal.conn.execute("INSERT OR REPLACE INTO courses (old_course_id, new_course_id, status, error, run_id, updated) VALUES (?, NULL, 'failed', ?, ?, ?)",
+                             (int(old_course_id), str(error), journal.run_id, time.time()))
+
+
+def mark_committed(journal, old_course_ids=None):
+    # called once the target transaction holding these courses committed (all "loaded" courses of this run by default)
+    with journal.lock:
+        if old_course_ids is None:
+            journal.conn.execute("UPDATE courses SET status = 'committed', updated = ? WHERE status = 'loaded' AND run_id = ?", (time.time(), journal.run_id))
+        else:
+            journal.conn.executemany("UPDATE courses SET status = 'committed', updated = ? WHERE status = 'loaded' AND old_course_id = ?",
+                                     [(time.time(), int(old_id)) for old_id in old_course_ids])
+
+
+def discard_loaded(journal, old_course_ids=None):
+    # the target transaction rolled back: its courses have to be loaded again
+    with journal.lock:
+        if old_course_ids is None:
+            journal.conn.execute("UPDATE courses SET status = 'failed', error = 'target transaction rolled back' WHERE status = 'loaded' AND run_id = ?", (journal.run_id,))
+        else:
+            journal.conn.executemany("UPDATE courses SET status = 'failed', error = 'target transaction rolled back' WHERE status = 'loaded' AND old_course_id = ?",
+                                     [(int(old_id),) for old_id in old_course_ids])
+
+
+def record_commit(journal, old_course_ids, rows, total_courses, total_rows):
+    # one target commit of the LOAD_COMMIT policy: its courses become "committed" and the run progress is kept
+    with journal.lock:
+        journal.conn.execute("BEGIN")
+        journal.conn.executemany("UPDATE courses SET status = 'committed', updated = ? WHERE status = 'loaded' AND old_course_id = ?",
+                                 [(time.time(), int(old_id)) for old_id in old_course_ids])
+        journal.conn.execute("INSERT INTO commits (run_id, number, courses, rows, total_courses, total_rows, committed) "
+                             "SELECT ?, COALESCE(MAX(number), 0) + 1, ?, ?, ?, ?, ? FROM commits WHERE run_id = ?",
+                             (journal.run_id, len(old_course_ids), rows, total_courses, total_rows, time.time(), journal.run_id))
+        journal.conn.execute("COMMIT")
+
+
+def get_mappings(journal, old_course_id):
+    with journal.lock:
+        rows = journal.conn.execute("SELECT entity, old_id, new_id FROM id_map WHERE old_course_id = ?", (int(old_course_id),)).fetchall()
+    mappings = {}
+    for entity, old_id, new_id in rows:
+        mappings.setdefault(entity, {})[old_id] = new_id
+    return mappings
+
+
+def lookup_ids(journal, entity, old_ids, reverse=False):
+    # old id -> new id (new -> old with reverse=True) of rows that are committed in the NEW DB, no query on the target
+    key, value = ("new_id", "old_id") if reverse else ("old_id", "new_id")
+    ids = [int(i) for i in old_ids]
+    found = {}
+    with journal.lock:
+        for start_index in range(0, len(ids), 500):
+            chunk = ids[start_index:start_index + 500]
+            rows = journal.conn.execute(
+                f"SELECT m.{key}, m.{value} FROM id_map m JOIN courses c ON c.old_course_id = m.old_course_id "
+                f"WHERE m.entity = ? AND c.status = 'committed' AND m.{key} IN ({', '.join('?' * len(chunk))})", (entity, *chunk)
+            ).fetchall()
+            found.update(dict(rows))
+    return found
+
+
+def record_download(journal, old_course_id, image_text):
+    with journal.lock:
+        journal.conn.execute("INSERT OR REPLACE INTO downloads (old_course_id, image_text, run_id, updated) VALUES (?, ?, ?, ?)",
+                             (int(old_course_id), image_text, journal.run_id, time.time()))
+
+
+def get_download(journal, old_course_id):
+    # (downloaded?, OCR text of the customcert image)
+    with journal.lock:
+        row = journal.conn.execute("SELECT image_text FROM downloads WHERE old_course_id = ?", (int(old_course_id),)).fetchone()
+    return (row is not None, row[0] if row else None)
+
+
+def close_journal(journal, status):
+    with journal.lock:
+        counts = dict(journal.conn.execute("SELECT status, COUNT(*) FROM courses WHERE run_id = ? GROUP BY status", (journal.run_id,)).fetchall())
+        journal.conn.execute("UPDATE runs SET finished = ?, status = ? WHERE id = ?", (time.time(), status, journal.run_id))
+        journal.conn.close()
+    logger.info(f"Run journal closed (run {journal.run_id}, {status}): {json.dumps(counts)}.")
+
+
+if __name__ == "__main__":
+    # python -m src.journal question 101 102        -> NEW DB ids of OLD questions 101 and 102
+    # python -m src.journal course 250 --reverse    -> OLD course copied into NEW course 250
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Look up the old -> new ids recorded by the run journal.")
+    parser.add_argument("entity", help="course, context, course_sections, course_modules, question, quiz, page...")
+    parser.add_argument("ids", nargs="+", type=int)
+    parser.add_argument("--reverse", action="store_true", help="the ids are NEW DB ids")
+    parser.add_argument("--journal", default=os.getenv("RUN_JOURNAL", "src/run/journal.sqlite"))
+    args = parser.parse_args()
+    store = SimpleNamespace(conn=sqlite3.connect(args.journal), lock=threading.Lock())
+    found = lookup_ids(store, args.entity, args.ids, args.reverse)
+    for wanted_id in args.ids:
+        print(f"{wanted_id} -> {found.get(wanted_id, 'not committed')}")
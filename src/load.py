@@ -1,11 +1,22 @@
 from typing import Dict, List
 import pandas as pd
 import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import SimpleNamespace
 from src.logging import start
-from sqlalchemy import text, bindparam
+from sqlalchemy import text, bindparam, event
 from src.transform import transform_sequence
+from src.catalog import build_catalog, get_table, get_slice, get_slices, get_by_id
+from src.ids import insert_with_ids, insert_with_mapping
+from src.writer import append_rows, save_writer_timings
+from src.ftp_pool import get_ftp_config
+from src.file_store import fetch, link_object, has_object, evict_file_store, file_store_summary
+from src.metrics import record, record_item, start_course, finish_course
+from src.journal import record_course, record_failure, mark_committed, discard_loaded, record_commit, record_download, get_download
 from datetime import datetime
-from ftplib import FTP
 from dotenv import load_dotenv
 from PIL import Image
 import easyocr
@@ -15,24 +26,25 @@ import cv2
 load_dotenv()
 logger = start()
 timestamp = int(datetime.now().timestamp())
+# files downloaded at once by downloading(), 0 = FTP_POOL_SIZE (every worker gets its own pooled session)
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "0"))
+# easyocr on the GPU: one image at a time, whatever the number of download workers
+ocr_lock = threading.Lock()
 
 
 def insert_new_and_mapping(conn, id, mapping, element_df, element_table, new_course_id, element_type):
     if not element_df.empty:
         element_filtered = element_df[element_df["course"] == id].copy()
         if not element_filtered.empty:
-            for _, row in element_filtered.iterrows():
-                old_id = row["id"]
-                element_name = row["name"]
-                new_page_ex_element = create_page_ex_element_df(element_type, new_course_id, element_name)
-                new_page_ex_element.to_sql(element_table, conn, if_exists="append", index=False)
-                result = conn.execute(text(f"SELECT id FROM {element_table} WHERE course = :course_id ORDER BY id DESC LIMIT 1"), {"course_id": new_course_id}).scalar()
-                mapping[old_id] = result
+            new_page_ex_elements = pd.concat([create_page_ex_element_df(element_type, new_course_id, element_name) for element_name in element_filtered["name"]],
+                                             ignore_index=True)
+            mapping.update(insert_with_mapping(conn, element_table, new_page_ex_elements, element_filtered["id"].tolist()))
             logger.info(f"{len(element_filtered)} NEW PAGE element(s) to represent OLD {element_type.upper()}(s) inserted successfully! OLD COURSE ID: {id} | NEW COURSE ID: {new_course_id}")
 
 
 def insert_and_mapping(conn, loop_id, new_course_id, instance_name, mapping, df, table,
                        param_1=None, param_2=None, param_3=None, param_4=None, param_5=None, param_6=None, param_7=None, param_8=None, param_9=None, param_10=None):
+    # write errors are logged and raised: if_table_course rolls the whole course back to its savepoint and journals it as failed
     if not df.empty:
         df_filtered = df[df[param_3] == param_1].copy()
         if not df_filtered.empty:
@@ -42,23 +54,22 @@ def insert_and_mapping(conn, loop_id, new_course_id, instance_name, mapping, df,
             if param_10 in df_filtered.columns:
                 df_filtered = df_filtered.drop(columns=[param_10])
             try:
-                df_filtered.to_sql(table, conn, if_exists="append", index=False)
-                result = conn.execute(text(f"SELECT id FROM {table} WHERE {param_3} = :param ORDER BY id"), {"param": param_2}).fetchall()
-                new_ids_list = [row[0] for row in result]
-                mapping.update(dict(zip(old_ids_list, new_ids_list)))
+                mapping.update(insert_with_mapping(conn, table, df_filtered, old_ids_list))
                 if param_9 is not None and not param_9.empty:
                     df_filtered_2 = param_9[param_9[param_8].isin(old_ids_list)].copy()
                     if not df_filtered_2.empty:
                         df_filtered_2 = df_filtered_2.drop(columns=["id"])
                         try:
                             df_filtered_2[param_8] = df_filtered_2[param_8].map(mapping)
-                            df_filtered_2.to_sql(param_7, conn, if_exists="append", index=False)
+                            append_rows(conn, param_7, df_filtered_2)
                             logger.info(f"{len(df_filtered_2)} {param_6}(s) inserted for course {new_course_id}.")
                         except Exception as e:
                             logger.error(f"Error inserting {param_6.upper()} for course {new_course_id}: {e}")
+                            raise
                 logger.info(f"{len(df_filtered)} {instance_name}(s) inserted for course {new_course_id}.")
             except Exception as e:
                 logger.error(f"Error inserting {instance_name.upper()} for course {new_course_id}: {e}")
+                raise
         else:
             logger.warning(f"No {instance_name.upper()} entries found for course {loop_id}.")
 
@@ -156,46 +167,47 @@ def create_course_customfield_data_df(new_course_id, new_course_context_id, cust
     return filtered_df[final_columns]
 
 
-def download_from_ftp(contenthash, filename, course_shortname, course_original_id, element):
+def get_local_path(filename, course_shortname, course_original_id, element):
     if element == "customcert":
         file_ext = ".jpeg"
         name_part = "conteudo_programatico"
-        base_dir = f"src/files/customcert/{course_shortname}"
-        local_dir = os.path.join(base_dir, "images")
-        texts_dir = os.path.join(base_dir, "texts")
-        os.makedirs(texts_dir, exist_ok=True)
+        local_dir = os.path.join(f"src/files/customcert/{course_shortname}", "images")
     else:
         file_ext = os.path.splitext(filename)[1].lower()
         name_part = os.path.splitext(filename)[0]
         local_dir = f"src/files/{element}/{course_shortname}"
-    
-    os.makedirs(local_dir, exist_ok=True)
-    folder1 = contenthash[:2]
-    folder2 = contenthash[2:4]
+    safe_name_part = name_part.replace(" ", "_")
+    return os.path.join(local_dir, f"old_{course_original_id}_{safe_name_part}_{course_shortname}{file_ext}")
 
-    ftp = FTP()
-    ftp.connect(os.getenv("FTP_HOST"), 21)
-    ftp.login(user=os.getenv("FTP_USER"), passwd=os.getenv("FTP_PASSWORD"))
-    base_dir = os.getenv("FTP_BASE_DIR")
-    ftp.cwd(f"{base_dir}/{folder1}/{folder2}")
 
-    safe_name_part = name_part.replace(" ", "_")
-    local_filename = f"old_{course_original_id}_{safe_name_part}_{course_shortname}{file_ext}"
-    local_path = os.path.join(local_dir, local_filename)
+def download_from_ftp(contenthash, filename, course_shortname, course_original_id, element):
+    local_path = get_local_path(filename, course_shortname, course_original_id, element)
+    local_dir, local_filename = os.path.split(local_path)
+    if element == "customcert":
+        os.makedirs(os.path.join(os.path.dirname(local_dir), "texts"), exist_ok=True)
+    os.makedirs(local_dir, exist_ok=True)
+
     if os.path.exists(local_path):
         logger.info(f"File {local_filename} already exists. Skipping download.")
         if element == "customcert":
             return extract_text_from_image(os.path.abspath(local_path), course_shortname)
         return None
-    temp_path = os.path.join(local_dir, f"{contenthash}_temp")
 
     image_text = None
     try:
-        with open(temp_path, "wb") as temp_file:
-            ftp.retrbinary(f"RETR {contenthash}", temp_file.write)
+        download_start = time.perf_counter()
+        # src.file_store: one verified copy per contenthash, fetched over a pooled FTP session only when no course brought it in before
+        object_path, downloaded = fetch(contenthash)
+        download_seconds, size = time.perf_counter() - download_start, os.path.getsize(object_path)
+        if downloaded:
+            record("download", element, download_seconds, rows_out=1, size=size)
+        else:
+            record("download", "stored", download_seconds, rows_out=1, size=size)
+        record_item("downloads", course=int(course_original_id), element=element, filename=filename, bytes=size, seconds=round(download_seconds, 4),
+                    bytes_per_second=round(size / download_seconds) if download_seconds and downloaded else None, stored=not downloaded)
         
         if element == "customcert":
-            with Image.open(temp_path) as img:
+            with Image.open(object_path) as img:
                 if img.mode == "RGBA":
                     background = Image.new("RGBA", img.size, (255, 255, 255))
                     img = Image.alpha_composite(background, img).convert("RGB")
@@ -204,13 +216,10 @@ def download_from_ftp(contenthash, filename, course_shortname, course_original_i
                 img.save(local_path, "JPEG", quality=95)
             image_text = extract_text_from_image(os.path.abspath(local_path), course_shortname)
         else:
-            os.rename(temp_path, local_path)
+            link_object(object_path, local_path)
     except Exception as e:
         logger.error(f"Error downloading file {local_filename}: {e}")
     finally:
-        ftp.quit()
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
         logger.info(f"File {local_filename} downloaded successfully to {local_dir}.")
 
     if element == "customcert":
@@ -219,10 +228,12 @@ def download_from_ftp(contenthash, filename, course_shortname, course_original_i
 
 
 def extract_text_from_image(image_path, course_shortname):
-    reader = easyocr.Reader(['pt', 'en'], gpu=True)
-    left_img, right_img = split_image(image_path)
-    left_text, left_conf = text_extract(left_img, reader)
-    right_text, right_conf = text_extract(right_img, reader)
+    ocr_start = time.perf_counter()
+    with ocr_lock:
+        reader = easyocr.Reader(['pt', 'en'], gpu=True)
+        left_img, right_img = split_image(image_path)
+        left_text, left_conf = text_extract(left_img, reader)
+        right_text, right_conf = text_extract(right_img, reader)
     full_text = f"{left_text}\n\n\n{right_text}"
     full_conf = (left_conf + right_conf) / 2
     base = os.path.splitext(os.path.basename(image_path))[0]
@@ -238,6 +249,10 @@ def extract_text_from_image(image_path, course_shortname):
                 logger.info(f"Temporary file deleted: {temp_img}")
         except Exception as e:
             logger.error(f"Error deleting temporary image {temp_img}: {e}")
+    ocr_seconds = time.perf_counter() - ocr_start
+    record("ocr", "customcert", ocr_seconds, rows_out=1, size=len(full_text))
+    record_item("ocr", course=course_shortname, image=os.path.basename(image_path), characters=len(full_text), confidence=round(full_conf, 3),
+                seconds=round(ocr_seconds, 4))
     logger.info(f"Extracted text (avg confidence {full_conf:.2f}) saved to: {output_path}")
     return full_text
 
@@ -384,13 +399,365 @@ def insert_question_type(conn, qtype_name_as_string, qtype_df, qtype_table, ques
                 qtype_filtered[option_column] = 0
             qtype_filtered = qtype_filtered.drop(columns=["id"])
             try:
-                qtype_filtered.to_sql(qtype_table, conn, if_exists="append", index=False)
+                append_rows(conn, qtype_table, qtype_filtered)
                 logger.info(f"{len(qtype_filtered)} {qtype_name_as_string}(s) inserted for course {new_course_id}.")
             except Exception as e:
                 logger.error(f"Error inserting {qtype_name_as_string.upper()} for course {new_course_id}: {e}")
+                raise
+
+
+COURSE_MODULES_COLUMNS = ["course", "module", "instance", "section", "added", "score", "indent", "visible", "visibleold", "groupmode", "groupingid",
+                          "completion", "completiongradeitemnumber", "completionview", "completionexpected", "availability", "showdescription"]
+
+
+def sql_concat(conn, *parts):
+    # MySQL's CONCAT(); SQLite (the src.simulate target) only has || (MySQL reads || as OR)
+    if conn.dialect.name == "sqlite":
+        return " || ".join(parts)
+    return f"CONCAT({', '.join(parts)})"
+
+
+def insert_course_modules(conn, course_modules_df, course_modules_table, context_table, new_course_ids):
+    # one INSERT for the modules, one for their contexts (contextlevel 70), one UPDATE ... JOIN for every context path
+    # (course contexts must already have their path, the cm path is the course context path + the cm context id)
+    contional_modules = [5, 7, 8, 16, 17, 18, 21, 27, 29]  # modules to be inserted with specific RESTRICTIONS
+    contional_modules2 = [13]  # modules to be inserted with specific RESTRICTIONS
+    """
+    5 = choice
+    7 = feedback
+    8 = folder
+    13 = label
+    16 = page
+    17 = quiz
+    18 = resource
+    21 = url
+    27 = hvp
+    29 = customcert
+    """
+    cm_df = course_modules_df[COURSE_MODULES_COLUMNS].copy()
+    cm_df.loc[cm_df["module"].isin(contional_modules), "availability"] = '{"op":"&","c":[{"type":"completion","cm":-1,"e":1}],"showc":[true]}'
+    cm_df.loc[cm_df["module"].isin(contional_modules2), "availability"] = '{"op":"|","c":[],"show":true}'
+    cm_df = cm_df.replace({"": None})
+    new_cm_ids = insert_with_ids(conn, course_modules_table, cm_df)
+
+    context_df = pd.DataFrame({"contextlevel": 70, "instanceid": new_cm_ids, "depth": 4, "path": None})
+    new_context_ids = insert_with_ids(conn, context_table, context_df)
+    if conn.dialect.name == "sqlite":
+        # simulation target (src.simulate): no UPDATE ... JOIN, a correlated subquery instead
+        stmt = text(f"""
+            UPDATE {context_table}
+            SET path = (SELECT {sql_concat(conn, "course_ctx.path", "'/'", f"{context_table}.id")}
+                        FROM {course_modules_table} cm
+                        JOIN {context_table} course_ctx ON course_ctx.contextlevel = 50 AND course_ctx.instanceid = cm.course
+                        WHERE cm.id = {context_table}.instanceid)
+            WHERE contextlevel = 70 AND instanceid IN (SELECT id FROM {course_modules_table} WHERE course IN :course_ids)
+        """)
+    else:
+        stmt = text(f"""
+            UPDATE {context_table} ctx
+            JOIN {course_modules_table} cm ON cm.id = ctx.instanceid
+            JOIN {context_table} course_ctx ON course_ctx.contextlevel = 50 AND course_ctx.instanceid = cm.course
+            SET ctx.path = {sql_concat(conn, "course_ctx.path", "'/'", "ctx.id")}
+            WHERE ctx.contextlevel = 70 AND cm.course IN :course_ids
+        """)
+    stmt = stmt.bindparams(bindparam("course_ids", expanding=True))
+    conn.execute(stmt, {"course_ids": list(new_course_ids)})
+
+    # new cm ids and their context ids, in the row order of course_modules_df
+    return new_cm_ids, new_context_ids
+
+
+def build_cm_index(course_modules_df, cm_mapping, cm_context_mapping):
+    # (new module id, new instance id) -> new cm id and its context id, straight from the bulk module insert
+    return pd.DataFrame({
+        "module": course_modules_df["module"].values,
+        "instance": course_modules_df["instance"].values,
+        "cm_id": course_modules_df["old_id"].map(cm_mapping).values,
+        "context_id": course_modules_df["old_id"].map(cm_context_mapping).values
+    })
+
+
+def get_cm_and_context(cm_index, module_id, instance):
+    # the last cm of that module pointing to `instance` (what "ORDER BY id DESC LIMIT 1" used to pick)
+    matches = cm_index[(cm_index["module"] == module_id) & (cm_index["instance"] == instance)]
+    if matches.empty:
+        return None, None
+    return int(matches["cm_id"].iloc[-1]), int(matches["context_id"].iloc[-1])
+
+
+def build_question_references_df(quiz_slots_df, quiz_slots_mapping, question_mapping, bank_entry_mapping, quiz_mapping, cm_index, quiz_module_id, new_course_id):
+    if not quiz_slots_mapping:
+        return pd.DataFrame()
+    slots = quiz_slots_df[quiz_slots_df["id"].isin(quiz_slots_mapping.keys())][["id", "quizid", "questionid"]].copy()
+    slots["itemid"] = slots["id"].map(quiz_slots_mapping)
+    slots["questionbankentryid"] = slots["questionid"].map(question_mapping).map(bank_entry_mapping)
+    quiz_cms = cm_index[cm_index["module"] == quiz_module_id].drop_duplicates("instance", keep="last")
+    quiz_contexts = dict(zip(quiz_cms["instance"], quiz_cms["context_id"]))
+    slots["usingcontextid"] = slots["quizid"].map(quiz_mapping).map(quiz_contexts)
+
+    missing = slots["questionbankentryid"].isna() | slots["usingcontextid"].isna()
+    if missing.any():
+        logger.warning(f"{int(missing.sum())} quiz slot(s) skipped for course {new_course_id}: no question bank entry or quiz context found (old slot ids: {slots.loc[missing, 'id'].tolist()}).")
+    slots = slots[~missing]
+    return pd.DataFrame({
+        "usingcontextid": slots["usingcontextid"].astype("int64"),
+        "component": "mod_quiz",
+        "questionarea": "slot",
+        "itemid": slots["itemid"].astype("int64"),
+        "questionbankentryid": slots["questionbankentryid"].astype("int64")
+    })
+
+
+def transform_course_sections_df(course_sections_df, course_language):
+    # availability, summaries and renames of the copied sections (the caller handles ids, course and sequence)
+    course_sections_df.loc[course_sections_df["name"].str.strip().str.lower().isin(["conteúdo", "content"]),
+                           "availability"] = '{"op":"|","c":[],"show":false}'
+    mask1 = course_sections_df["name"].str.strip().str.lower().isin(["avaliações finais", "certificado", "final assessments", "certificate"])
+    course_sections_df.loc[mask1, "availability"] = '{"op":"&","c":[{"type":"completion","cm":-1,"e":1}],"showc":[false]}'
+    mask2 = course_sections_df["name"].str.strip().str.lower().isin(["avaliações finais", "final assessments"])
+    if course_language == "en":
+        summary_text = """
+                                        <div id="yui_3_17_2_1_1729086180475_803" align="right">
+                                        <table>
+                                            <tbody>
+                                            <tr>
+                                                <td>{courseprogressbar}</td>
+                                            </tr>
+                                            <tr>
+                                                <td>{courseprogress}</td>
+                                            </tr>
+                                            </tbody>
+                                        </table>
+                                        </div>
+                                        <p>In our distance learning methodology, the course includes two fundamental
+                                        assessments:</p>
+                                        <p>1 - <strong>Final Assessment</strong>: covers the theoretical part of the
+                                        course;</p>
+                                        <p>2 - <strong>Satisfaction Feedback:</strong> focuses on your feedback regarding
+                                        the course.</p>
+                                        <p>All the assessments above are conducted here on the platform.</p>
+                                        <p dir="ltr"></p>
+                                        <p dir="ltr"><span class=""><strong>Attention:</strong> The certificate is
+                                            pending completion of both assessments above.</span></p>
+                                        """
+        summary_text2 = """
+                                        <p>The course completion certificate is a professional and personal achievement
+                                        that indicates the student has reached a satisfactory level of training,
+                                        equipping and qualifying them to work more safely.</p>
+                                        <p>Talismã's certificate is valid throughout the national territory and meets
+                                        all the requirements of Brazilian legislation, including references to
+                                        Regulatory Standards, the Brazilian Navy, and market standards.</p>
+                                        <p><strong>Attention:</strong> The certificate is issued when class attendance
+                                        exceeds 75%, and upon passing both the Final and Practical Assessments, if
+                                        applicable. Don't forget to complete the Satisfaction Feedback—we value your
+                                        feedback.</p>
+                                        """
+        summary_text3 = """
+                                        <p>The <strong>Final Assessment</strong> aims to evaluate the
+                                        progression of the learning process within the course, summarizing key
+                                        learnings based on general criteria.</p>
+                                        <p>Here are some important criteria:</p>
+                                        <p>1 - The assessment is only available after completing all intermediate
+                                        assessments;</p>
+                                        <p>2 - The duration for completing the assessment is <strong>1 hour (60
+                                            minutes)</strong>;</p>
+                                        <p>3 - The <strong>minimum passing score is 70%</strong>. If a <strong>Practical Assessment</strong> is applicable, the final score is the
+                                        arithmetic average of the Final and Practical Assessments;
+                                        </p>
+                                        <p>4 - Up to <strong>two attempts</strong> are allowed;</p>
+                                        <p>5 - In case of failure in both attempts, please contact us through one of our
+                                        support channels.</p>
+                                        """
+    else:
+        summary_text = """
+                                        <div id="yui_3_17_2_1_1729086180475_803" align="right">
+                                        <table>
+                                            <tbody>
+                                            <tr>
+                                                <td>{courseprogressbar}</td>
+                                            </tr>
+                                            <tr>
+                                                <td>{courseprogress}</td>
+                                            </tr>
+                                            </tbody>
+                                        </table>
+                                        </div>
+                                        <p>Em nossa metodologia de ensino a distância o curso tem duas avaliações
+                                        fundamentais, que são:</p>
+                                        <p>1 - <strong>Avaliação Final</strong>: aborda a parte teórica do curso;</p>
+                                        <p>2 - <strong>Pesquisa de Satisfação: </strong>aborda a sua receptividade ao
+                                        curso.</p>
+                                        <p>Todas as avaliações acima são realizadas aqui na plataforma.</p>
+                                        <p dir="ltr"></p>
+                                        <p dir="ltr"><span class="">Atenção: O certificado está pendente a conclusão das
+                                            duas avaliações acima.</span></p>
+                                       """
+        summary_text2 = """
+                                        <p dir="ltr" id="yui_3_17_2_1_1729087194198_803">O certificado de conclusão de
+                                        curso é uma conquista profissional e pessoal que indica que o aluno alcançou
+                                        nível de treinamento satisfatório capacitando-o e qualificando-o a trabalhar
+                                        de forma mais segura.</p>
+                                        <p dir="ltr">O certificado da Talismã é válido em todo território nacional e
+                                        atende todos os requisitos da legislação brasileira como referências as Normas
+                                        Regulamentadoras, Marinha do Brasil e padrões do mercado.</p>
+                                        <p dir="ltr" id="yui_3_17_2_1_1729087194198_788"><span
+                                            id="yui_3_17_2_1_1729087194198_787" class=""><strong>Atenção:</strong>  O
+                                            certificado é emitido na frequência das aulas acima de 75%, na aprovação na
+                                            Avaliação Final e Avaliação Prática caso aplicável. Não esqueça de realizar
+                                            a Pesquisa de Satisfação, contamos com sua opinião.</span></p>
+                                       """
+        summary_text3 = """
+                                        <p>A <strong>Avaliação Final</strong> tem como objetivo fazer um balanço da sequência de trabalho de
+                                            formação do conteúdo previsto no curso sintetizando as aprendizagens tendo por
+                                            bases critérios gerais.</p>
+                                        <p>Segue alguns critérios importantes:</p>
+                                        <p>1 - A avaliação está disponível somente após a realização de todas as avaliações intermediárias;&nbsp;&nbsp;</p>
+                                        <p>2 - Duração para realização da avaliação é de 01 hora (60 minutos);</p>
+                                        <p>3 - Nota mínima para aprovação é
+                                            de 70%, caso aplicável a avaliação prática, a nota final é a
+                                            média aritmética da avaliação final e avaliação prática;</p>
+                                        <p>4 - São permitidas até duas tentativas;</p>
+                                        <p>5 - Caso de reprovação nas duas tentativas, entrar em contato em um dos nossos canais de atendimentos.</p>                                       
+                                        """
+    course_sections_df.loc[mask2, "summary"] = summary_text
+    mask3 = course_sections_df["name"].str.strip().str.lower().isin(["certificado", "certificate"])
+    course_sections_df.loc[mask3, "summary"] = summary_text2
+    mask4 = course_sections_df["name"].str.strip().str.lower().isin(["avaliação das atividades teórica", "theoretical activities assessment"])
+    course_sections_df.loc[mask4, "summary"] = summary_text3
+    course_sections_df["name"] = course_sections_df["name"].replace({
+        "Avaliações Finais": "Avaliação",
+        "Final Assessments": "Assessment",
+        "Avaliação das Atividades Práticas": "Avaliação",
+        "Avaliação das Atividades Prática": "Avaliação",
+        "Avaliação das Atividades Teórica": "Avaliação",
+        "Practical Activities Assessment": "Assessment",
+        "Theoretical Activities Assessment": "Assessment",
+        "Evaluation of Practical Activities": "Assessment"
+    })
+    mask5 = course_sections_df["name"].str.strip().str.lower().isin(["sobre o curso", "about the course"])
+    course_sections_df.loc[mask5, "summary"] = course_sections_df.loc[mask5, "summary"].str.replace(
+        "{course_field_carga_horaria}",
+        "{course_field_ch}",
+        regex=False
+    )
+
+    return course_sections_df
+
+
+def create_course_df(course_df, category):
+    # OLD course rows as NEW courses of `category` (shortname and idnumber prefixed with the category id)
+    course_df = course_df.copy()
+    course_df["category"] = category
+    course_df["shortname"] = course_df["category"].astype(str) + "-" + course_df["shortname"]
+    course_df["idnumber"] = course_df["shortname"]
+    return course_df.drop(columns=["id", "originalcourseid"])
+
+
+# modules whose instances were copied to a table of the same name (resources and hvps became pages)
+CM_INSTANCE_MODULES = ("quiz", "label", "url", "page", "resource", "hvp", "forum", "reengagement", "choice", "enrol")
+
+
+def remap_course_modules(course_modules_df, old_modules_map, new_modules_map, instance_maps, feedback_ids, customcert_ids):
+    # OLD course modules, tagged with their "old_course", pointed at the NEW modules and instances (if_table_course and src.planner.load_batch)
+    # - instance_maps: {module name: {(old course, old instance): new instance}}, an instance without a mapping keeps its old id
+    # - feedback_ids: {old course: new feedback}, customcert_ids: {old course: [new customcert ids]} (in the course's cm order)
+    df = course_modules_df
+    df["module"] = df["module"].map(lambda func: new_modules_map.get(old_modules_map.get(func)))
+    df["instance"] = df["instance"].astype(object)
+    for module_name in CM_INSTANCE_MODULES:
+        mask = df["module"] == new_modules_map.get(module_name)
+        if mask.any():
+            mapping = instance_maps.get(module_name, {})
+            df.loc[mask, "instance"] = [mapping.get((course, instance), instance) for course, instance in zip(df.loc[mask, "old_course"], df.loc[mask, "instance"])]
+    df.loc[df["module"].isin([new_modules_map.get("resource"), new_modules_map.get("hvp")]), "module"] = new_modules_map.get("page")
+    reengagement_module_id = new_modules_map.get("reengagement")
+    if reengagement_module_id:
+        df.loc[df["module"] == reengagement_module_id, ["visible", "visibleold", "availability"]] = [0, 0, None]
+    feedback_mask = df["module"] == new_modules_map.get("feedback")
+    df.loc[feedback_mask, "instance"] = df.loc[feedback_mask, "old_course"].map(feedback_ids)
+    customcert_rows = df[df["module"] == new_modules_map.get("customcert")]
+    for old_course, group in customcert_rows.groupby("old_course", sort=False):
+        for i, cc_id in zip(group.index, customcert_ids.get(old_course, [])):
+            df.loc[i, "instance"] = cc_id
+    df["old_id"] = df["id"]
+    return df
 
 
-def if_table_course(conn, image_texts, table: str, ids: List[int], dataframes: Dict[str, pd.DataFrame], new_db: str = '', category: int = 1, cc_template_to_use=None, course_language=None):
+def get_suppress_targets(course_modules_df, new_modules_map):
+    # {old course: old cm id} of what the course's reengagement waits for: its last added quiz/page completed by view
+    # (courses without one are left out, their reengagement keeps no suppresstarget)
+    target_modules = [m for m in (new_modules_map.get("quiz"), new_modules_map.get("page")) if m is not None]
+    targets = course_modules_df[(course_modules_df["completion"] == 2) & (course_modules_df["completionview"] == 1) &
+                                (course_modules_df["module"].isin(target_modules))]
+    return {old_course: int(group.loc[group["added"] == group["added"].max(), "old_id"].iat[0])
+            for old_course, group in targets.groupby("old_course", sort=False)}
+
+
+def update_suppress_targets(conn, reengagement_table, suppress_targets):
+    # {new course: new cm id}: one UPDATE for every course's "course continuation alert"
+    if not suppress_targets:
+        return
+    params = {f"c{i}": course for i, course in enumerate(suppress_targets)}
+    params.update({f"v{i}": target for i, target in enumerate(suppress_targets.values())})
+    cases = " ".join(f"WHEN :c{i} THEN :v{i}" for i in range(len(suppress_targets)))
+    stmt = text(f"""
+        UPDATE {reengagement_table}
+        SET suppresstarget = CASE course {cases} END
+        WHERE course IN :courses
+        AND lower(trim(name)) IN :names
+    """).bindparams(bindparam("courses", expanding=True), bindparam("names", expanding=True))
+    conn.execute(stmt, {**params, "courses": list(suppress_targets), "names": ["alerta de continuação do curso", "course continuation alert"]})
+    logger.info(f"REENGAGEMENT suppresstarget updated for {len(suppress_targets)} course(s): {suppress_targets}")
+
+
+def get_first_available_cms(course_sections_df):
+    # {old course: new cm id} of the first module after the "Conteúdo"/"Content" section, always available
+    # (sections tagged with their "old_course", sequences already pointing at the NEW cms)
+    available = {}
+    for old_course, group in course_sections_df.groupby("old_course", sort=False):
+        content = group.loc[group["name"].isin(["Conteúdo", "Content"]), "section"]
+        if content.empty:
+            continue
+        following = group[group["section"] > content.min()].sort_values("section")
+        if following.empty or not following["sequence"].iloc[0]:
+            continue
+        sequence_ids = [int(x) for x in str(following["sequence"].iloc[0]).split(",") if x.strip().isdigit()]
+        if sequence_ids:
+            available[old_course] = sequence_ids[0]
+    return available
+
+
+def make_available(conn, course_modules_table, cm_ids):
+    if not cm_ids:
+        return
+    stmt = text(f"UPDATE {course_modules_table} SET availability = :availability WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+    conn.execute(stmt, {"availability": '{"op":"|","c":[],"show":true}', "ids": list(cm_ids)})
+
+
+def create_course_format_options_df(format_options_df, section_ids, course_ids):
+    # OLD format options, tagged with their "old_course", for the NEW courses: section_ids {(old course, old section): new section},
+    # course_ids {old course: new course}; sectionid 0 (or empty) is a course-wide option
+    df = format_options_df.copy()
+    old_section_ids = df["sectionid"].fillna(-1).astype(int)
+    df["sectionid"] = [section_ids.get((course, sid)) if sid > 0 else 0 for course, sid in zip(df["old_course"], old_section_ids)]
+    df["sectionid"] = df["sectionid"].astype("Int64")  # Pandas nullable int
+    df["courseid"] = df["old_course"].map(course_ids)
+    return df.drop(columns=["id", "old_course"])
+
+
+def get_target_lookups(conn, new_db, category, reference=None):
+    # NEW DB reference rows every course needs: read once, then shared read-only by every course (and every load worker)
+    if reference is not None:
+        # src.reference cache: already loaded (or read from disk) for the whole run
+        return SimpleNamespace(modules_map=reference.modules_map, context_category_id=reference.category_contexts.get(category))
+    modules = conn.execute(text(f"SELECT id, name FROM {new_db.prefix}_modules")).mappings()
+    context_category_id = conn.execute(text(f"SELECT id FROM {new_db.prefix}_context WHERE contextlevel = 40 AND instanceid = :category LIMIT 1"),
+                                       {"category": category}).scalar()
+    return SimpleNamespace(modules_map={row["name"]: row["id"] for row in modules}, context_category_id=context_category_id)
+
+
+def if_table_course(conn, image_texts, table: str, ids: List[int], dataframes: Dict[str, pd.DataFrame], new_db: str = '', category: int = 1, cc_template_to_use=None, course_language=None, catalog=None,
+                    lookups=None, journal=None):
     course_table = f"{new_db.prefix}_{table}"
     context_table = f"{new_db.prefix}_context"
     sections_table = f"{new_db.prefix}_course_sections"
@@ -439,98 +806,77 @@ def if_table_course(conn, image_texts, table: str, ids: List[int], dataframes: D
     local_recompletion_config_table = f"{new_db.prefix}_local_recompletion_config"
     
     module_instance_mapping = {}
+    loaded_ids = []  # returned: the courses written completely (the failed ones were rolled back to their savepoint)
+
+    # every per-course slice below is a lookup in the pre-grouped catalog instead of a boolean-mask scan
+    if catalog is None:
+        catalog = build_catalog(dataframes)
+    modules_df = get_table(catalog, "modules")
+    old_modules_map = dict(zip(modules_df["id"], modules_df["name"]))
+    feedback_item_df = dataframes.get(f"feedback_item_{course_language}", pd.DataFrame())
+    questions_by_id = get_by_id(catalog, "question")
+    if lookups is None:
+        lookups = get_target_lookups(conn, new_db, category)
+    new_modules_map = lookups.modules_map
 
     for id in ids:
-        course_df = dataframes.get("course", pd.DataFrame())
-        sections_df = dataframes.get("course_sections", pd.DataFrame())
-        course_sections_df = sections_df[sections_df["course"] == id].copy()
-        modules_df = dataframes.get("modules", pd.DataFrame())
-        course_modules_df = dataframes.get("course_modules", pd.DataFrame())
-        old_modules_map = dict(zip(modules_df["id"], modules_df["name"]))
-        old_modules_result = conn.execute(text(f"SELECT id, name FROM {modules_table}")).mappings()
-        new_modules_map = {row["name"]: row["id"] for row in old_modules_result}
-        course_modules_filtered_df = course_modules_df[course_modules_df["course"] == id].copy()
-        course_format_options_df = dataframes.get("course_format_options", pd.DataFrame())
-        course_format_options_filtered = course_format_options_df[course_format_options_df["courseid"] == id].copy()
-        page_df = dataframes.get("page", pd.DataFrame())
-        label_df = dataframes.get("label", pd.DataFrame())
-        url_df = dataframes.get("url", pd.DataFrame())
-        enrol_df = dataframes.get("enrol", pd.DataFrame())
-        resource_df = dataframes.get("resource", pd.DataFrame())
-        quiz_df = dataframes.get("quiz", pd.DataFrame())
-        forum_df = dataframes.get("forum", pd.DataFrame())
-        reengagement_df = dataframes.get("reengagement", pd.DataFrame())
-        choice_df = dataframes.get("choice", pd.DataFrame())
-        choice_options_df = dataframes.get("choice_options", pd.DataFrame())
-        feedback_item_df = dataframes.get(f"feedback_item_{course_language}", pd.DataFrame())
-        customfield_data_old_df = dataframes.get("customfield_data", pd.DataFrame())
-        hvp_df = dataframes.get("hvp", pd.DataFrame())
-        question_categories_df = dataframes.get("question_categories", pd.DataFrame())
-        question_df = dataframes.get("question", pd.DataFrame())
-        question_answers_df = dataframes.get("question_answers", pd.DataFrame())
-        quiz_slots_df = dataframes.get("quiz_slots", pd.DataFrame())
-        courses_context_df = dataframes.get("context_course", pd.DataFrame())
-        quiz_sections_df = dataframes.get("quiz_sections", pd.DataFrame())
-        qtype_ddimageortext_df = dataframes.get("qtype_ddimageortext", pd.DataFrame())
-        qtype_ddimageortext_drags_df = dataframes.get("qtype_ddimageortext_drags", pd.DataFrame())
-        qtype_ddimageortext_drops_df = dataframes.get("qtype_ddimageortext_drops", pd.DataFrame())
-        qtype_ddmarker_df = dataframes.get("qtype_ddmarker", pd.DataFrame())
-        qtype_ddmarker_drags_df = dataframes.get("qtype_ddmarker_drags", pd.DataFrame())
-        qtype_ddmarker_drops_df = dataframes.get("qtype_ddmarker_drops", pd.DataFrame())
-        qtype_essay_options_df = dataframes.get("qtype_essay_options", pd.DataFrame())
-        qtype_match_options_df = dataframes.get("qtype_match_options", pd.DataFrame())
-        qtype_match_subquestions_df = dataframes.get("qtype_match_subquestions", pd.DataFrame())
-        qtype_multichoice_options_df = dataframes.get("qtype_multichoice_options", pd.DataFrame())
-        qtype_randomsamatch_options_df = dataframes.get("qtype_randomsamatch_options", pd.DataFrame())
-        qtype_shortanswer_options_df = dataframes.get("qtype_shortanswer_options", pd.DataFrame())
-        question_ddwtos_df = dataframes.get("question_ddwtos", pd.DataFrame())
-        question_gapselect_df = dataframes.get("question_gapselect", pd.DataFrame())
-        question_truefalse_df = dataframes.get("question_truefalse", pd.DataFrame())
-
-        course = course_df[course_df["id"] == id]
+        course_sections_df = get_slice(catalog, "course_sections", "course", id)
+        course_modules_filtered_df = get_slice(catalog, "course_modules", "course", id)
+        course_format_options_filtered = get_slice(catalog, "course_format_options", "courseid", id)
+        page_df = get_slice(catalog, "page", "course", id)
+        label_df = get_slice(catalog, "label", "course", id)
+        url_df = get_slice(catalog, "url", "course", id)
+        enrol_df = get_slice(catalog, "enrol", "courseid", id)
+        resource_df = get_slice(catalog, "resource", "course", id)
+        quiz_df = get_slice(catalog, "quiz", "course", id)
+        forum_df = get_slice(catalog, "forum", "course", id)
+        reengagement_df = get_slice(catalog, "reengagement", "course", id)
+        choice_df = get_slice(catalog, "choice", "course", id)
+        choice_options_df = get_slices(catalog, "choice_options", "choiceid", choice_df["id"].tolist() if not choice_df.empty else [])
+        customfield_data_old_df = get_slice(catalog, "customfield_data", "instanceid", id)
+        hvp_df = get_slice(catalog, "hvp", "course", id)
+        courses_context_df = get_slice(catalog, "context_course", "instanceid", id)
+        question_categories_df = get_slices(catalog, "question_categories", "contextid", courses_context_df["id"].tolist() if not courses_context_df.empty else [])
+
+        course = get_slice(catalog, "course", "id", id)
         if course.empty:
             logger.warning(f"No row(s) found in 'COURSE' with id {id}.")
         else:
+            new_course_id, course_error = None, None
+            course_metrics = start_course(id)
+            # one SAVEPOINT per course: a failed course leaves nothing behind in the caller's transaction (whatever commits it)
+            savepoint = conn.begin_nested()
             try:
-                course_copy = course.copy()
                 course_old_context_id = courses_context_df[courses_context_df["instanceid"] == id]["id"].iloc[0]
-                course_shortname = course_copy["shortname"].iloc[0]
-                course_copy["category"] = category
-                course_copy["shortname"] = course_copy["category"].astype(str) + "-" + course_copy["shortname"]
-                course_copy["idnumber"] = course_copy["shortname"]
-                course_copy = course_copy.drop(columns=["id", "originalcourseid"])
+                course_shortname = course["shortname"].iloc[0]
 
                 # course
-                course_copy.to_sql(course_table, conn, if_exists="append", index=False)
-                new_course = conn.execute(text(f"SELECT id FROM {course_table} ORDER BY id DESC LIMIT 1"))
-                new_course_id = new_course.scalar()
+                new_course_id = insert_with_ids(conn, course_table, create_course_df(course, category))[0]
                 logger.info(f"NEW COURSE inserted successfully! OLD COURSE ID: {id} | NEW COURSE ID: {new_course_id}")
 
                 # recompletion_config
                 df = create_local_recompletion_df(new_course_id)
-                df.to_sql(local_recompletion_config_table, conn, if_exists="append", index=False)
+                append_rows(conn, local_recompletion_config_table, df)
 
                 # category
-                category_id = course_copy["category"].iloc[0]
-                result = conn.execute(text(f"SELECT id FROM {context_table} WHERE contextlevel = 40 AND instanceid = {category_id} LIMIT 1"))
-                context_category_id = result.scalar()
+                context_category_id = lookups.context_category_id
 
                 # create course context (contextlevel 50)
-                conn.execute(text(f"INSERT INTO {context_table} (contextlevel, instanceid, depth, path) VALUES (50, {new_course_id}, 3, NULL)"))
-                result = conn.execute(text(f"SELECT id FROM {context_table} WHERE contextlevel = 50 AND instanceid = {new_course_id} ORDER BY id DESC LIMIT 1"))
-                new_course_context_id = result.scalar()
+                course_context_df = pd.DataFrame([{"contextlevel": 50, "instanceid": new_course_id, "depth": 3, "path": None}])
+                new_course_context_id = insert_with_ids(conn, context_table, course_context_df)[0]
                 logger.info(f"NEW COURSE CONTEXT ID inserted successfully! NEW COURSE CONTEXT ID: {new_course_context_id}")
-                cf_data_df = customfield_data_old_df[customfield_data_old_df["instanceid"] == id].copy()
+                cf_data_df = customfield_data_old_df.copy()
                 carga_horaria_id = cf_data_df.loc[cf_data_df["fieldid"] == 8, "value"].iloc[0]
                 cf_data_df = cf_data_df.drop(columns=["id"])
                 image_text = image_texts.get(id)
                 customfield_data_df = create_course_customfield_data_df(new_course_id, new_course_context_id, cf_data_df, image_text)
                 if not customfield_data_df.empty:
                     try:
-                        customfield_data_df.to_sql(customfield_data_table, conn, if_exists="append", index=False)
+                        append_rows(conn, customfield_data_table, customfield_data_df)
                         logger.info(f"{len(customfield_data_df)} customfield_data(s) inserted for course {new_course_id}.")
                     except Exception as e:
                         logger.error(f"Error inserting CUSTOMFIELD_DATA for course {new_course_id}: {e}")
+                        raise
                 path = f"/1/{context_category_id}/{new_course_context_id}"
                 conn.execute(text(f"UPDATE {context_table} SET path = '{path}' WHERE id = {new_course_context_id}"))
 
@@ -571,12 +917,11 @@ def if_table_course(conn, image_texts, table: str, ids: List[int], dataframes: D
                 if not feedback_item_df.empty:
                     fb_item_df = feedback_item_df.copy()
                     fb_df = create_feedback_instance_df(new_course_id, course_language)
-                    fb_df.to_sql(feedback_table, conn, if_exists="append", index=False)
-                    result = conn.execute(text(f"SELECT id FROM {feedback_table} WHERE course = :course_id ORDER BY id DESC LIMIT 1"), {"course_id": new_course_id}).scalar()
+                    result = insert_with_ids(conn, feedback_table, fb_df)[0]
                     fi_df = create_feedback_items_df(result, fb_item_df)
-                    fi_df.to_sql(feedback_item_table, conn, if_exists="append", index=False)
+                    append_rows(conn, feedback_item_table, fi_df)
                     new_feedback_id = result
-                logger.info(f"{len(fi_df)} feedback item(s) inserted for course {new_course_id}.")
+                    logger.info(f"{len(fi_df)} feedback item(s) inserted for course {new_course_id}.")
 
                 # RESOURCE
                 resource_to_page_instance_mapping = {}
@@ -599,18 +944,17 @@ def if_table_course(conn, image_texts, table: str, ids: List[int], dataframes: D
                         quiz_filtered["course"] = new_course_id
                         quiz_filtered = quiz_filtered.drop(columns=["id", "completionpass"])
                         try:
-                            quiz_filtered.to_sql(quiz_table, conn, if_exists="append", index=False)
-                            result = conn.execute(text(f"SELECT id FROM {quiz_table} WHERE course = :course_id ORDER BY id"), {"course_id": new_course_id}).fetchall()
-                            new_quiz_ids = [row[0] for row in result]
-                            quiz_instance_mapping.update(dict(zip(old_quiz_ids, new_quiz_ids)))
+                            quiz_instance_mapping.update(insert_with_mapping(conn, quiz_table, quiz_filtered, old_quiz_ids))
                             logger.info(f"{len(quiz_filtered)} quiz(s) inserted for course {new_course_id}.")
                         except Exception as e:
                             logger.error(f"Error inserting QUIZ for course {new_course_id}: {e}")
+                            raise
                     else:
                         logger.warning(f"No QUIZ entries found for course {id}.")
                 
                 # QUIZ SECTION
                 quiz_sections_mapping = {}
+                quiz_sections_df = get_slices(catalog, "quiz_sections", "quizid", quiz_instance_mapping.keys())
                 if not quiz_sections_df.empty:
                     quiz_sections_filtered = quiz_sections_df[quiz_sections_df["quizid"].isin(quiz_instance_mapping.keys())].copy()
                     if not quiz_sections_filtered.empty:
@@ -618,63 +962,70 @@ def if_table_course(conn, image_texts, table: str, ids: List[int], dataframes: D
                         quiz_sections_filtered["quizid"] = quiz_sections_filtered["quizid"].map(quiz_instance_mapping)
                         quiz_sections_filtered = quiz_sections_filtered.drop(columns=["id"])
                         try:
-                            quiz_sections_filtered.to_sql(quiz_sections_table, conn, if_exists="append", index=False)
-                            result = conn.execute(text(f"SELECT id FROM {quiz_sections_table} WHERE quizid IN :q_ids ORDER BY id"), {"q_ids": tuple(quiz_instance_mapping.values())}).fetchall()
-                            new_quiz_section_ids = [row[0] for row in result]
-                            quiz_sections_mapping.update(dict(zip(old_quiz_section_ids, new_quiz_section_ids)))
+                            quiz_sections_mapping.update(insert_with_mapping(conn, quiz_sections_table, quiz_sections_filtered, old_quiz_section_ids))
                             logger.info(f"{len(quiz_sections_filtered)} quiz section(s) inserted for course {new_course_id}.")
                         except Exception as e:
                             logger.error(f"Error inserting QUIZ_SECTIONS for course {new_course_id}: {e}")
+                            raise
 
                 # QUESTION
                 question_instance_mapping = {}
+                question_df = get_slices(catalog, "question", "category", question_category_mapping.keys())
                 if not question_df.empty:
                     questions_filtered = question_df[(question_df["category"].isin(question_category_mapping.keys()))].copy()
                     if not questions_filtered.empty:
                         old_question_ids = questions_filtered["id"].tolist()
-                        questions_filtered["unique_key"] = questions_filtered["name"] + "_tag_" + questions_filtered["stamp"]
-                        unique_keys = questions_filtered["unique_key"].tolist()
-                        questions_filtered = questions_filtered.drop(columns=["id", "category", "version", "hidden", "idnumber", "unique_key"])
+                        questions_filtered = questions_filtered.drop(columns=["id", "category", "version", "hidden", "idnumber"])
                         try:
-                            questions_filtered.to_sql(question_table, conn, if_exists="append", index=False)
-                            stmt = text(f"SELECT id, CONCAT(name, '_tag_', stamp) AS unique_key FROM {question_table} WHERE CONCAT(name, '_tag_', stamp) IN :keys")
-                            stmt = stmt.bindparams(bindparam("keys", expanding=True))
-                            result = conn.execute(stmt, {"keys": unique_keys}).fetchall()
-                            db_key_to_id = {row[1]: row[0] for row in result}  # 1: unique_key, 0: id
-                            question_instance_mapping = {old_id: db_key_to_id.get(key) for old_id, key in zip(old_question_ids, unique_keys) if key in db_key_to_id}
+                            question_instance_mapping = insert_with_mapping(conn, question_table, questions_filtered, old_question_ids)
                             logger.info(f"{len(questions_filtered)} question(s) inserted for course {new_course_id}.")
                         except Exception as e:
                             logger.error(f"Error inserting QUESTION for course {new_course_id}: {e}")
+                            raise
 
                 # QUESTION BANK ENTRY                
                 question_bank_entry_mapping = {}
                 if question_instance_mapping:
                     bank_entries = []
-                    for old_question_id, new_question_id in question_instance_mapping.items():
-                        original_question_id = question_df.loc[question_df["id"] == old_question_id].iloc[0]
-                        old_category_id = original_question_id["category"]
+                    old_category_ids = questions_by_id.loc[list(question_instance_mapping.keys()), "category"].tolist()
+                    for old_category_id in old_category_ids:
                         new_category_id = question_category_mapping.get(old_category_id)
                         ownerid = 2
                         bank_entries.append({"questioncategoryid": new_category_id, "ownerid": ownerid})
                     try:
                         df_bank = pd.DataFrame(bank_entries)    
-                        df_bank.to_sql(question_bank_entries_table, conn, if_exists="append", index=False)
-                        result = conn.execute(text(f"SELECT id FROM {question_bank_entries_table} WHERE questioncategoryid IN :cat_ids ORDER BY id"), {"cat_ids": tuple(question_category_mapping.values())}).fetchall()
-                        new_bank_entry_ids = [row[0] for row in result]
-                        question_bank_entry_mapping = dict(zip(question_instance_mapping.values(), new_bank_entry_ids))
+                        question_bank_entry_mapping = insert_with_mapping(conn, question_bank_entries_table, df_bank, list(question_instance_mapping.values()))
                         logger.info(f"{len(df_bank)} question_bank_entries inserted for course {new_course_id}.")
                     except Exception as e:
                         logger.error(f"Error inserting QUESTION_BANK_ENTRIES for course {new_course_id}: {e}")
+                        raise
                     version_entries = []
                     for new_question_id in question_instance_mapping.values():
                         question_entry_id = question_bank_entry_mapping.get(new_question_id)
                         version_entries.append({ "questionbankentryid": question_entry_id, "version": 1, "questionid": new_question_id, "status": "ready"})
                     try:
                         df_versions = pd.DataFrame(version_entries)
-                        df_versions.to_sql(question_versions_table, conn, if_exists="append", index=False)
+                        append_rows(conn, question_versions_table, df_versions)
                         logger.info(f"{len(df_versions)} question_versions inserted for course {new_course_id}.")
                     except Exception as e:
                         logger.error(f"Error inserting QUESTION_VERSIONS for course {new_course_id}: {e}")
+                        raise
+                    old_question_ids = list(question_instance_mapping.keys())
+                    qtype_ddimageortext_df = get_slices(catalog, "qtype_ddimageortext", "questionid", old_question_ids)
+                    qtype_ddimageortext_drags_df = get_slices(catalog, "qtype_ddimageortext_drags", "questionid", old_question_ids)
+                    qtype_ddimageortext_drops_df = get_slices(catalog, "qtype_ddimageortext_drops", "questionid", old_question_ids)
+                    qtype_ddmarker_df = get_slices(catalog, "qtype_ddmarker", "questionid", old_question_ids)
+                    qtype_ddmarker_drags_df = get_slices(catalog, "qtype_ddmarker_drags", "questionid", old_question_ids)
+                    qtype_ddmarker_drops_df = get_slices(catalog, "qtype_ddmarker_drops", "questionid", old_question_ids)
+                    qtype_essay_options_df = get_slices(catalog, "qtype_essay_options", "questionid", old_question_ids)
+                    qtype_match_options_df = get_slices(catalog, "qtype_match_options", "questionid", old_question_ids)
+                    qtype_match_subquestions_df = get_slices(catalog, "qtype_match_subquestions", "questionid", old_question_ids)
+                    qtype_multichoice_options_df = get_slices(catalog, "qtype_multichoice_options", "questionid", old_question_ids)
+                    qtype_randomsamatch_options_df = get_slices(catalog, "qtype_randomsamatch_options", "questionid", old_question_ids)
+                    qtype_shortanswer_options_df = get_slices(catalog, "qtype_shortanswer_options", "questionid", old_question_ids)
+                    question_ddwtos_df = get_slices(catalog, "question_ddwtos", "questionid", old_question_ids)
+                    question_gapselect_df = get_slices(catalog, "question_gapselect", "questionid", old_question_ids)
+                    question_truefalse_df = get_slices(catalog, "question_truefalse", "question", old_question_ids)
                     insert_question_type(conn, "qtype_ddimageortext", qtype_ddimageortext_df, qtype_ddimageortext_table, question_instance_mapping, new_course_id)
                     insert_question_type(conn, "qtype_ddimageortext_drags", qtype_ddimageortext_drags_df, qtype_ddimageortext_drags_table, question_instance_mapping, new_course_id)
                     insert_question_type(conn, "qtype_ddimageortext_drops", qtype_ddimageortext_drops_df, qtype_ddimageortext_drops_table, question_instance_mapping, new_course_id)
@@ -693,6 +1044,7 @@ def if_table_course(conn, image_texts, table: str, ids: List[int], dataframes: D
 
                 # QUESTION ANSWERS
                 question_answers_mapping = {}
+                question_answers_df = get_slices(catalog, "question_answers", "question", question_instance_mapping.keys())
                 if not question_answers_df.empty:
                     question_answers_filtered = question_answers_df[question_answers_df["question"].isin(question_instance_mapping.keys())].copy()
                     if not question_answers_filtered.empty:
@@ -700,16 +1052,15 @@ def if_table_course(conn, image_texts, table: str, ids: List[int], dataframes: D
                         question_answers_filtered["question"] = question_answers_filtered["question"].map(question_instance_mapping)
                         question_answers_filtered = question_answers_filtered.drop(columns=["id"])
                         try:
-                            question_answers_filtered.to_sql(question_answers_table, conn, if_exists="append", index=False)
-                            result = conn.execute(text(f"SELECT id FROM {question_answers_table} WHERE question IN :q_ids ORDER BY id"), {"q_ids": tuple(question_instance_mapping.values())}).fetchall()
-                            new_question_answer_ids = [row[0] for row in result]
-                            question_answers_mapping.update(dict(zip(old_question_answer_ids, new_question_answer_ids)))
+                            question_answers_mapping.update(insert_with_mapping(conn, question_answers_table, question_answers_filtered, old_question_answer_ids))
                             logger.info(f"{len(question_answers_filtered)} question answer(s) inserted for course {new_course_id}.")
                         except Exception as e:
                             logger.error(f"Error inserting QUESTION_ANSWERS for course {new_course_id}: {e}")
+                            raise
                 
                 # QUIZ SLOTS
                 quiz_slots_mapping = {}
+                quiz_slots_df = get_slices(catalog, "quiz_slots", "quizid", quiz_instance_mapping.keys())
                 if not quiz_slots_df.empty:
                     quiz_slots_filtered = quiz_slots_df[quiz_slots_df["quizid"].isin(quiz_instance_mapping.keys())].copy()
                     if not quiz_slots_filtered.empty:
@@ -718,13 +1069,11 @@ def if_table_course(conn, image_texts, table: str, ids: List[int], dataframes: D
                         quiz_slots_filtered["questionid"] = quiz_slots_filtered["questionid"].map(question_instance_mapping)
                         quiz_slots_filtered = quiz_slots_filtered.drop(columns=["id", "questionid", "questioncategoryid", "includingsubcategories"])
                         try:
-                            quiz_slots_filtered.to_sql(quiz_slots_table, conn, if_exists="append", index=False)
-                            result = conn.execute(text(f"SELECT id FROM {quiz_slots_table} WHERE quizid IN :q_ids ORDER BY id"), {"q_ids": tuple(quiz_instance_mapping.values())}).fetchall()
-                            new_quiz_slot_ids = [row[0] for row in result]
-                            quiz_slots_mapping.update(dict(zip(old_quiz_slot_ids, new_quiz_slot_ids)))
+                            quiz_slots_mapping.update(insert_with_mapping(conn, quiz_slots_table, quiz_slots_filtered, old_quiz_slot_ids))
                             logger.info(f"{len(quiz_slots_filtered)} quiz slot(s) inserted for course {new_course_id}.")
                         except Exception as e:
                             logger.error(f"Error inserting QUIZ_SLOTS for course {new_course_id}: {e}")
+                            raise
 
                 # FORUM
                 forum_instance_mapping = {}
@@ -745,243 +1094,56 @@ def if_table_course(conn, image_texts, table: str, ids: List[int], dataframes: D
                 new_customcert_ids = []
                 for _ in cc_template_to_use[:how_many_to_insert]:  # insert only the number of templates specified and ordered by cc_template_to_use
                     customcert_df = create_customcert_instance_df(new_course_id, carga_horaria_id, course_language)
-                    customcert_df.to_sql(f"{cc_table}", conn, if_exists="append", index=False)
-                    customcert_instance_id = conn.execute(text(f"SELECT id FROM {new_db.prefix}_customcert WHERE course = :course_id ORDER BY id DESC LIMIT 1"), {"course_id": new_course_id}).scalar()
+                    customcert_instance_id = insert_with_ids(conn, cc_table, customcert_df)[0]
                     logger.info(f"NEW CUSTOMCERT inserted successfully! OLD COURSE ID: {id} | NEW CUSTOMCERT ID: {customcert_instance_id}")
                     new_customcert_ids.append(customcert_instance_id)
 
                 # COURSE MODULES
+                cm_index = pd.DataFrame(columns=["module", "instance", "cm_id", "context_id"])
+                cm_mapping, cm_context_mapping = {}, {}
+                section_id_mapping = {}
                 if not course_modules_filtered_df.empty:
                     course_modules_filtered_df["course"] = new_course_id
-                    # changing the module ids
-                    course_modules_filtered_df["module"] = course_modules_filtered_df["module"].map(
-                        lambda func: new_modules_map.get(old_modules_map.get(func))
-                    )
-
-                    # changing the quiz instances ids
-                    quiz_module_id = new_modules_map.get("quiz")
-                    course_modules_filtered_df.loc[
-                        course_modules_filtered_df["module"] == quiz_module_id, "instance"
-                    ] = course_modules_filtered_df.loc[
-                        course_modules_filtered_df["module"] == quiz_module_id, "instance"
-                    ].map(lambda inst: quiz_instance_mapping.get(inst, inst))
-
-                    # changing the label instances ids
-                    label_module_id = new_modules_map.get("label")
-                    course_modules_filtered_df.loc[
-                        course_modules_filtered_df["module"] == label_module_id, "instance"
-                    ] = course_modules_filtered_df.loc[
-                        course_modules_filtered_df["module"] == label_module_id, "instance"
-                    ].map(lambda inst: label_instance_mapping.get(inst, inst))
-
-                    # changing the url instances ids
-                    url_module_id = new_modules_map.get("url")
-                    course_modules_filtered_df.loc[
-                        course_modules_filtered_df["module"] == url_module_id, "instance"
-                    ] = course_modules_filtered_df.loc[
-                        course_modules_filtered_df["module"] == url_module_id, "instance"
-                    ].map(lambda inst: url_instance_mapping.get(inst, inst))
-
-                    # changing the page (and old resources/hvps) instances ids
-                    all_page_instance_mapping = {**page_instance_mapping, **resource_to_page_instance_mapping, **hvp_to_page_instance_mapping}
-
-                    page_module_id = new_modules_map.get("page")
-                    resource_module_id = new_modules_map.get("resource")
-                    hvp_module_id = new_modules_map.get("hvp")
-                    course_modules_filtered_df.loc[
-                        course_modules_filtered_df["module"].isin([page_module_id, resource_module_id, hvp_module_id]), "instance"
-                    ] = course_modules_filtered_df.loc[
-                        course_modules_filtered_df["module"].isin([page_module_id, resource_module_id, hvp_module_id]), "instance"
-                    ].map(lambda inst: all_page_instance_mapping.get(inst, inst))
-
-                    course_modules_filtered_df.loc[
-                        course_modules_filtered_df["module"] == resource_module_id, "module"
-                    ] = page_module_id
-
-                    course_modules_filtered_df.loc[
-                        course_modules_filtered_df["module"] == hvp_module_id, "module"
-                    ] = page_module_id
-
-                    # changing the forum instances ids
-                    forum_module_id = new_modules_map.get("forum")
-                    course_modules_filtered_df.loc[
-                        course_modules_filtered_df["module"] == forum_module_id, "instance"
-                    ] = course_modules_filtered_df.loc[
-                        course_modules_filtered_df["module"] == forum_module_id, "instance"
-                    ].map(lambda inst: forum_instance_mapping.get(inst, inst))
-
-                    # changing the reengagement instances ids
-                    reengagement_module_id = new_modules_map.get("reengagement")
-                    course_modules_filtered_df.loc[
-                        course_modules_filtered_df["module"] == reengagement_module_id, "instance"
-                    ] = course_modules_filtered_df.loc[
-                        course_modules_filtered_df["module"] == reengagement_module_id, "instance"
-                    ].map(lambda inst: reengagement_instance_mapping.get(inst, inst))
-                    if reengagement_module_id:
-                        course_modules_filtered_df.loc[
-                            course_modules_filtered_df["module"] == reengagement_module_id, 
-                            ["visible", "visibleold", "availability"]
-                        ] = [0, 0, None]
-                    
-                    # changing the choice instances ids
-                    choice_module_id = new_modules_map.get("choice")
-                    course_modules_filtered_df.loc[
-                        course_modules_filtered_df["module"] == choice_module_id, "instance"
-                    ] = course_modules_filtered_df.loc[
-                        course_modules_filtered_df["module"] == choice_module_id, "instance"
-                    ].map(lambda inst: choice_instance_mapping.get(inst, inst))
-
-                    # changing the enrol instances ids
-                    enrol_module_id = new_modules_map.get("enrol")
-                    course_modules_filtered_df.loc[
-                        course_modules_filtered_df["module"] == enrol_module_id, "instance"
-                    ] = course_modules_filtered_df.loc[
-                        course_modules_filtered_df["module"] == enrol_module_id, "instance"
-                    ].map(lambda inst: enrol_instance_mapping.get(inst, inst))
-
-                    # changing the feedback instances ids
-                    feedback_module_id = new_modules_map.get("feedback")
-                    course_modules_filtered_df.loc[
-                        course_modules_filtered_df["module"] == feedback_module_id, "instance"
-                    ] = new_feedback_id
-
-                    # changing the customcert instances ids
-                    customcert_module_id = new_modules_map.get("customcert")
-                    matching_cc_indexes = course_modules_filtered_df.index[
-                        course_modules_filtered_df["module"] == customcert_module_id
-                    ]
-                    for i, cc_id in zip(matching_cc_indexes, new_customcert_ids):
-                        course_modules_filtered_df.loc[i, "instance"] = cc_id
-
-                    # storing old ids
-                    course_modules_filtered_df["old_id"] = course_modules_filtered_df["id"]
+                    course_modules_filtered_df["old_course"] = id
+                    # changing the module and instance ids (resources and hvps become pages), keeping the old ids in "old_id"
+                    instance_maps = {
+                        "quiz": quiz_instance_mapping, "label": label_instance_mapping, "url": url_instance_mapping, "page": page_instance_mapping,
+                        "resource": resource_to_page_instance_mapping, "hvp": hvp_to_page_instance_mapping, "forum": forum_instance_mapping,
+                        "reengagement": reengagement_instance_mapping, "choice": choice_instance_mapping, "enrol": enrol_instance_mapping
+                    }
+                    course_modules_filtered_df = remap_course_modules(course_modules_filtered_df, old_modules_map, new_modules_map,
+                                                                      {name: {(id, old): new for old, new in mapping.items()} for name, mapping in instance_maps.items()},
+                                                                      {id: new_feedback_id}, {id: new_customcert_ids})
                     # droping old ids
                     course_modules_filtered_df = course_modules_filtered_df.drop(columns=["id"])
 
-                    # inserting and maping new modules ids
-                    for _, row in course_modules_filtered_df.iterrows():
-                        sql = text(f"""
-                                    INSERT INTO {course_modules_table} 
-                                    (course, module, instance, section, added, score, indent, visible, visibleold, groupmode, groupingid, completion, completiongradeitemnumber, completionview, completionexpected, availability, showdescription)
-                                    VALUES
-                                    (:course, :module, :instance, :section, :added, :score, :indent, :visible, :visibleold, :groupmode, :groupingid, :completion, :completiongradeitemnumber, :completionview, :completionexpected, :availability, :showdescription)
-                                    """
-                        )
-                        contional_modules = [5, 7, 8, 16, 17, 18, 21, 27, 29]  # modules to be inserted with specific RESTRICTIONS
-                        contional_modules2 = [13]  # modules to be inserted with specific RESTRICTIONS
-                        """
-                        5 = choice
-                        7 = feedback
-                        8 = folder
-                        13 = label
-                        16 = page
-                        17 = quiz
-                        18 = resource
-                        21 = url
-                        27 = hvp
-                        29 = customcert
-                        """
-                        if row["module"] in contional_modules:
-                            row["availability"] = '{"op":"&","c":[{"type":"completion","cm":-1,"e":1}],"showc":[true]}'
-                        if row["module"] in contional_modules2:
-                            row["availability"] = '{"op":"|","c":[],"show":true}'
-                        row_cleaned = row.replace({pd.NA: None, '': None}).where(pd.notnull(row), None)
-                        row_dict = row_cleaned.to_dict()
-                        conn.execute(sql, row_dict)
-
-                        # Map the old cm_id to the new cm_id
-                        old_cm_id = row["old_id"]
-                        new_cm_id = conn.execute(text(f"SELECT id FROM {course_modules_table} ORDER BY id DESC LIMIT 1")).scalar()
-                        module_instance_mapping[old_cm_id] = new_cm_id
-
-                        # create course_module context (contextlevel 70)
-                        conn.execute(text(f"INSERT INTO {context_table} (contextlevel, instanceid, depth, path) VALUES (70, :instanceid, 4, NULL)"), {"instanceid": new_cm_id})
-                        # retrieve new context.id
-                        result = conn.execute(text(f"SELECT id FROM {context_table} WHERE contextlevel = 70 AND instanceid = :instanceid ORDER BY id DESC LIMIT 1"), {"instanceid": new_cm_id})
-                        new_cm_context_id = result.scalar()
-                        # update context path
-                        path_cm = f"/1/{context_category_id}/{new_course_context_id}/{new_cm_context_id}"
-                        conn.execute(text(f"UPDATE {context_table} SET path = :path WHERE id = :id"), {"path": path_cm, "id": new_cm_context_id})
+                    # inserting and maping new modules ids (and their contexts) in bulk
+                    new_cm_ids, new_cm_context_ids = insert_course_modules(conn, course_modules_filtered_df, course_modules_table, context_table, [new_course_id])
+                    cm_mapping = dict(zip(course_modules_filtered_df["old_id"], new_cm_ids))
+                    cm_context_mapping = dict(zip(course_modules_filtered_df["old_id"], new_cm_context_ids))
+                    module_instance_mapping.update(cm_mapping)
+                    cm_index = build_cm_index(course_modules_filtered_df, cm_mapping, cm_context_mapping)
                     
-                    target_cm_ids = [
-                        m for m in (
-                            new_modules_map.get("quiz"),
-                            new_modules_map.get("page")
-                        ) if m is not None
-                    ]
-                    targeted_module = course_modules_filtered_df[
-                        (course_modules_filtered_df["completion"] == 2) &
-                        (course_modules_filtered_df["completionview"] == 1) &
-                        (course_modules_filtered_df["module"].isin(target_cm_ids))
-                    ]
-                    added_target = int(targeted_module["added"].max())
-                    old_target = int(targeted_module.loc[targeted_module["added"] == added_target, "old_id"].iat[0])
-                    new_target = module_instance_mapping.get(old_target)
-                    if not new_target:
-                        continue
+                    # REENGAGEMENT suppresstarget (a course without a quiz/page completed by view keeps none)
+                    old_target = get_suppress_targets(course_modules_filtered_df, new_modules_map).get(id)
+                    if cm_mapping.get(old_target):
+                        update_suppress_targets(conn, reengagement_table, {new_course_id: cm_mapping[old_target]})
                     else:
-                        names = ("alerta de continuação do curso", "course continuation alert")
-                        conn.execute(text(f"""
-                            UPDATE {reengagement_table}
-                            SET suppresstarget = :new_target
-                            WHERE course = :new_course_id
-                            AND lower(trim(name)) IN :names
-                        """), {
-                            "new_target": new_target,
-                            "new_course_id": new_course_id,
-                            "names": names
-                        })
-                        logger.info(f"REENGAGEMENT suppresstarget atualizado para {new_target}")
+                        logger.warning(f"No REENGAGEMENT suppresstarget found for course {new_course_id}.")
                     logger.info(f"{len(course_modules_filtered_df)} course_modules inserted.")
 
                 # Create question references
-                question_references_data = []
-                for old_slot_id, new_slot_id in quiz_slots_mapping.items():
-                    # get old_question_id from original slot
-                    slot_row = quiz_slots_df[quiz_slots_df["id"] == old_slot_id]
-                    if slot_row.empty:
-                        logger.warning(f"Slot ID {old_slot_id} not found in original quiz_slots_df.")
-                        continue
-
-                    old_question_id = slot_row["questionid"].values[0]
-                    new_question_id = question_instance_mapping.get(old_question_id)
-                    if not new_question_id:
-                        logger.warning(f"No new question ID found for old question ID {old_question_id}. Skipping slot {new_slot_id}.")
-                        continue
-                    
-                    questionbankentryid = question_bank_entry_mapping.get(new_question_id)
-                    if not questionbankentryid:
-                        logger.warning(f"No question bank entry found for question ID {new_question_id}. Skipping slot {new_slot_id}.")
-                        continue
-                    
-                    # find the quiz course_module's contexdid
-                    quiz_id = slot_row["quizid"].values[0]
-                    new_quiz_id = quiz_instance_mapping.get(quiz_id)
-                    if not new_quiz_id:
-                        logger.warning(f"No new quiz ID found for old quiz ID {quiz_id}. Skipping.")
-                        continue
-                    
-                    cm_id = conn.execute(text(f"SELECT id FROM {course_modules_table} WHERE course = :course_id AND module = 17 AND instance = :instance ORDER BY id DESC LIMIT 1"),
-                                         {"course_id": new_course_id, "instance": new_quiz_id}).scalar()
-                    if not cm_id:
-                        logger.warning(f"No CM ID found for quiz {new_quiz_id}. Skipping.")
-                        continue
-                    
-                    cm_context_id = conn.execute(text(f"SELECT id FROM {context_table} WHERE contextlevel = 70 AND instanceid = :cm_id ORDER BY id DESC LIMIT 1"), {"cm_id": cm_id}).scalar()
-                    if not cm_context_id:
-                        logger.warning(f"No context ID found for cm_id {cm_id}. Skipping.")
-                        continue
-                    
-                    question_references_data.append({"usingcontextid": cm_context_id, "component": "mod_quiz", "questionarea": "slot", "itemid": new_slot_id, "questionbankentryid": questionbankentryid})
+                question_references_df = build_question_references_df(quiz_slots_df, quiz_slots_mapping, question_instance_mapping, question_bank_entry_mapping,
+                                                                      quiz_instance_mapping, cm_index, new_modules_map.get("quiz"), new_course_id)
 
                 # inserting question references
-                if question_references_data:
-                    question_references_df = pd.DataFrame(question_references_data)
+                if not question_references_df.empty:
                     try:
-                        question_references_df.to_sql(question_references_table, conn, if_exists="append", index=False)
+                        append_rows(conn, question_references_table, question_references_df)
                         logger.info(f"{len(question_references_df)} question references inserted for course {new_course_id}.")
                     except Exception as e:
                         logger.error(f"Error inserting QUESTION_REFERENCES for course {new_course_id}: {e}")
+                        raise
 
                 # CUSTOMCERT
                 for cc_id, template in zip(new_customcert_ids, cc_template_to_use):
@@ -989,16 +1151,13 @@ def if_table_course(conn, image_texts, table: str, ids: List[int], dataframes: D
                     cc_pages_df = dataframes.get(f"cc_pages_{template}", pd.DataFrame())
                     cc_elements_df = dataframes.get(f"cc_elements_{template}", pd.DataFrame())
 
-                    customcert_cm_id = conn.execute(text(f"SELECT id FROM {course_modules_table} WHERE course = :course_id AND module = 29 AND instance = :customcert_instance_id ORDER BY id DESC LIMIT 1"),
-                                                    {"course_id": new_course_id, "customcert_instance_id": cc_id}).scalar()
+                    customcert_cm_id, customcert_cm_context_id = get_cm_and_context(cm_index, new_modules_map.get("customcert"), cc_id)
                     logger.info(f"NEW CUSTOMCERT CM ID inserted successfully! OLD COURSE ID: {id} | NEW CUSTOMCERT CM ID: {customcert_cm_id}")
 
-                    customcert_cm_context_id = conn.execute(text(f"SELECT id FROM {context_table} WHERE instanceid = :instanceid AND contextlevel = 70 ORDER BY id DESC LIMIT 1"), {"instanceid": customcert_cm_id}).scalar()
                     logger.info(f"NEW CUSTOMCERT CM CONTEXT ID inserted successfully! OLD COURSE ID: {id} | NEW CUSTOMCERT CM CONTEXT ID: {customcert_cm_context_id}")
 
                     customcert_template_df = create_customcert_template_df(cc_templates_df.copy(), customcert_cm_context_id, course_shortname)
-                    customcert_template_df.to_sql(f"{cc_templates_table}", conn, if_exists="append", index=False)
-                    customcert_template_id = conn.execute(text(f"SELECT id FROM {cc_templates_table} WHERE contextid = :context_id ORDER BY id DESC LIMIT 1"), {"context_id": customcert_cm_context_id}).scalar()
+                    customcert_template_id = insert_with_ids(conn, cc_templates_table, customcert_template_df)[0]
                    
                     conn.execute(
                         text(f"UPDATE {cc_table} SET templateid = :templateid WHERE id = :customcert_id and course = :course_id"),
@@ -1007,16 +1166,11 @@ def if_table_course(conn, image_texts, table: str, ids: List[int], dataframes: D
                     logger.info(f"NEW CUSTOMCERT TEMPLATE ID inserted successfully! OLD COURSE ID: {id} | NEW CUSTOMCERT TEMPLATE ID: {customcert_template_id}")
 
                     customcert_pages_df = create_customcert_page_df(cc_pages_df.copy(), customcert_template_id)
-                    customcert_pages_df.to_sql(f"{cc_pages_table}", conn, if_exists="append", index=False)
-                    customcert_pages_ids = conn.execute(text(f"SELECT id FROM {cc_pages_table} WHERE templateid = :templateid ORDER BY id, sequence ASC"),
-                                                        {"templateid": customcert_template_id}).fetchall()
-                    cc_pages_ids = [row[0] for row in customcert_pages_ids]
+                    cc_pages_ids = insert_with_ids(conn, cc_pages_table, customcert_pages_df)
                     logger.info(f"NEW CUSTOMCERT PAGES IDS inserted successfully! OLD COURSE ID: {id} | NEW CUSTOMCERT PAGES IDS: {cc_pages_ids}")
 
                     customcert_elements_df = create_customcert_elements_df(cc_elements_df.copy(), cc_pages_ids)
-                    customcert_elements_df.to_sql(f"{cc_elements_table}", conn, if_exists="append", index=False)
-                    customcert_elements_ids = conn.execute(text(f"SELECT id FROM {cc_elements_table} WHERE pageid IN :pageids ORDER BY id, sequence ASC"), {"pageids": tuple(cc_pages_ids)}).fetchall()
-                    cc_elements_ids = [row[0] for row in customcert_elements_ids]
+                    cc_elements_ids = insert_with_ids(conn, cc_elements_table, customcert_elements_df)
                     logger.info(f"NEW CUSTOMCERT ELEMENTS IDS inserted successfully! OLD COURSE ID: {id} | NEW CUSTOMCERT ELEMENTS IDS: {cc_elements_ids}")
 
                 # COURSE SECTIONS
@@ -1025,152 +1179,16 @@ def if_table_course(conn, image_texts, table: str, ids: List[int], dataframes: D
                     course_sections_df["course"] = new_course_id
                     old_section_ids = course_sections_df["id"].tolist()
                     course_sections_df = course_sections_df.drop(columns=["id"])
-                    course_sections_df.loc[course_sections_df["name"].str.strip().str.lower().isin(["conteúdo", "content"]),
-                                           "availability"] = '{"op":"|","c":[],"show":false}'
-                    mask1 = course_sections_df["name"].str.strip().str.lower().isin(["avaliações finais", "certificado", "final assessments", "certificate"])
-                    course_sections_df.loc[mask1, "availability"] = '{"op":"&","c":[{"type":"completion","cm":-1,"e":1}],"showc":[false]}'
-                    mask2 = course_sections_df["name"].str.strip().str.lower().isin(["avaliações finais", "final assessments"])
-                    if course_language == "en":
-                        summary_text = """
-                                        <div id="yui_3_17_2_1_1729086180475_803" align="right">
-                                        <table>
-                                            <tbody>
-                                            <tr>
-                                                <td>{courseprogressbar}</td>
-                                            </tr>
-                                            <tr>
-                                                <td>{courseprogress}</td>
-                                            </tr>
-                                            </tbody>
-                                        </table>
-                                        </div>
-                                        <p>In our distance learning methodology, the course includes two fundamental
-                                        assessments:</p>
-                                        <p>1 - <strong>Final Assessment</strong>: covers the theoretical part of the
-                                        course;</p>
-                                        <p>2 - <strong>Satisfaction Feedback:</strong> focuses on your feedback regarding
-                                        the course.</p>
-                                        <p>All the assessments above are conducted here on the platform.</p>
-                                        <p dir="ltr"></p>
-                                        <p dir="ltr"><span class=""><strong>Attention:</strong> The certificate is
-                                            pending completion of both assessments above.</span></p>
-                                        """
-                        summary_text2 = """
-                                        <p>The course completion certificate is a professional and personal achievement
-                                        that indicates the student has reached a satisfactory level of training,
-                                        equipping and qualifying them to work more safely.</p>
-                                        <p>Talismã's certificate is valid throughout the national territory and meets
-                                        all the requirements of Brazilian legislation, including references to
-                                        Regulatory Standards, the Brazilian Navy, and market standards.</p>
-                                        <p><strong>Attention:</strong> The certificate is issued when class attendance
-                                        exceeds 75%, and upon passing both the Final and Practical Assessments, if
-                                        applicable. Don't forget to complete the Satisfaction Feedback—we value your
-                                        feedback.</p>
-                                        """
-                        summary_text3 = """
-                                        <p>The <strong>Final Assessment</strong> aims to evaluate the
-                                        progression of the learning process within the course, summarizing key
-                                        learnings based on general criteria.</p>
-                                        <p>Here are some important criteria:</p>
-                                        <p>1 - The assessment is only available after completing all intermediate
-                                        assessments;</p>
-                                        <p>2 - The duration for completing the assessment is <strong>1 hour (60
-                                            minutes)</strong>;</p>
-                                        <p>3 - The <strong>minimum passing score is 70%</strong>. If a <strong>Practical Assessment</strong> is applicable, the final score is the
-                                        arithmetic average of the Final and Practical Assessments;
-                                        </p>
-                                        <p>4 - Up to <strong>two attempts</strong> are allowed;</p>
-                                        <p>5 - In case of failure in both attempts, please contact us through one of our
-                                        support channels.</p>
-                                        """
-                    else:
-                        summary_text = """
-                                        <div id="yui_3_17_2_1_1729086180475_803" align="right">
-                                        <table>
-                                            <tbody>
-                                            <tr>
-                                                <td>{courseprogressbar}</td>
-                                            </tr>
-                                            <tr>
-                                                <td>{courseprogress}</td>
-                                            </tr>
-                                            </tbody>
-                                        </table>
-                                        </div>
-                                        <p>Em nossa metodologia de ensino a distância o curso tem duas avaliações
-                                        fundamentais, que são:</p>
-                                        <p>1 - <strong>Avaliação Final</strong>: aborda a parte teórica do curso;</p>
-                                        <p>2 - <strong>Pesquisa de Satisfação: </strong>aborda a sua receptividade ao
-                                        curso.</p>
-                                        <p>Todas as avaliações acima são realizadas aqui na plataforma.</p>
-                                        <p dir="ltr"></p>
-                                        <p dir="ltr"><span class="">Atenção: O certificado está pendente a conclusão das
-                                            duas avaliações acima.</span></p>
-                                       """
-                        summary_text2 = """
-                                        <p dir="ltr" id="yui_3_17_2_1_1729087194198_803">O certificado de conclusão de
-                                        curso é uma conquista profissional e pessoal que indica que o aluno alcançou
-                                        nível de treinamento satisfatório capacitando-o e qualificando-o a trabalhar
-                                        de forma mais segura.</p>
-                                        <p dir="ltr">O certificado da Talismã é válido em todo território nacional e
-                                        atende todos os requisitos da legislação brasileira como referências as Normas
-                                        Regulamentadoras, Marinha do Brasil e padrões do mercado.</p>
-                                        <p dir="ltr" id="yui_3_17_2_1_1729087194198_788"><span
-                                            id="yui_3_17_2_1_1729087194198_787" class=""><strong>Atenção:</strong>  O
-                                            certificado é emitido na frequência das aulas acima de 75%, na aprovação na
-                                            Avaliação Final e Avaliação Prática caso aplicável. Não esqueça de realizar
-                                            a Pesquisa de Satisfação, contamos com sua opinião.</span></p>
-                                       """
-                        summary_text3 = """
-                                        <p>A <strong>Avaliação Final</strong> tem como objetivo fazer um balanço da sequência de trabalho de
-                                            formação do conteúdo previsto no curso sintetizando as aprendizagens tendo por
-                                            bases critérios gerais.</p>
-                                        <p>Segue alguns critérios importantes:</p>
-                                        <p>1 - A avaliação está disponível somente após a realização de todas as avaliações intermediárias;&nbsp;&nbsp;</p>
-                                        <p>2 - Duração para realização da avaliação é de 01 hora (60 minutos);</p>
-                                        <p>3 - Nota mínima para aprovação é
-                                            de 70%, caso aplicável a avaliação prática, a nota final é a
-                                            média aritmética da avaliação final e avaliação prática;</p>
-                                        <p>4 - São permitidas até duas tentativas;</p>
-                                        <p>5 - Caso de reprovação nas duas tentativas, entrar em contato em um dos nossos canais de atendimentos.</p>                                       
-                                        """
-                    course_sections_df.loc[mask2, "summary"] = summary_text
-                    mask3 = course_sections_df["name"].str.strip().str.lower().isin(["certificado", "certificate"])
-                    course_sections_df.loc[mask3, "summary"] = summary_text2
-                    mask4 = course_sections_df["name"].str.strip().str.lower().isin(["avaliação das atividades teórica", "theoretical activities assessment"])
-                    course_sections_df.loc[mask4, "summary"] = summary_text3
-                    course_sections_df["name"] = course_sections_df["name"].replace({
-                        "Avaliações Finais": "Avaliação",
-                        "Final Assessments": "Assessment",
-                        "Avaliação das Atividades Práticas": "Avaliação",
-                        "Avaliação das Atividades Prática": "Avaliação",
-                        "Avaliação das Atividades Teórica": "Avaliação",
-                        "Practical Activities Assessment": "Assessment",
-                        "Theoretical Activities Assessment": "Assessment",
-                        "Evaluation of Practical Activities": "Assessment"
-                    })
-                    mask5 = course_sections_df["name"].str.strip().str.lower().isin(["sobre o curso", "about the course"])
-                    course_sections_df.loc[mask5, "summary"] = course_sections_df.loc[mask5, "summary"].str.replace(
-                        "{course_field_carga_horaria}",
-                        "{course_field_ch}",
-                        regex=False
-                    )
-
+                    course_sections_df = transform_course_sections_df(course_sections_df, course_language)
                     course_sections_df["sequence"] = course_sections_df["sequence"].apply(lambda seq: transform_sequence(seq, module_instance_mapping))
-                    course_sections_df.to_sql(sections_table, conn, if_exists="append", index=False)
+                    new_section_ids = insert_with_ids(conn, sections_table, course_sections_df)
                     logger.info(f"{len(course_sections_df)} section(s) inserted for course {new_course_id}.")
 
-                    # get new sections ids
-                    result = conn.execute(text(f"SELECT id, section FROM {sections_table} WHERE course = :course_id"), {"course_id": new_course_id}).mappings().fetchall()
-                    new_section_ids = [row["id"] for row in result]
+                    # new sections ids come straight from the insert
                     section_id_mapping = {0: 0}
                     section_id_mapping.update(dict(zip(old_section_ids, new_section_ids)))
-                    old_to_new_section_ids = {row["section"]: row["id"] for row in result}
+                    old_to_new_section_ids = dict(zip(course_sections_df["section"], new_section_ids))
 
-                    # mapping new sectionids directly from old id
-                    course_format_options_filtered["sectionid"] = course_format_options_filtered["sectionid"].fillna(-1).astype(int)
-                    course_format_options_filtered["sectionid"] = course_format_options_filtered["sectionid"].map(lambda sid: section_id_mapping.get(sid) if sid > 0 else 0)
-                    course_format_options_filtered["courseid"] = new_course_id
                     course_modules_filtered_df["section"] = course_modules_filtered_df["section"].map(old_to_new_section_ids)
 
                     # SECTION's SEQUENCE
@@ -1181,32 +1199,153 @@ def if_table_course(conn, image_texts, table: str, ids: List[int], dataframes: D
                         section_to_sequence_mapping[new_section_id] = sequence_value
                     
                     # manipulating a specific course_module to adjust the availability and restrictions
-                    content_section = conn.execute(text(f"SELECT section FROM {sections_table} WHERE course = :course_id AND name IN ('Conteúdo', 'Content') ORDER BY section ASC LIMIT 1"),
-                                                   {"course_id": new_course_id}).scalar()
-                    daughter_content_section = conn.execute(text(f"SELECT sequence FROM {sections_table} WHERE course = :course_id AND section > :content_section ORDER BY section ASC LIMIT 1"),
-                                                            {"course_id": new_course_id, "content_section": content_section}).scalar()
-                    
-                    if daughter_content_section:
-                        sequence_ids = [int(x) for x in daughter_content_section.split(",") if x.strip().isdigit()]              
-                        if sequence_ids:
-                            availability_placeholder = '{"op":"|","c":[],"show":true}'
-                            conn.execute(text(f"UPDATE {course_modules_table} SET availability = :availability WHERE course = :course_id AND id = :id"),
-                                         {"course_id": new_course_id, "id": sequence_ids[0], "availability": availability_placeholder})
+                    make_available(conn, course_modules_table, get_first_available_cms(course_sections_df.assign(old_course=id)).values())
                     logger.info("All course_sections updated with correct sequences.")
 
                 # COURSE FORMAT OPTIONS
                 if not course_format_options_filtered.empty:
                     logger.debug(f"Inserting {len(course_format_options_filtered)} course_format_options for course {new_course_id}.")
-                    course_format_options_filtered["sectionid"] = course_format_options_filtered["sectionid"].astype("Int64")  # Pandas nullable int
-                    course_format_options_filtered = course_format_options_filtered.drop(columns=["id"])
+                    # mapping new sectionids directly from old id
+                    course_format_options_filtered = create_course_format_options_df(course_format_options_filtered.assign(old_course=id),
+                                                                                     {(id, old): new for old, new in section_id_mapping.items()}, {id: new_course_id})
                     logger.info(f"Final format_options to insert: {len(course_format_options_filtered)}")
-                    course_format_options_filtered.to_sql(course_format_options_table, conn, if_exists="append", index=False)
+                    append_rows(conn, course_format_options_table, course_format_options_filtered)
                     logger.info(f"{len(course_format_options_filtered)} course_format_options inserted.")
                 else:
                     logger.warning(f"No course_format_options found for course ID {id}.")
-                
+                savepoint.commit()
+
             except Exception as e:
-                logger.error(f"Error inserting copied COURSE based on ID {id}: {e}")
+                course_error = e
+                savepoint.rollback()
+                logger.error(f"Error inserting copied COURSE based on ID {id}, its rows were rolled back: {e}")
+            finally:
+                finish_course(id, course_metrics, new_course_id, course_error is not None or new_course_id is None)
+                if journal is not None:
+                    # a failed course was rolled back to its savepoint above: nothing of it is in the target, --resume loads it again
+                    if course_error is not None or new_course_id is None:
+                        record_failure(journal, id, course_error)
+                    else:
+                        record_course(journal, id, new_course_id, {
+                            "course": {id: new_course_id}, "context": {course_old_context_id: new_course_context_id},
+                            "course_sections": {old: new for old, new in section_id_mapping.items() if old},
+                            "course_modules": cm_mapping, "course_modules_context": cm_context_mapping, "question_categories": question_category_mapping,
+                            "question_bank_entries": {old: question_bank_entry_mapping.get(new) for old, new in question_instance_mapping.items()},
+                            "question": question_instance_mapping, "question_answers": question_answers_mapping,
+                            "quiz": quiz_instance_mapping, "quiz_sections": quiz_sections_mapping, "quiz_slots": quiz_slots_mapping,
+                            "page": page_instance_mapping, "resource": resource_to_page_instance_mapping, "hvp": hvp_to_page_instance_mapping,
+                            "label": label_instance_mapping, "url": url_instance_mapping, "enrol": enrol_instance_mapping,
+                            "forum": forum_instance_mapping, "reengagement": reengagement_instance_mapping, "choice": choice_instance_mapping
+                        })
+                if course_error is None and new_course_id is not None:
+                    loaded_ids.append(id)
+    return loaded_ids
+
+
+def load_parallel(conn, image_texts, table: str, ids: List[int], dataframes: Dict[str, pd.DataFrame], new_db: str = '', category: int = 1, cc_template_to_use=None, course_language=None,
+                  catalog=None, max_workers=4, journal=None, lookups=None):
+    # N workers take courses from a queue, each on its own pooled connection with one transaction per course
+    # (`conn` is only used for the shared lookups, the workers borrow their connections from conn.engine)
+    logger.debug(f"Loading {len(ids)} course(s) with {max_workers} parallel workers...")
+    if catalog is None:
+        catalog = build_catalog(dataframes)
+    if lookups is None:
+        lookups = get_target_lookups(conn, new_db, category)
+    pending = queue.Queue()
+    for course_id in ids:
+        pending.put(course_id)
+    stats = {}
+
+    def worker(number):
+        loaded, busy = 0, 0.0
+        with conn.engine.connect() as worker_conn:
+            while True:
+                try:
+                    course_id = pending.get_nowait()
+                except queue.Empty:
+                    break
+                start_time = time.perf_counter()
+                try:
+                    with worker_conn.begin():
+                        loaded_ids = if_table_course(worker_conn, image_texts, table, [course_id], dataframes, new_db, category, cc_template_to_use, course_language,
+                                                     catalog, lookups, journal)
+                    if journal is not None:
+                        mark_committed(journal, loaded_ids)
+                    loaded += len(loaded_ids)
+                except Exception as e:
+                    logger.error(f"Load worker {number}: course {course_id} rolled back: {e}")
+                    if journal is not None:
+                        discard_loaded(journal, [course_id])
+                busy += time.perf_counter() - start_time
+        stats[number] = (loaded, busy)
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for future in [executor.submit(worker, number) for number in range(1, max_workers + 1)]:
+            future.result()
+    elapsed = time.perf_counter() - start_time
+
+    for number, (loaded, busy) in sorted(stats.items()):
+        logger.info(f"Load worker {number}: {loaded} course(s) in {busy:.2f}s ({loaded / busy if busy else 0:.2f} courses/s).")
+    total = sum(loaded for loaded, _ in stats.values())
+    logger.info(f"{total}/{len(ids)} course(s) loaded by {max_workers} workers in {elapsed:.2f}s wall time ({total / elapsed if elapsed else 0:.2f} courses/s).")
+
+
+def load_committing(conn, image_texts, table: str, ids: List[int], dataframes: Dict[str, pd.DataFrame], new_db: str = '', category: int = 1, cc_template_to_use=None,
+                    course_language=None, catalog=None, policy=None, course_loader=None, journal=None, lookups=None):
+    # LOAD_COMMIT policy: one transaction per `policy.every` courses ("courses"), or a commit as soon as `policy.every` rows were written ("rows",
+    # always at a course boundary so a course never spans two transactions); `conn` is only used for the shared lookups
+    # - a course that fails in if_table_course is rolled back to its savepoint and left out of the commit, the rest of its group commits
+    # - an error the course loader raises (a load_batch write, a lost connection) rolls back everything since the last commit
+    course_loader = course_loader or if_table_course
+    if catalog is None:
+        catalog = build_catalog(dataframes)
+    if lookups is None:
+        lookups = get_target_lookups(conn, new_db, category)
+    step = policy.every if policy.mode == "courses" else 1
+    logger.debug(f"Loading {len(ids)} course(s), committing every {policy.every} {policy.mode}...")
+    written = {"rows": 0}
+    commits, total_courses, total_rows = 0, 0, 0
+    start_time = time.perf_counter()
+
+    with conn.engine.connect() as write_conn:
+        def count_rows(connection, cursor, statement, parameters, context, executemany):
+            if connection is write_conn and cursor.rowcount > 0 and statement.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE"):
+                written["rows"] += cursor.rowcount
+
+        event.listen(conn.engine, "after_cursor_execute", count_rows)
+        try:
+            pending = []
+            for start_index in range(0, len(ids), step):
+                group = ids[start_index:start_index + step]
+                try:
+                    pending.extend(course_loader(write_conn, image_texts, table, group, dataframes, new_db=new_db, category=category,
+                                                 cc_template_to_use=cc_template_to_use, course_language=course_language, catalog=catalog, lookups=lookups,
+                                                 journal=journal))
+                    if policy.mode == "rows" and written["rows"] < policy.every and start_index + step < len(ids):
+                        continue
+                    write_conn.commit()
+                except Exception as e:
+                    # everything since the last commit is gone, those courses are loaded again by a --resume run
+                    write_conn.rollback()
+                    lost = list(dict.fromkeys(pending + group))
+                    logger.error(f"Transaction of course(s) {lost} rolled back: {e}")
+                    if journal is not None:
+                        discard_loaded(journal, lost)
+                    pending = []
+                    written["rows"] = 0
+                    continue
+                commits += 1
+                total_courses += len(pending)
+                total_rows += written["rows"]
+                if journal is not None:
+                    record_commit(journal, pending, written["rows"], total_courses, total_rows)
+                logger.info(f"Commit {commits}: {len(pending)} course(s), {written['rows']} row(s) | progress {total_courses}/{len(ids)} course(s), "
+                            f"{total_rows} row(s) in {time.perf_counter() - start_time:.2f}s.")
+                pending = []
+                written["rows"] = 0
+        finally:
+            event.remove(conn.engine, "after_cursor_execute", count_rows)
 
 
 def get_unique_filename(output_dir: str) -> str:
@@ -1220,53 +1359,136 @@ def get_unique_filename(output_dir: str) -> str:
         version += 1
 
 
-def downloading(dataframes: Dict[str, pd.DataFrame], ids: List[int]):
+DOWNLOAD_TABLES = [("customcert_image_hash_info", "customcert"), ("resource_content_hash_info", "resource"), ("hvp_content_hash_info", "hvp")]
+
+
+def get_download_tasks(catalog, ids):
+    # every file of the batch up front, largest first: the H5P packages and PDFs start early and the small files fill the other sessions
+    courses = get_slices(catalog, "course", "id", ids)
+    shortnames = dict(zip(courses["id"], courses["shortname"])) if not courses.empty else {}
+    tasks = {}
+    for table, element in DOWNLOAD_TABLES:
+        hash_df = get_slices(catalog, table, "course_id", ids)
+        if hash_df.empty:
+            continue
+        if element == "customcert":
+            # one image (the first) per course
+            hash_df = hash_df.drop_duplicates("course_id")
+        sizes = hash_df["filesize"].fillna(0) if "filesize" in hash_df.columns else [0] * len(hash_df)
+        for course_id, contenthash, filename, size in zip(hash_df["course_id"], hash_df["contenthash"], hash_df["filename"], sizes):
+            local_path = get_local_path(filename, shortnames[course_id], course_id, element)
+            # one task per local file: two workers must never write the same path
+            tasks.setdefault(local_path, SimpleNamespace(course=int(course_id), shortname=shortnames[course_id], element=element,
+                                                         contenthash=contenthash, filename=filename, size=int(size), local_path=local_path))
+    return sorted(tasks.values(), key=lambda task: -task.size)
+
+
+def download_task(task):
+    skipped = os.path.exists(task.local_path)
+    stored = has_object(task.contenthash)
+    image_text = download_from_ftp(task.contenthash, task.filename, task.shortname, task.course, task.element)
+    # download_from_ftp logs its errors and moves on: a file that is still missing failed
+    status = "skipped" if skipped else ("failed" if not os.path.exists(task.local_path) else "stored" if stored else "downloaded")
+    return status, image_text, os.path.getsize(task.local_path) if status == "downloaded" else 0
+
+
+def downloading(dataframes: Dict[str, pd.DataFrame], ids: List[int], catalog=None, journal=None):
+    # with a resumed journal, courses whose files were all fetched (and OCR'd) by an earlier run are not downloaded again
     logger.debug(f"-------------------- Starting the downloading process... --------------------")
 
-    resource_content_hash_info_df = dataframes.get("resource_content_hash_info", pd.DataFrame())
-    hvp_content_hash_info_df = dataframes.get("hvp_content_hash_info", pd.DataFrame())
-    course_df = dataframes.get("course", pd.DataFrame())
-    customcert_image_hash_info_df = dataframes.get("customcert_image_hash_info", pd.DataFrame())
+    if catalog is None:
+        catalog = build_catalog(dataframes)
 
-    image_texts = {}
+    # a course is only reused when every one of its files is still on disk (a file may have been removed since, or have failed
+    # in a run that journaled its course anyway)
+    all_tasks = get_download_tasks(catalog, ids)
+    on_disk = {}
+    for task in all_tasks:
+        on_disk[task.course] = on_disk.get(task.course, True) and os.path.exists(task.local_path)
 
+    image_texts = {}
+    pending_ids = []
     for id in ids:
-        course = course_df[course_df["id"] == id]
-        course_copy = course.copy()
-        course_shortname = course_copy["shortname"].iloc[0]
-
-        cc_image_hash_df = customcert_image_hash_info_df[customcert_image_hash_info_df["course_id"] == id].copy()
-        image_text = None
-        if not cc_image_hash_df.empty:
-            contenthash = cc_image_hash_df["contenthash"].iloc[0]
-            filename = cc_image_hash_df["filename"].iloc[0]
-            image_text = download_from_ftp(contenthash, filename, course_shortname, id, "customcert")
-        image_texts[id] = image_text
-
-        resource_hash_df = resource_content_hash_info_df[resource_content_hash_info_df["course_id"] == id].copy()
-        if not resource_hash_df.empty:
-            for _, row in resource_hash_df.iterrows():
-                contenthash = row["contenthash"]
-                filename = row["filename"]
-                download_from_ftp(contenthash, filename, course_shortname, id, "resource")
-        
-        hvp_hash_df = hvp_content_hash_info_df[hvp_content_hash_info_df["course_id"] == id].copy()
-        if not hvp_hash_df.empty:
-            for _, row in hvp_hash_df.iterrows():
-                contenthash = row["contenthash"]
-                filename = row["filename"]
-                download_from_ftp(contenthash, filename, course_shortname, id, "hvp")
-
+        if journal is not None and journal.resume:
+            downloaded, image_text = get_download(journal, id)
+            if downloaded and on_disk.get(id, True):
+                logger.info(f"Course {id}: files already downloaded by an earlier run, reusing them.")
+                image_texts[id] = image_text
+                continue
+            if downloaded:
+                logger.warning(f"Course {id}: files journaled as downloaded by an earlier run are missing, downloading them again.")
+        image_texts[id] = None
+        pending_ids.append(id)
+
+    pending = set(pending_ids)
+    tasks = [task for task in all_tasks if task.course in pending]
+    remaining = {id: 0 for id in pending_ids}
+    failed = {id: 0 for id in pending_ids}  # per course: a course with a failed file is not journaled as downloaded
+    for task in tasks:
+        remaining[task.course] += 1
+    for id in pending_ids:
+        if journal is not None and not remaining[id]:
+            record_download(journal, id, None)
+
+    workers = max(1, min(DOWNLOAD_WORKERS or get_ftp_config().size, len(tasks) or 1))
+    summary = {"files": len(tasks), "downloaded": 0, "stored": 0, "skipped": 0, "failed": 0, "bytes": 0}
+    logger.info(f"Downloading {len(tasks)} file(s) of {len(pending_ids)} course(s) with {workers} worker(s).")
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download") as executor:
+        futures = {executor.submit(download_task, task): task for task in tasks}
+        for future in as_completed(futures):
+            task = futures[future]
+            try:
+                status, image_text, size = future.result()
+            except Exception as e:
+                logger.error(f"Error downloading {task.filename} of course {task.course}: {e}")
+                status, image_text, size = "failed", None, 0
+            summary[status] += 1
+            summary["bytes"] += size
+            if task.element == "customcert":
+                image_texts[task.course] = image_text
+            remaining[task.course] -= 1
+            if status == "failed":
+                failed[task.course] += 1
+            if remaining[task.course]:
+                continue
+            # the journal is written from this thread only, once all the files of a course are done (and only if none failed:
+            # a --resume run fetches the course again, its files already on disk are skipped)
+            if failed[task.course]:
+                logger.warning(f"Course {task.course}: {failed[task.course]} file(s) failed to download, not journaled as downloaded.")
+            elif journal is not None:
+                record_download(journal, task.course, image_texts[task.course])
+    seconds = time.perf_counter() - start_time
+    evict_file_store()
+
+    record("download", "batch", seconds, rows_in=summary["files"], rows_out=summary["downloaded"], size=summary["bytes"], error=bool(summary["failed"]))
+    failed_courses = sorted(id for id, count in failed.items() if count)
+    record_item("download_batches", **summary, failed_courses=failed_courses, workers=workers, seconds=round(seconds, 4),
+                bytes_per_second=round(summary["bytes"] / seconds) if seconds else None)
+    logger.info(f"Downloads: {summary['downloaded']} downloaded, {summary['stored']} linked from the file store, {summary['skipped']} already on disk, "
+                f"{summary['failed']} failed ({len(failed_courses)} course(s)) of {summary['files']} file(s), {summary['bytes'] / 1024 ** 2:.1f} MB in {seconds:.2f}s "
+                f"({summary['bytes'] / 1024 ** 2 / seconds if seconds else 0:.2f} MB/s). File store: {file_store_summary()}.")
     logger.info(f"-------------------- End of downloading process. --------------------")
     return image_texts
 
-def load(dataframes: Dict[str, pd.DataFrame], conn, new_db, ids: List[int], image_texts: Dict[int, str], category_to_insert, cc_template_to_use: List[str], course_language: str):
+def load(dataframes: Dict[str, pd.DataFrame], conn, new_db, ids: List[int], image_texts: Dict[int, str], category_to_insert, cc_template_to_use: List[str], course_language: str, catalog=None,
+         course_loader=None, journal=None, reference=None):
+    # course_loader: if_table_course (course at a time, default) or src.planner.load_batch (table at a time)
+    # journal: src.journal run journal, every loaded course is recorded there with its id mappings
+    # reference: src.reference NEW DB reference data, the target lookups come from it instead of the DB
     logger.debug(f"-------------------- Starting the loading process... --------------------")
 
     output_dir = "src/loaded"
     os.makedirs(output_dir, exist_ok=True)
     output_path = get_unique_filename(output_dir)
 
+    # a write error of the course loader is not caught here: the caller's transaction has to roll back
+    if not dataframes.get("course", pd.DataFrame()).empty:
+        lookups = get_target_lookups(conn, new_db, category_to_insert, reference)
+        (course_loader or if_table_course)(conn, image_texts, "course", ids, dataframes=dataframes, new_db=new_db, category=category_to_insert,
+                                           cc_template_to_use=cc_template_to_use, course_language=course_language, catalog=catalog,
+                                           journal=journal, lookups=lookups)
+
     with pd.ExcelWriter(output_path, engine="xlsxwriter") as writer:
         try:
             for table, df in dataframes.items():
@@ -1276,14 +1498,11 @@ def load(dataframes: Dict[str, pd.DataFrame], conn, new_db, ids: List[int], imag
                     continue
 
                 logger.info(f"{table.upper()} loaded successfully with {len(df)} rows.")
-
-                if table == "course":
-                    if_table_course(conn, image_texts, table, ids, dataframes=dataframes, new_db=new_db, category=category_to_insert, cc_template_to_use=cc_template_to_use, course_language=course_language)
-
                 logger.info(f"{table.upper()} has {len(df.columns)} columns: {df.columns.tolist()}.")
 
                 df.to_excel(writer, sheet_name=table, index=False)
             logger.info(f"File successfully saved: {os.path.basename(output_path)}.")
+            save_writer_timings(output_path.replace(".xlsx", "_writers.json"))
         except Exception as e:
             logger.error(f"Error creating the xlsx file: {e}.")
     logger.info(f"-------------------- End of loading process. --------------------")
\ No newline at end of file
@@ -0,0 +1,149 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from types import SimpleNamespace
+from src.logging import start
+
+
+logger = start()
+
+# the run report is written next to src/logs/etl.log: rewritten every METRICS_REPORT_INTERVAL seconds while courses load, and at the end
+REPORT_PATH = os.path.join("src", "logs", "etl_report.json")
+REPORT_INTERVAL = float(os.getenv("METRICS_REPORT_INTERVAL", "30"))
+# ETA: completion rate of the last METRICS_ETA_WINDOW courses
+ETA_WINDOW = int(os.getenv("METRICS_ETA_WINDOW", "20"))
+
+lock = threading.Lock()
+local = threading.local()  # rows written by the current thread, per course deltas
+stages = {}  # (stage, name) -> [calls, errors, rows_in, rows_out, bytes, seconds]
+items = {}  # per file / per image / per course detail
+progress = SimpleNamespace(started=time.time(), total=0, done=0, failed=0, finished=deque(maxlen=ETA_WINDOW), last_report=0.0)
+
+
+def start_run(total_courses):
+    with lock:
+        stages.clear()
+        items.clear()
+        progress.started, progress.total, progress.done, progress.failed = time.time(), total_courses, 0, 0
+        progress.finished.clear()
+        progress.last_report = time.time()
+
+
+def record(stage, name, seconds, rows_in=None, rows_out=None, size=None, error=False):
+    with lock:
+        entry = stages.setdefault((stage, name), [0, 0, 0, 0, 0, 0.0])
+        entry[0] += 1
+        entry[1] += int(error)
+        entry[2] += rows_in or 0
+        entry[3] += rows_out or 0
+        entry[4] += size or 0
+        entry[5] += seconds
+    if stage == "load" and rows_out:
+        local.rows = getattr(local, "rows", 0) + rows_out
+
+
+def record_item(kind, **fields):
+    with lock:
+        items.setdefault(kind, []).append(fields)
+
+
+@contextmanager
+def measure(stage, name, rows_in=None):
+    # with measure("transform", "transform_page", len(df)) as metric: ... metric.rows_out = len(result)
+    metric = SimpleNamespace(rows_in=rows_in, rows_out=None, size=None, seconds=0.0)
+    start_time = time.perf_counter()
+    error = False
+    try:
+        yield metric
+    except Exception:
+        error = True
+        raise
+    finally:
+        metric.seconds = time.perf_counter() - start_time
+        record(stage, name, metric.seconds, metric.rows_in, metric.rows_out, metric.size, error)
+
+
+def start_course(old_course_id=None):
+    local.course = old_course_id
+    return SimpleNamespace(started=time.perf_counter(), rows=getattr(local, "rows", 0))
+
+
+def current_course():
+    # OLD course id the current thread is loading (None outside of a course)
+    return getattr(local, "course", None)
+
+
+def finish_course(old_course_id, token, new_course_id=None, failed=False):
+    seconds = time.perf_counter() - token.started
+    rows = getattr(local, "rows", 0) - token.rows
+    local.course = None
+    with lock:
+        progress.failed += int(failed)
+        progress.done += int(not failed)
+        progress.finished.append(time.time())
+        items.setdefault("courses", []).append({"old_course_id": int(old_course_id), "new_course_id": None if new_course_id is None else int(new_course_id),
+                                                "status": "failed" if failed else "loaded", "seconds": round(seconds, 4), "rows": rows,
+                                                "rows_per_second": round(rows / seconds, 1) if seconds else None})
+        rate, remaining = course_rate(seconds), max(0, progress.total - progress.done - progress.failed)
+        position = progress.done + progress.failed
+        report_due = time.time() - progress.last_report >= REPORT_INTERVAL
+    eta = f", ETA {format_seconds(remaining / rate)}" if rate and remaining else ""
+    logger.info(f"Course {old_course_id} {'failed' if failed else 'loaded'} in {seconds:.2f}s ({rows} row(s)) - {position}/{progress.total or '?'}{eta}.")
+    if report_due:
+        save_run_report()
+
+
+def course_rate(last_seconds=None):
+    # courses per second over the rolling window (completion times, so parallel workers count once each)
+    finished = list(progress.finished)
+    if len(finished) >= 2 and finished[-1] > finished[0]:
+        return (len(finished) - 1) / (finished[-1] - finished[0])
+    return 1 / last_seconds if last_seconds else None
+
+
+def format_seconds(seconds):
+    hours, rest = divmod(int(seconds), 3600)
+    return f"{hours}h{rest // 60:02d}m" if hours else f"{rest // 60}m{rest % 60:02d}s"
+
+
+def run_report():
+    with lock:
+        entries = {key: list(value) for key, value in stages.items()}
+        details = {kind: list(rows) for kind, rows in items.items()}
+        rate = course_rate()
+        remaining = max(0, progress.total - progress.done - progress.failed)
+        summary = {"total": progress.total, "loaded": progress.done, "failed": progress.failed, "remaining": remaining,
+                   "courses_per_minute": round(rate * 60, 2) if rate else None,
+                   "eta_seconds": round(remaining / rate) if rate and remaining else (0 if not remaining else None)}
+        started = progress.started
+    report = {"started": datetime.fromtimestamp(started).isoformat(timespec="seconds"), "updated": datetime.now().isoformat(timespec="seconds"),
+              "elapsed_seconds": round(time.time() - started, 2), "progress": summary, "stages": {}}
+    for (stage, name), (calls, errors, rows_in, rows_out, size, seconds) in sorted(entries.items(), key=lambda item: -item[1][5]):
+        report["stages"].setdefault(stage, {"seconds": 0.0, "rows_out": 0, "metrics": {}})
+        report["stages"][stage]["seconds"] += seconds
+        report["stages"][stage]["rows_out"] += rows_out
+        report["stages"][stage]["metrics"][name] = {"calls": calls, "errors": errors, "rows_in": rows_in, "rows_out": rows_out, "bytes": size,
+                                                    "seconds": round(seconds, 4), "rows_per_second": round(rows_out / seconds, 1) if seconds else None}
+    for entry in report["stages"].values():
+        entry["seconds"] = round(entry["seconds"], 4)
+        entry["rows_per_second"] = round(entry["rows_out"] / entry["seconds"], 1) if entry["seconds"] else None
+    report.update(details)
+    return report
+
+
+def save_run_report(path=REPORT_PATH):
+    report = run_report()
+    with lock:
+        progress.last_report = time.time()
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+    except Exception as e:
+        logger.warning(f"Could not write the run report {path}: {e}.")
+    return report
@@ -0,0 +1,61 @@
+from typing import Dict
+import numpy as np
+import pandas as pd
+from src.logging import start
+
+
+logger = start()
+
+# low-cardinality strings the loader only reads (never assigns new values to), safe to keep as categoricals
+CATEGORY_COLUMNS = {"format", "qtype", "component", "filearea", "mimetype", "enrol", "course_module_type"}
+CATEGORY_COLUMNS_BY_TABLE = {"modules": {"name"}}
+# id columns the loader rewrites in place through masked .loc assignments of mapped (int64) ids: kept as int64, pandas refuses
+# to upcast an int32 column that way
+INT64_COLUMNS_BY_TABLE = {"course_modules": {"instance"}}
+
+
+def is_id_column(column):
+    return column == "id" or column.endswith("id") or column in {"course", "category", "module", "instance", "section", "question", "feedback", "template"}
+
+
+def optimize_frame(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    df = df.copy()
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_integer_dtype(series) and not pd.api.types.is_extension_array_dtype(series):
+            if series.empty:
+                continue
+            if column in INT64_COLUMNS_BY_TABLE.get(table, set()):
+                continue
+            if is_id_column(column):
+                # ids never go below int32: the loader writes new (bigger) ids into slices of these columns
+                if series.min() >= np.iinfo(np.int32).min and series.max() <= np.iinfo(np.int32).max:
+                    df[column] = series.astype(np.int32)
+            else:
+                # flags (0/1), enumerations and timestamps
+                df[column] = pd.to_numeric(series, downcast="integer")
+        elif series.dtype == object and (column in CATEGORY_COLUMNS or column in CATEGORY_COLUMNS_BY_TABLE.get(table, set())):
+            df[column] = series.astype("category")
+    return df
+
+
+def optimize_dtypes(dataframes: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    logger.debug(f"-------------------- Starting the dtype optimisation process... --------------------")
+    total_before = 0
+    total_after = 0
+
+    for table, df in dataframes.items():
+        try:
+            before = int(df.memory_usage(deep=True).sum())
+            optimized = optimize_frame(df, table)
+            after = int(optimized.memory_usage(deep=True).sum())
+            dataframes[table] = optimized
+            total_before += before
+            total_after += after
+            logger.debug(f"{table.upper()} memory: {before / 1024 / 1024:.2f} MB -> {after / 1024 / 1024:.2f} MB.")
+        except Exception as e:
+            logger.error(f"Error optimising dtypes of {table.upper()}: {e}.")
+
+    logger.info(f"Catalogue memory: {total_before / 1024 / 1024:.2f} MB -> {total_after / 1024 / 1024:.2f} MB.")
+    logger.info(f"-------------------- End of dtype optimisation process. --------------------")
+    return dataframes
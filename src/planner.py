@@ -0,0 +1,372 @@
+from typing import Dict, List
+import pandas as pd
+from sqlalchemy import text, bindparam
+from src.logging import start
+from src.catalog import build_catalog, get_table, get_slices
+from src.ids import insert_with_ids
+from src.writer import append_rows
+from src.transform import transform_sequence
+from src.journal import record_course, record_failure
+from src.load import (create_local_recompletion_df, create_course_customfield_data_df, create_feedback_instance_df, create_feedback_items_df,
+                      create_page_ex_element_df, create_customcert_instance_df, create_customcert_template_df, create_customcert_page_df,
+                      create_customcert_elements_df, insert_course_modules, transform_course_sections_df, get_target_lookups, sql_concat, create_course_df,
+                      remap_course_modules, get_suppress_targets, update_suppress_targets, get_first_available_cms, make_available,
+                      create_course_format_options_df)
+
+
+logger = start()
+
+# child tables copied as they are: (table, parent column, columns dropped before the insert)
+COURSE_CHILD_TABLES = [
+    ("page", "course", ["content_link"]),
+    ("label", "course", []),
+    ("url", "course", []),
+    ("enrol", "courseid", []),
+]
+QUESTION_TYPE_TABLES = [
+    ("qtype_ddimageortext", None), ("qtype_ddimageortext_drags", None), ("qtype_ddimageortext_drops", None),
+    ("qtype_ddmarker", None), ("qtype_ddmarker_drags", None), ("qtype_ddmarker_drops", None),
+    ("qtype_essay_options", None), ("qtype_match_options", None), ("qtype_match_subquestions", None),
+    ("qtype_multichoice_options", None), ("qtype_randomsamatch_options", None), ("qtype_shortanswer_options", None),
+    ("question_ddwtos", None), ("question_gapselect", None), ("question_truefalse", "showstandardinstruction"),
+]
+
+
+def remap(df, column, mapping, keep_missing=False):
+    # mapping is keyed by (old course, old id)
+    if df.empty:
+        return pd.Series(dtype=object)
+    values = [mapping.get((course, value), value if keep_missing else None) for course, value in zip(df["old_course"], df[column])]
+    return pd.Series(values, index=df.index, dtype=object)
+
+
+def insert_planned(conn, table_name, df, label, drop=()):
+    # one insert (chunked by insert_with_ids) for the whole batch, returns {(old course, old id): new id}
+    # (a write error is raised: the caller's transaction rolls the whole batch back, nothing of it is journaled)
+    if df.empty:
+        return {}
+    keys = list(zip(df["old_course"], df["id"]))
+    new_ids = insert_with_ids(conn, table_name, df.drop(columns=["id", "old_course", *[c for c in drop if c in df.columns]]))
+    logger.info(f"{len(new_ids)} {label}(s) inserted for {df['old_course'].nunique()} course(s).")
+    return dict(zip(keys, new_ids))
+
+
+def append_planned(conn, table_name, df, label, drop=()):
+    # children nobody points to: plain append, no ids needed
+    if df.empty:
+        return
+    df = df.drop(columns=[c for c in ["id", "old_course", *drop] if c in df.columns])
+    append_rows(conn, table_name, df)
+    logger.info(f"{len(df)} {label}(s) inserted for the batch.")
+
+
+def owned_by(df, column, owners):
+    # rows of df whose `column` points to one of `owners` ({old parent id: old course}), tagged with their old course
+    df = df[df[column].isin(owners.keys())].copy() if not df.empty else df.copy()
+    df["old_course"] = df[column].map(owners) if not df.empty else pd.Series(dtype=object)
+    return df
+
+
+def update_by_case(conn, table_name, column, key_column, values, label):
+    # one UPDATE ... SET column = CASE key WHEN .. THEN .. END for every key of `values`
+    if not values:
+        return
+    params = {}
+    cases = []
+    for i, (key, value) in enumerate(values.items()):
+        cases.append(f"WHEN :k{i} THEN :v{i}")
+        params[f"k{i}"] = int(key)
+        params[f"v{i}"] = value
+    stmt = text(f"UPDATE {table_name} SET {column} = CASE {key_column} {' '.join(cases)} END WHERE {key_column} IN :keys")
+    stmt = stmt.bindparams(bindparam("keys", expanding=True))
+    conn.execute(stmt, {**params, "keys": [int(key) for key in values]})
+    logger.info(f"{len(values)} {label}(s) updated for the batch.")
+
+
+def load_batch(conn, image_texts, table: str, ids: List[int], dataframes: Dict[str, pd.DataFrame], new_db: str = '', category: int = 1, cc_template_to_use=None, course_language=None, catalog=None,
+               lookups=None, journal=None):
+    # same copy as if_table_course, but table-at-a-time: every table is written once for all the courses of the batch,
+    # in dependency order, with the old -> new mappings keyed by (old course, old id)
+    # every write error is raised: the batch is one unit, rolled back by the caller's transaction and journaled only once it is all written
+    # (returns the old ids of the courses it loaded)
+    t = lambda name: f"{new_db.prefix}_{name}"
+    if catalog is None:
+        catalog = build_catalog(dataframes)
+    cc_template_to_use = cc_template_to_use or []
+    logger.debug(f"Planning a table-at-a-time load of {len(ids)} course(s)...")
+
+    modules_df = get_table(catalog, "modules")
+    old_modules_map = dict(zip(modules_df["id"], modules_df["name"]))
+    if lookups is None:
+        lookups = get_target_lookups(conn, new_db, category)
+    new_modules_map = lookups.modules_map
+
+    # COURSE
+    courses = get_slices(catalog, "course", "id", ids)
+    found = set(courses["id"].tolist())
+    for missing_id in ids:
+        if missing_id not in found:
+            logger.warning(f"No row(s) found in 'COURSE' with id {missing_id}.")
+    course_contexts = get_slices(catalog, "context_course", "instanceid", ids).drop_duplicates("instanceid")
+    old_context_by_course = dict(zip(course_contexts["instanceid"], course_contexts["id"]))
+    customfield_df = get_slices(catalog, "customfield_data", "instanceid", ids)
+    carga_horaria_by_course = dict(zip(customfield_df.loc[customfield_df["fieldid"] == 8, "instanceid"], customfield_df.loc[customfield_df["fieldid"] == 8, "value"]))
+    ready = courses["id"].isin(old_context_by_course.keys()) & courses["id"].isin(carga_horaria_by_course.keys())
+    for skipped_id in courses.loc[~ready, "id"]:
+        logger.error(f"Error inserting copied COURSE based on ID {skipped_id}: no course context or carga horaria (customfield 8) found.")
+        if journal is not None:
+            record_failure(journal, skipped_id, "no course context or carga horaria (customfield 8) found")
+    courses = courses[ready].copy()
+    if courses.empty:
+        return []
+
+    old_course_ids = courses["id"].tolist()
+    course_shortnames = dict(zip(courses["id"], courses["shortname"]))
+    new_course_ids = insert_with_ids(conn, t(table), create_course_df(courses, category))
+    course_map = dict(zip(old_course_ids, new_course_ids))  # old course -> new course
+    logger.info(f"{len(new_course_ids)} NEW COURSE(s) inserted successfully! OLD -> NEW: {course_map}")
+
+    append_planned(conn, t("local_recompletion_config"), pd.concat([create_local_recompletion_df(new_id) for new_id in new_course_ids], ignore_index=True),
+                   "local_recompletion_config")
+
+    # COURSE CONTEXT (contextlevel 50) + path, in one insert and one update
+    context_category_id = lookups.context_category_id
+    course_context_rows = pd.DataFrame({"contextlevel": 50, "instanceid": new_course_ids, "depth": 3, "path": None})
+    new_context_ids = insert_with_ids(conn, t("context"), course_context_rows)
+    context_map = dict(zip(old_course_ids, new_context_ids))  # old course -> new course context
+    stmt = text(f"UPDATE {t('context')} SET path = {sql_concat(conn, ':prefix', 'id')} WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+    conn.execute(stmt, {"prefix": f"/1/{context_category_id}/", "ids": new_context_ids})
+
+    # CUSTOMFIELD DATA
+    customfield_rows = []
+    for old_id in old_course_ids:
+        cf_data_df = customfield_df[customfield_df["instanceid"] == old_id].drop(columns=["id"])
+        customfield_rows.append(create_course_customfield_data_df(course_map[old_id], context_map[old_id], cf_data_df, image_texts.get(old_id)))
+    append_planned(conn, t("customfield_data"), pd.concat(customfield_rows, ignore_index=True), "customfield_data")
+
+    # QUESTION CATEGORY
+    categories = owned_by(get_slices(catalog, "question_categories", "contextid", old_context_by_course.values()), "contextid",
+                          {ctx: course for course, ctx in old_context_by_course.items() if course in course_map})
+    categories["contextid"] = categories["old_course"].map(context_map)
+    category_map = insert_planned(conn, t("question_categories"), categories, "question_category")
+
+    # CHOICE + CHOICE OPTIONS
+    choices = owned_by(get_slices(catalog, "choice", "course", old_course_ids), "course", {c: c for c in old_course_ids})
+    choices["course"] = choices["old_course"].map(course_map)
+    choice_map = insert_planned(conn, t("choice"), choices, "choice")
+    choice_options = owned_by(get_slices(catalog, "choice_options", "choiceid", [k[1] for k in choice_map]), "choiceid", {k[1]: k[0] for k in choice_map})
+    choice_options["choiceid"] = remap(choice_options, "choiceid", choice_map)
+    append_planned(conn, t("choice_options"), choice_options, "choice_options")
+
+    # PAGE, LABEL, URL, ENROL
+    instance_maps = {}
+    for child, parent_column, drop in COURSE_CHILD_TABLES:
+        rows = owned_by(get_slices(catalog, child, parent_column, old_course_ids), parent_column, {c: c for c in old_course_ids})
+        rows[parent_column] = rows["old_course"].map(course_map)
+        instance_maps[child] = insert_planned(conn, t(child), rows, child, drop)
+
+    # FEEDBACK (one per course) + its items
+    feedback_map = {}  # old course -> new feedback
+    feedback_item_df = dataframes.get(f"feedback_item_{course_language}", pd.DataFrame())
+    if not feedback_item_df.empty:
+        feedbacks = pd.concat([create_feedback_instance_df(course_map[old_id], course_language) for old_id in old_course_ids], ignore_index=True)
+        feedback_map = dict(zip(old_course_ids, insert_with_ids(conn, t("feedback"), feedbacks)))
+        items = [create_feedback_items_df(feedback_id, feedback_item_df.copy()) for feedback_id in feedback_map.values()]
+        if items:
+            append_planned(conn, t("feedback_item"), pd.concat(items, ignore_index=True), "feedback item")
+
+    # RESOURCE, HVP -> EX-PAGES
+    for element_type in ("resource", "hvp"):
+        elements = owned_by(get_slices(catalog, element_type, "course", old_course_ids), "course", {c: c for c in old_course_ids})
+        if elements.empty:
+            instance_maps[element_type] = {}
+            continue
+        ex_pages = pd.concat([create_page_ex_element_df(element_type, course_map[course], name) for course, name in zip(elements["old_course"], elements["name"])],
+                             ignore_index=True)
+        ex_pages["id"] = elements["id"].values
+        ex_pages["old_course"] = elements["old_course"].values
+        instance_maps[element_type] = insert_planned(conn, t("page"), ex_pages, f"EX-{element_type.upper()} page")
+
+    # QUIZ
+    quizzes = owned_by(get_slices(catalog, "quiz", "course", old_course_ids), "course", {c: c for c in old_course_ids})
+    quizzes["name"] = "Final Assessment" if course_language == "en" else "Avaliação Final"
+    quizzes["course"] = quizzes["old_course"].map(course_map)
+    quiz_map = instance_maps["quiz"] = insert_planned(conn, t("quiz"), quizzes, "quiz", ["completionpass"])
+    quiz_owners = {k[1]: k[0] for k in quiz_map}
+
+    # QUIZ SECTIONS
+    quiz_sections = owned_by(get_slices(catalog, "quiz_sections", "quizid", quiz_owners.keys()), "quizid", quiz_owners)
+    quiz_sections["quizid"] = remap(quiz_sections, "quizid", quiz_map)
+    quiz_section_map = insert_planned(conn, t("quiz_sections"), quiz_sections, "quiz section")
+
+    # QUESTION + BANK ENTRIES + VERSIONS
+    questions = owned_by(get_slices(catalog, "question", "category", [k[1] for k in category_map]), "category", {k[1]: k[0] for k in category_map})
+    question_categories = remap(questions, "category", category_map)
+    question_map = insert_planned(conn, t("question"), questions, "question", ["category", "version", "hidden", "idnumber"])
+    inserted = questions[[(course, old_id) in question_map for course, old_id in zip(questions["old_course"], questions["id"])]]
+    bank_entry_map = {}
+    if not inserted.empty:
+        bank_entries = pd.DataFrame({"questioncategoryid": question_categories[inserted.index].values, "ownerid": 2})
+        bank_entry_map = dict(zip(zip(inserted["old_course"], inserted["id"]), insert_with_ids(conn, t("question_bank_entries"), bank_entries)))
+        logger.info(f"{len(bank_entry_map)} question_bank_entries inserted for the batch.")
+        versions = pd.DataFrame({
+            "questionbankentryid": [bank_entry_map.get(key) for key in question_map],
+            "version": 1,
+            "questionid": list(question_map.values()),
+            "status": "ready"
+        })
+        append_planned(conn, t("question_versions"), versions, "question_version")
+    question_owners = {k[1]: k[0] for k in question_map}
+
+    # QUESTION TYPES + ANSWERS
+    for qtype_table, option_column in QUESTION_TYPE_TABLES:
+        qtype_df = get_table(catalog, qtype_table)
+        column = "questionid" if "questionid" in qtype_df.columns else "question"
+        if qtype_df.empty or column not in qtype_df.columns:
+            continue
+        rows = owned_by(get_slices(catalog, qtype_table, column, question_owners.keys()), column, question_owners)
+        rows[column] = remap(rows, column, question_map)
+        if option_column is not None:
+            rows[option_column] = 0
+        append_planned(conn, t(qtype_table), rows, qtype_table)
+    answers = owned_by(get_slices(catalog, "question_answers", "question", question_owners.keys()), "question", question_owners)
+    answers["question"] = remap(answers, "question", question_map)
+    answer_map = insert_planned(conn, t("question_answers"), answers, "question answer")
+
+    # QUIZ SLOTS
+    slots = owned_by(get_slices(catalog, "quiz_slots", "quizid", quiz_owners.keys()), "quizid", quiz_owners)
+    slot_rows = slots.copy()
+    slot_rows["quizid"] = remap(slot_rows, "quizid", quiz_map)
+    slot_map = insert_planned(conn, t("quiz_slots"), slot_rows, "quiz slot", ["questionid", "questioncategoryid", "includingsubcategories"])
+
+    # FORUM, REENGAGEMENT
+    for child in ("forum", "reengagement"):
+        rows = owned_by(get_slices(catalog, child, "course", old_course_ids), "course", {c: c for c in old_course_ids})
+        rows["course"] = rows["old_course"].map(course_map)
+        instance_maps[child] = insert_planned(conn, t(child), rows, child)
+    instance_maps["choice"] = choice_map
+
+    # CUSTOMCERT instances (as many per course as templates requested, capped by the OLD course's customcerts)
+    course_modules = owned_by(get_slices(catalog, "course_modules", "course", old_course_ids), "course", {c: c for c in old_course_ids})
+    old_customcert_module_id = {name: module_id for module_id, name in old_modules_map.items()}.get("customcert")
+    old_customcert_counts = course_modules[course_modules["module"] == old_customcert_module_id].groupby("old_course").size().to_dict()
+    customcert_owners = []
+    for old_id in old_course_ids:
+        how_many = min(len(cc_template_to_use) if cc_template_to_use else 1, old_customcert_counts.get(old_id, 0))
+        customcert_owners.extend((old_id, template) for template in cc_template_to_use[:how_many])
+    new_customcert_ids = {}  # old course -> [new customcert ids]
+    if customcert_owners:
+        customcerts = pd.concat([create_customcert_instance_df(course_map[old_id], carga_horaria_by_course[old_id], course_language) for old_id, _ in customcert_owners],
+                                ignore_index=True)
+        for (old_id, _), cc_id in zip(customcert_owners, insert_with_ids(conn, t("customcert"), customcerts)):
+            new_customcert_ids.setdefault(old_id, []).append(cc_id)
+        logger.info(f"{len(customcert_owners)} NEW CUSTOMCERT(s) inserted for the batch.")
+
+    # COURSE MODULES + their contexts
+    cm_index = pd.DataFrame(columns=["old_course", "module", "instance", "cm_id", "context_id"])
+    cm_map, cm_context_map = {}, {}
+    if not course_modules.empty:
+        course_modules["course"] = course_modules["old_course"].map(course_map)
+        course_modules = remap_course_modules(course_modules, old_modules_map, new_modules_map, instance_maps, feedback_map, new_customcert_ids)
+
+        new_cm_ids, new_cm_context_ids = insert_course_modules(conn, course_modules, t("course_modules"), t("context"), new_course_ids)
+        cm_map = dict(zip(zip(course_modules["old_course"], course_modules["old_id"]), new_cm_ids))
+        cm_context_map = dict(zip(zip(course_modules["old_course"], course_modules["old_id"]), new_cm_context_ids))
+        cm_index = pd.DataFrame({
+            "old_course": course_modules["old_course"].values,
+            "module": course_modules["module"].values,
+            "instance": course_modules["instance"].values,
+            "cm_id": new_cm_ids,
+            "context_id": new_cm_context_ids
+        })
+        logger.info(f"{len(new_cm_ids)} course_modules (and contexts) inserted for the batch.")
+
+        # REENGAGEMENT suppresstarget: the last added quiz/page completed by view, per course (a course without one keeps none,
+        # as in if_table_course)
+        suppress_targets = {}
+        old_targets = get_suppress_targets(course_modules, new_modules_map)
+        for old_id in old_course_ids:
+            new_target = cm_map.get((old_id, old_targets.get(old_id)))
+            if new_target:
+                suppress_targets[course_map[old_id]] = new_target
+            else:
+                logger.warning(f"No REENGAGEMENT suppresstarget found for course {course_map[old_id]}.")
+        update_suppress_targets(conn, t("reengagement"), suppress_targets)
+
+    # QUESTION REFERENCES
+    quiz_contexts = cm_index[cm_index["module"] == new_modules_map.get("quiz")].drop_duplicates(["old_course", "instance"], keep="last")
+    quiz_context_map = dict(zip(quiz_contexts["instance"], quiz_contexts["context_id"]))  # new quiz ids are unique across the batch
+    references = pd.DataFrame({
+        "usingcontextid": [quiz_context_map.get(quiz_map.get((course, quiz))) for course, quiz in zip(slots["old_course"], slots["quizid"])],
+        "component": "mod_quiz",
+        "questionarea": "slot",
+        "itemid": [slot_map.get((course, slot)) for course, slot in zip(slots["old_course"], slots["id"])],
+        "questionbankentryid": [bank_entry_map.get((course, question)) for course, question in zip(slots["old_course"], slots["questionid"])]
+    })
+    missing = references.isna().any(axis=1)
+    if missing.any():
+        logger.warning(f"{int(missing.sum())} quiz slot(s) skipped: no new slot, question bank entry or quiz context found.")
+    append_planned(conn, t("question_references"), references[~missing], "question reference")
+
+    # CUSTOMCERT templates, pages and elements (one insert per table for every customcert of the batch)
+    customcert_templates = []
+    for old_id, cc_ids in new_customcert_ids.items():
+        for cc_id, template in zip(cc_ids, cc_template_to_use):
+            cc_context = cm_index.loc[(cm_index["module"] == new_modules_map.get("customcert")) & (cm_index["instance"] == cc_id), "context_id"]
+            cc_templates_df = dataframes.get(f"cc_templates_{template}", pd.DataFrame())
+            template_df = create_customcert_template_df(cc_templates_df.copy(), int(cc_context.iloc[-1]) if not cc_context.empty else None, course_shortnames[old_id])
+            customcert_templates.append((cc_id, template, template_df))
+    if customcert_templates:
+        template_ids = insert_with_ids(conn, t("customcert_templates"), pd.concat([df for _, _, df in customcert_templates], ignore_index=True))
+        update_by_case(conn, t("customcert"), "templateid", "id", {cc_id: template_id for (cc_id, _, _), template_id in zip(customcert_templates, template_ids)},
+                       "customcert templateid")
+        pages = [create_customcert_page_df(dataframes.get(f"cc_pages_{template}", pd.DataFrame()).copy(), template_id)
+                 for (_, template, _), template_id in zip(customcert_templates, template_ids)]
+        page_ids = insert_with_ids(conn, t("customcert_pages"), pd.concat(pages, ignore_index=True))
+        elements = []
+        offset = 0
+        for (_, template, _), template_pages in zip(customcert_templates, pages):
+            elements.append(create_customcert_elements_df(dataframes.get(f"cc_elements_{template}", pd.DataFrame()).copy(), page_ids[offset:offset + len(template_pages)]))
+            offset += len(template_pages)
+        element_ids = insert_with_ids(conn, t("customcert_elements"), pd.concat(elements, ignore_index=True))
+        logger.info(f"{len(template_ids)} customcert template(s), {len(page_ids)} page(s) and {len(element_ids)} element(s) inserted for the batch.")
+
+    # COURSE SECTIONS
+    sections = owned_by(get_slices(catalog, "course_sections", "course", old_course_ids), "course", {c: c for c in old_course_ids})
+    section_map = {}
+    if not sections.empty:
+        sections["course"] = sections["old_course"].map(course_map)
+        sections = transform_course_sections_df(sections, course_language)
+        cm_by_course = {}
+        for (old_id, old_cm), new_cm in cm_map.items():
+            cm_by_course.setdefault(old_id, {})[old_cm] = new_cm
+        sections["sequence"] = [transform_sequence(seq, cm_by_course.get(course, {})) for course, seq in zip(sections["old_course"], sections["sequence"])]
+        section_map = insert_planned(conn, t("course_sections"), sections, "section")
+
+        # the first module after the "Conteúdo"/"Content" section is always available
+        make_available(conn, t("course_modules"), get_first_available_cms(sections).values())
+        logger.info("All course_sections updated with correct sequences.")
+
+    # COURSE FORMAT OPTIONS
+    format_options = owned_by(get_slices(catalog, "course_format_options", "courseid", old_course_ids), "courseid", {c: c for c in old_course_ids})
+    if not format_options.empty:
+        format_options = create_course_format_options_df(format_options, section_map, course_map)
+        append_planned(conn, t("course_format_options"), format_options, "course_format_option")
+
+    if journal is not None:
+        batch_maps = {
+            "course": {(old_id, old_id): new_id for old_id, new_id in course_map.items()},
+            "context": {(old_id, old_context_by_course[old_id]): new_id for old_id, new_id in context_map.items()},
+            "course_sections": section_map, "course_modules": cm_map, "course_modules_context": cm_context_map,
+            "question_categories": category_map, "question": question_map, "question_bank_entries": bank_entry_map, "quiz_slots": slot_map,
+            "quiz_sections": quiz_section_map, "question_answers": answer_map,
+            **instance_maps
+        }
+        per_course = {old_id: {} for old_id in old_course_ids}
+        for name, mapping in batch_maps.items():
+            for (old_course, old_id), new_id in mapping.items():
+                per_course[old_course].setdefault(name, {})[old_id] = new_id
+        for old_id in old_course_ids:
+            record_course(journal, old_id, course_map[old_id], per_course[old_id])
+    logger.info(f"Batch of {len(new_course_ids)} course(s) loaded table-at-a-time.")
+    return old_course_ids
@@ -0,0 +1,161 @@
+import heapq
+import json
+import os
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+from sqlalchemy import event
+from src.logging import start
+from src.metrics import current_course
+
+
+logger = start()
+
+PROFILE_PATH = os.path.join("src", "logs", "sql_profile.json")
+# a template run at least this many times while loading one course is reported as an N+1 pattern
+N_PLUS_ONE = int(os.getenv("SQL_PROFILE_N_PLUS_ONE", "20"))
+# slowest statements / templates listed in the report
+TOP = int(os.getenv("SQL_PROFILE_TOP", "20"))
+# latencies kept per template for the p95 (reservoir sample)
+SAMPLES = 1000
+
+STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\?|(?<!:):\w+")
+VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+REPEATED_ROWS = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+WHITESPACE = re.compile(r"\s+")
+
+lock = threading.Lock()
+randomizer = random.Random(0)
+templates = {}  # (engine, template) -> {"count", "seconds", "rows", "samples", "seen"}
+courses = {}  # old course id -> {"statements", "seconds", "templates": {template: count}}
+slowest = []  # heap of the slowest single statements: (seconds, number, entry)
+counter = [0]
+
+
+@lru_cache(maxsize=4096)
+def normalise(statement):
+    # literals and bind parameters -> ?, IN lists and multi-row VALUES collapsed: one template per statement shape
+    template = STRING.sub("?", statement)
+    template = PLACEHOLDER.sub("?", template)
+    template = NUMBER.sub("?", template)
+    template = VALUE_LIST.sub("(?)", template)
+    template = REPEATED_ROWS.sub("(?)", template)
+    return WHITESPACE.sub(" ", template).strip()
+
+
+def add_sample(entry, seconds):
+    entry["seen"] += 1
+    if len(entry["samples"]) < SAMPLES:
+        entry["samples"].append(seconds)
+    else:
+        index = randomizer.randrange(entry["seen"])
+        if index < SAMPLES:
+            entry["samples"][index] = seconds
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def attach_profiler(engine, name):
+    # SQL_PROFILE=1: every statement `engine` runs is timed and counted per template and per course being loaded
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profiler_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["profiler_start"].pop()
+        template = normalise(statement)
+        rows = cursor.rowcount if cursor.rowcount and cursor.rowcount > 0 else 0
+        course = current_course()
+        with lock:
+            entry = templates.setdefault((name, template), {"count": 0, "seconds": 0.0, "rows": 0, "samples": [], "seen": 0})
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["rows"] += rows
+            add_sample(entry, seconds)
+            if course is not None:
+                course_entry = courses.setdefault(course, {"statements": 0, "seconds": 0.0, "templates": {}})
+                course_entry["statements"] += 1
+                course_entry["seconds"] += seconds
+                course_entry["templates"][(name, template)] = course_entry["templates"].get((name, template), 0) + 1
+            counter[0] += 1
+            if len(slowest) < TOP or seconds > slowest[0][0]:
+                item = (seconds, counter[0], {"engine": name, "template": template, "course": course, "rows": rows,
+                                              "executemany": executemany, "seconds": round(seconds, 6)})
+                if len(slowest) < TOP:
+                    heapq.heappush(slowest, item)
+                else:
+                    heapq.heapreplace(slowest, item)
+
+    logger.info(f"SQL profiler attached to the {name.upper()} engine.")
+
+
+def profile_report():
+    with lock:
+        entries = {key: dict(value, samples=list(value["samples"])) for key, value in templates.items()}
+        per_course = {course: dict(value, templates=dict(value["templates"])) for course, value in courses.items()}
+        slow = [item[2] for item in sorted(slowest, reverse=True)]
+    all_samples = [sample for entry in entries.values() for sample in entry["samples"]]
+    statements = sum(entry["count"] for entry in entries.values())
+
+    report_templates = []
+    for (name, template), entry in entries.items():
+        report_templates.append({"engine": name, "template": template, "count": entry["count"], "rows": entry["rows"],
+                                 "total_seconds": round(entry["seconds"], 4), "mean_ms": round(1000 * entry["seconds"] / entry["count"], 3),
+                                 "p95_ms": round(1000 * percentile(entry["samples"], 0.95), 3)})
+    report_templates.sort(key=lambda item: -item["total_seconds"])
+
+    # N+1: the same template run N_PLUS_ONE+ times inside one course, worst total first
+    repeated = {}
+    for course, entry in per_course.items():
+        for key, count in entry["templates"].items():
+            if count >= N_PLUS_ONE:
+                flagged = repeated.setdefault(key, {"courses": 0, "max_per_course": 0, "statements": 0})
+                flagged["courses"] += 1
+                flagged["max_per_course"] = max(flagged["max_per_course"], count)
+                flagged["statements"] += count
+    n_plus_one = [{"engine": name, "template": template, **flagged,
+                   "seconds": round(entries[(name, template)]["seconds"] * flagged["statements"] / entries[(name, template)]["count"], 4)}
+                  for (name, template), flagged in repeated.items()]
+    n_plus_one.sort(key=lambda item: -item["statements"])
+
+    course_rows = [{"course": course, "statements": entry["statements"], "seconds": round(entry["seconds"], 4), "templates": len(entry["templates"])}
+                   for course, entry in per_course.items()]
+    course_rows.sort(key=lambda item: -item["statements"])
+    return {
+        "statements": statements,
+        "seconds": round(sum(entry["seconds"] for entry in entries.values()), 4),
+        "p95_ms": round(1000 * percentile(all_samples, 0.95), 3) if all_samples else None,
+        "templates": len(entries),
+        "courses": len(per_course),
+        "statements_per_course": round(sum(entry["statements"] for entry in per_course.values()) / len(per_course), 1) if per_course else None,
+        "n_plus_one_threshold": N_PLUS_ONE,
+        "n_plus_one": n_plus_one,
+        "top_templates": report_templates[:TOP],
+        "slowest_statements": slow,
+        "per_course": course_rows,
+        "all_templates": report_templates,
+    }
+
+
+def save_profile_report(path=PROFILE_PATH):
+    report = profile_report()
+    logger.info(f"SQL profile: {report['statements']} statement(s) in {report['seconds']:.2f}s, {report['templates']} template(s), "
+                f"p95 {report['p95_ms']} ms, {report['statements_per_course']} statement(s) per course.")
+    for item in report["n_plus_one"][:10]:
+        logger.warning(f"N+1: {item['statements']} run(s) over {item['courses']} course(s) (up to {item['max_per_course']} per course): "
+                       f"{item['template'][:200]}")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"SQL profile saved: {path}.")
+    return report
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import time
+import pandas as pd
+from types import SimpleNamespace
+from sqlalchemy import text
+from src.cache import read_frame, write_frame
+from src.logging import start
+
+
+logger = start()
+
+# NEW DB customcert template copied into every course: template id and the ids of its pages' elements
+CUSTOMCERT_TEMPLATES = {
+    "default_ptbr": (2, [3, 10]),
+    "default_en": (15, [222, 223]),
+    "antigo_vertical": (237, [679]),
+    "dica": (238, [680, 681]),
+    "galaxia_maritima": (239, [682, 683]),
+    "galaxia_navegacao": (240, [684, 685]),
+    "rvelasquez": (241, [686, 687]),
+}
+# feedback_item template by course language
+FEEDBACK_TEMPLATES = {"ptbr": 2, "en": 4}
+CUSTOMFIELD_CATEGORY = 7
+
+
+def reference_queries(db_prefix):
+    # one query per reference set: every template / language / category at once
+    template_ids = ", ".join(str(template_id) for template_id, _ in CUSTOMCERT_TEMPLATES.values())
+    page_ids = ", ".join(str(page_id) for _, page_ids in CUSTOMCERT_TEMPLATES.values() for page_id in page_ids)
+    feedback_templates = ", ".join(str(template) for template in FEEDBACK_TEMPLATES.values())
+    return {
+        "modules": (f"{db_prefix}_modules", "1 = 1", "id"),
+        "category_contexts": (f"{db_prefix}_context", "contextlevel = 40", "id"),
+        "customfield_field": (f"{db_prefix}_customfield_field", f"categoryid = {CUSTOMFIELD_CATEGORY}", "id"),
+        "feedback_items": (f"{db_prefix}_feedback_item", f"feedback = 0 AND template IN ({feedback_templates})", "id"),
+        "cc_templates": (f"{db_prefix}_customcert_templates", f"id IN ({template_ids})", "id"),
+        "cc_pages": (f"{db_prefix}_customcert_pages", f"templateid IN ({template_ids})", "id, sequence"),
+        "cc_elements": (f"{db_prefix}_customcert_elements", f"pageid IN ({page_ids})", "pageid, sequence"),
+    }
+
+
+def signature_query(queries, columns):
+    # row count + XOR of the rows' CRC32, one UNION ALL for every set: only the rows a set selects count, so the
+    # loader's own writes (new customcert templates, feedback items, contexts) never invalidate it
+    parts = []
+    for name, (table_name, where, _) in queries.items():
+        row = ", ".join(f"COALESCE(`{column}`, 'NULL')" for column in columns[name])
+        parts.append(f"SELECT '{name}' AS name, COUNT(*) AS row_count, COALESCE(BIT_XOR(CRC32(CONCAT_WS('|', {row}))), 0) AS checksum "
+                     f"FROM {table_name} WHERE {where}")
+    return " UNION ALL ".join(parts)
+
+
+def read_signatures(conn, queries, columns):
+    if conn.dialect.name != "mysql" or not queries:
+        return {}
+    rows = conn.execute(text(signature_query(queries, columns))).mappings()
+    return {row["name"]: f"{row['row_count']}:{row['checksum']}" for row in rows}
+
+
+def reference_dir(cache_dir, db_name, db_prefix):
+    return os.path.join(cache_dir, hashlib.sha1(f"{db_name}|{db_prefix}".encode("utf-8")).hexdigest()[:16])
+
+
+def read_reference_index(directory):
+    index_path = os.path.join(directory, "index.json")
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_reference_index(directory, index):
+    os.makedirs(directory, exist_ok=True)
+    index_path = os.path.join(directory, "index.json")
+    with open(f"{index_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    os.replace(f"{index_path}.tmp", index_path)
+
+
+def load_reference_data(conn, db, cache_dir="src/cache/reference"):
+    # NEW DB reference rows read once per run (or taken from disk while their checksum holds) and shared by every course and worker
+    # the signatures and the rows are read in one REPEATABLE READ transaction: they come from the same snapshot, a row the live site
+    # changes in between is never cached under a signature computed without it (a caller's open transaction is used as it is)
+    if conn.dialect.name == "mysql" and not conn.in_transaction():
+        conn.execution_options(isolation_level="REPEATABLE READ")
+        with conn.begin():
+            return read_reference_data(conn, db, cache_dir)
+    return read_reference_data(conn, db, cache_dir)
+
+
+def read_reference_data(conn, db, cache_dir):
+    start_time = time.perf_counter()
+    queries = reference_queries(db.prefix)
+    directory = reference_dir(cache_dir, f"{db.host}:{db.port}/{db.name}", db.prefix) if cache_dir else None
+    index = read_reference_index(directory) if directory else {}
+    frames = {}
+
+    cached = {name: entry for name, entry in index.items() if name in queries and os.path.exists(os.path.join(directory, f"{name}.feather"))}
+    if cached:
+        signatures = read_signatures(conn, {name: queries[name] for name in cached}, {name: entry["columns"] for name, entry in cached.items()})
+        for name, entry in cached.items():
+            if signatures.get(name) == entry["signature"]:
+                frames[name] = read_frame(os.path.join(directory, f"{name}.feather"))
+        logger.info(f"Reference data: {len(frames)}/{len(queries)} set(s) still valid on disk.")
+
+    stale = {name: query for name, query in queries.items() if name not in frames}
+    for name, (table_name, where, order_by) in stale.items():
+        frames[name] = pd.read_sql(f"SELECT * FROM {table_name} WHERE {where} ORDER BY {order_by}", conn)
+        logger.debug(f"Reference set '{name}': {len(frames[name])} row(s) read from {table_name}.")
+
+    if directory and stale:
+        try:
+            signatures = read_signatures(conn, stale, {name: list(frames[name].columns) for name in stale})
+            for name in stale:
+                if name in signatures:
+                    write_frame(os.path.join(directory, f"{name}.feather"), frames[name])
+                    index[name] = {"signature": signatures[name], "columns": list(frames[name].columns), "created": time.time()}
+            write_reference_index(directory, index)
+        except Exception as e:
+            logger.warning(f"Could not persist the reference data ({directory}): {e}.")
+
+    modules, contexts = frames["modules"], frames["category_contexts"]
+    logger.info(f"Reference data ready in {time.perf_counter() - start_time:.2f}s ({len(stale)} set(s) read from the DB).")
+    return SimpleNamespace(
+        frames=frames,
+        modules_map=dict(zip(modules["name"], modules["id"].astype(int))),
+        category_contexts=dict(zip(contexts["instanceid"].astype(int), contexts["id"].astype(int))),
+    )
+
+
+def reference_dataframes(reference):
+    # the tables extract(..., "new") used to produce, one per template / language
+    frames = reference.frames
+    dataframes = {}
+    for name, (template_id, page_ids) in CUSTOMCERT_TEMPLATES.items():
+        dataframes[f"cc_templates_{name}"] = frames["cc_templates"][frames["cc_templates"]["id"] == template_id].head(1).reset_index(drop=True)
+        dataframes[f"cc_pages_{name}"] = frames["cc_pages"][frames["cc_pages"]["templateid"] == template_id].reset_index(drop=True)
+        dataframes[f"cc_elements_{name}"] = frames["cc_elements"][frames["cc_elements"]["pageid"].isin(page_ids)].reset_index(drop=True)
+    dataframes["customfield_field_new"] = frames["customfield_field"]
+    for language, template in FEEDBACK_TEMPLATES.items():
+        dataframes[f"feedback_item_{language}"] = frames["feedback_items"][frames["feedback_items"]["template"] == template].reset_index(drop=True)
+    return dataframes
@@ -0,0 +1,120 @@
+import json
+import os
+import re
+import threading
+import time
+from sqlalchemy import create_engine, event
+from src.logging import start
+
+
+logger = start()
+
+SIMULATION_DIR = os.path.join(os.path.dirname(__file__), "simulation")
+# statement verb + the table it targets: "INSERT mdl_question", "UPDATE mdl_context", "SELECT mdl_modules"...
+STATEMENT_PATTERNS = [
+    ("INSERT", re.compile(r"^\s*INSERT\s+(?:OR\s+\w+\s+)?INTO\s+`?(\w+)", re.IGNORECASE)),
+    ("UPDATE", re.compile(r"^\s*UPDATE\s+`?(\w+)", re.IGNORECASE)),
+    ("DELETE", re.compile(r"^\s*DELETE\s+FROM\s+`?(\w+)", re.IGNORECASE)),
+    ("SELECT", re.compile(r"^\s*SELECT\b.*?\bFROM\s+`?(\w+)", re.IGNORECASE | re.DOTALL)),
+]
+
+
+def run_script(conn, path, prefix):
+    with open(path, "r", encoding="utf-8") as f:
+        script = f.read().replace("{prefix}", prefix)
+    lines = [line for line in script.splitlines() if not line.lstrip().startswith("--")]
+    for statement in "\n".join(lines).split(";\n"):
+        if statement.strip():
+            conn.exec_driver_sql(statement)
+
+
+def create_simulation_engine(path, prefix):
+    # fresh SQLite stand-in for the NEW DB: the bundled schema (src/simulation/schema.sql) and reference rows (seed.sql)
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(f"{path}{suffix}"):
+                os.remove(f"{path}{suffix}")
+    engine = create_engine(f"sqlite:///{path}")
+
+    # pysqlite only sends BEGIN before a DML statement: a SAVEPOINT (if_table_course, one per course) would open and RELEASE commit
+    # a transaction of its own, so SQLAlchemy emits the BEGIN itself
+    @event.listens_for(engine, "connect")
+    def disable_pysqlite_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    with engine.begin() as conn:
+        run_script(conn, os.path.join(SIMULATION_DIR, "schema.sql"), prefix)
+        run_script(conn, os.path.join(SIMULATION_DIR, "seed.sql"), prefix)
+    attach_report(engine)
+    logger.info(f"Simulation target ready: {path} (prefix '{prefix}').")
+    return engine
+
+
+def statement_phase(statement):
+    for verb, pattern in STATEMENT_PATTERNS:
+        match = pattern.match(statement)
+        if match:
+            return f"{verb} {match.group(1)}"
+    return statement.split(None, 1)[0].upper() if statement.strip() else "?"
+
+
+def attach_report(engine):
+    # counts every statement the loader sends: per phase (verb + table) statements, rows written and seconds
+    report = {"phases": {}, "started": time.perf_counter(), "lock": threading.Lock()}
+    engine.simulation = report
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("simulation_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["simulation_start"].pop()
+        phase = statement_phase(statement)
+        rows = cursor.rowcount if cursor.rowcount and cursor.rowcount > 0 and not phase.startswith("SELECT") else 0
+        with report["lock"]:
+            entry = report["phases"].setdefault(phase, [0, 0, 0.0])
+            entry[0] += 1
+            entry[1] += rows
+            entry[2] += elapsed
+
+    return report
+
+
+def simulation_report(engine):
+    report = engine.simulation
+    with report["lock"]:
+        phases = {phase: {"statements": statements, "rows": rows, "seconds": round(seconds, 4)}
+                  for phase, (statements, rows, seconds) in sorted(report["phases"].items(), key=lambda item: -item[1][2])}
+    return {
+        "statements": sum(phase["statements"] for phase in phases.values()),
+        "rows": sum(phase["rows"] for phase in phases.values()),
+        "sql_seconds": round(sum(phase["seconds"] for phase in phases.values()), 4),
+        "wall_seconds": round(time.perf_counter() - report["started"], 4),
+        "phases": phases,
+    }
+
+
+def table_counts(engine, prefix):
+    with engine.connect() as conn:
+        tables = [row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+        return {name: conn.exec_driver_sql(f"SELECT COUNT(*) FROM {name}").scalar() for name in tables if name.startswith(f"{prefix}_")}
+
+
+def save_simulation_report(engine, prefix, path):
+    report = simulation_report(engine)
+    report["tables"] = table_counts(engine, prefix)
+    logger.info(f"Simulated load: {report['statements']} statement(s), {report['rows']} row(s) written, "
+                f"{report['sql_seconds']:.2f}s in SQL out of {report['wall_seconds']:.2f}s.")
+    for phase, entry in list(report["phases"].items())[:10]:
+        logger.info(f"  {phase}: {entry['statements']} statement(s), {entry['rows']} row(s), {entry['seconds']:.3f}s.")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Simulation report saved: {path}.")
+    return report
@@ -0,0 +1,48 @@
+-- SQLite stand-in for the NEW DB tables the loader (src/load.py, src/planner.py) writes or reads, only the columns it uses
+CREATE TABLE {prefix}_course (id INTEGER PRIMARY KEY AUTOINCREMENT, category INTEGER, sortorder INTEGER DEFAULT 0, fullname TEXT, shortname TEXT, idnumber TEXT, summary TEXT, summaryformat INTEGER DEFAULT 1, format TEXT, newsitems INTEGER DEFAULT 0, startdate INTEGER DEFAULT 0, enddate INTEGER DEFAULT 0, visible INTEGER DEFAULT 1, timecreated INTEGER DEFAULT 0, timemodified INTEGER DEFAULT 0, enablecompletion INTEGER DEFAULT 1, showcompletionconditions INTEGER);
+CREATE TABLE {prefix}_context (id INTEGER PRIMARY KEY AUTOINCREMENT, contextlevel INTEGER, instanceid INTEGER, path TEXT, depth INTEGER, locked INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_course_sections (id INTEGER PRIMARY KEY AUTOINCREMENT, course INTEGER, section INTEGER, name TEXT, summary TEXT, summaryformat INTEGER DEFAULT 1, sequence TEXT, visible INTEGER DEFAULT 1, availability TEXT, timemodified INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_modules (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, visible INTEGER DEFAULT 1);
+CREATE TABLE {prefix}_course_modules (id INTEGER PRIMARY KEY AUTOINCREMENT, course INTEGER, module INTEGER, instance INTEGER, section INTEGER, added INTEGER DEFAULT 0, score INTEGER DEFAULT 0, indent INTEGER DEFAULT 0, visible INTEGER DEFAULT 1, visibleold INTEGER DEFAULT 1, groupmode INTEGER DEFAULT 0, groupingid INTEGER DEFAULT 0, completion INTEGER DEFAULT 0, completiongradeitemnumber INTEGER, completionview INTEGER DEFAULT 0, completionexpected INTEGER DEFAULT 0, availability TEXT, showdescription INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_course_format_options (id INTEGER PRIMARY KEY AUTOINCREMENT, courseid INTEGER, format TEXT, sectionid INTEGER, name TEXT, value TEXT);
+CREATE TABLE {prefix}_page (id INTEGER PRIMARY KEY AUTOINCREMENT, course INTEGER, name TEXT, intro TEXT, introformat INTEGER DEFAULT 0, content TEXT, contentformat INTEGER DEFAULT 0, display INTEGER DEFAULT 0, displayoptions TEXT, revision INTEGER DEFAULT 0, timemodified INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_label (id INTEGER PRIMARY KEY AUTOINCREMENT, course INTEGER, name TEXT, intro TEXT, introformat INTEGER DEFAULT 0, timemodified INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_url (id INTEGER PRIMARY KEY AUTOINCREMENT, course INTEGER, name TEXT, intro TEXT, introformat INTEGER DEFAULT 0, externalurl TEXT, display INTEGER DEFAULT 0, displayoptions TEXT, parameters TEXT, timemodified INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_enrol (id INTEGER PRIMARY KEY AUTOINCREMENT, enrol TEXT, status INTEGER DEFAULT 0, courseid INTEGER, sortorder INTEGER DEFAULT 0, timecreated INTEGER DEFAULT 0, timemodified INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_quiz (id INTEGER PRIMARY KEY AUTOINCREMENT, course INTEGER, name TEXT, intro TEXT, introformat INTEGER DEFAULT 0, timelimit INTEGER DEFAULT 0, attempts INTEGER DEFAULT 0, sumgrades REAL DEFAULT 0, grade REAL DEFAULT 0, timecreated INTEGER DEFAULT 0, timemodified INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_quiz_slots (id INTEGER PRIMARY KEY AUTOINCREMENT, slot INTEGER, quizid INTEGER, page INTEGER, requireprevious INTEGER DEFAULT 0, maxmark REAL DEFAULT 0);
+CREATE TABLE {prefix}_quiz_sections (id INTEGER PRIMARY KEY AUTOINCREMENT, quizid INTEGER, firstslot INTEGER, heading TEXT, shufflequestions INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_forum (id INTEGER PRIMARY KEY AUTOINCREMENT, course INTEGER, type TEXT, name TEXT, intro TEXT, introformat INTEGER DEFAULT 0, timemodified INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_reengagement (id INTEGER PRIMARY KEY AUTOINCREMENT, course INTEGER, name TEXT, timecreated INTEGER DEFAULT 0, timemodified INTEGER DEFAULT 0, duration INTEGER DEFAULT 0, suppresstarget INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_choice (id INTEGER PRIMARY KEY AUTOINCREMENT, course INTEGER, name TEXT, intro TEXT, introformat INTEGER DEFAULT 0, timemodified INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_choice_options (id INTEGER PRIMARY KEY AUTOINCREMENT, choiceid INTEGER, text TEXT, maxanswers INTEGER DEFAULT 0, timemodified INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_feedback (id INTEGER PRIMARY KEY AUTOINCREMENT, course INTEGER, name TEXT, intro TEXT, introformat INTEGER DEFAULT 0, anonymous INTEGER DEFAULT 1, email_notification INTEGER DEFAULT 0, autonumbering INTEGER DEFAULT 0, page_after_submitformat INTEGER DEFAULT 0, timemodified INTEGER DEFAULT 0, completionsubmit INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_feedback_item (id INTEGER PRIMARY KEY AUTOINCREMENT, feedback INTEGER, template INTEGER, name TEXT, label TEXT, presentation TEXT, typ TEXT, hasvalue INTEGER DEFAULT 0, position INTEGER DEFAULT 0, required INTEGER DEFAULT 0, dependitem INTEGER DEFAULT 0, dependvalue TEXT, options TEXT);
+CREATE TABLE {prefix}_customcert (id INTEGER PRIMARY KEY AUTOINCREMENT, course INTEGER, templateid INTEGER, name TEXT, intro TEXT, introformat INTEGER DEFAULT 0, requiredtime INTEGER DEFAULT 0, verifyany INTEGER DEFAULT 0, deliveryoption TEXT, emailstudents INTEGER DEFAULT 0, emailteachers INTEGER DEFAULT 0, emailothers TEXT, protection TEXT, timecreated INTEGER DEFAULT 0, timemodified INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_customcert_templates (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, contextid INTEGER, timecreated INTEGER DEFAULT 0, timemodified INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_customcert_pages (id INTEGER PRIMARY KEY AUTOINCREMENT, templateid INTEGER, width INTEGER DEFAULT 0, height INTEGER DEFAULT 0, leftmargin INTEGER DEFAULT 0, rightmargin INTEGER DEFAULT 0, sequence INTEGER, timecreated INTEGER DEFAULT 0, timemodified INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_customcert_elements (id INTEGER PRIMARY KEY AUTOINCREMENT, pageid INTEGER, name TEXT, element TEXT, data TEXT, font TEXT, fontsize INTEGER DEFAULT 0, colour TEXT, posx INTEGER, posy INTEGER, width INTEGER, refpoint INTEGER, alignment TEXT, sequence INTEGER, timecreated INTEGER DEFAULT 0, timemodified INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_customfield_field (id INTEGER PRIMARY KEY AUTOINCREMENT, shortname TEXT, name TEXT, type TEXT, categoryid INTEGER, sortorder INTEGER DEFAULT 0, timecreated INTEGER DEFAULT 0, timemodified INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_customfield_data (id INTEGER PRIMARY KEY AUTOINCREMENT, fieldid INTEGER, instanceid INTEGER, intvalue INTEGER, decvalue REAL, shortcharvalue TEXT, charvalue TEXT, value TEXT, valueformat INTEGER DEFAULT 0, valuetrust INTEGER DEFAULT 0, timecreated INTEGER DEFAULT 0, timemodified INTEGER DEFAULT 0, contextid INTEGER);
+CREATE TABLE {prefix}_local_recompletion_config (id INTEGER PRIMARY KEY AUTOINCREMENT, course INTEGER, name TEXT, value TEXT);
+CREATE TABLE {prefix}_question_categories (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, contextid INTEGER, info TEXT, infoformat INTEGER DEFAULT 0, stamp TEXT, parent INTEGER DEFAULT 0, sortorder INTEGER DEFAULT 999, idnumber TEXT);
+CREATE TABLE {prefix}_question (id INTEGER PRIMARY KEY AUTOINCREMENT, parent INTEGER DEFAULT 0, name TEXT, questiontext TEXT, questiontextformat INTEGER DEFAULT 0, generalfeedback TEXT, generalfeedbackformat INTEGER DEFAULT 0, defaultmark REAL DEFAULT 1, penalty REAL DEFAULT 0, qtype TEXT, length INTEGER DEFAULT 1, stamp TEXT, timecreated INTEGER DEFAULT 0, timemodified INTEGER DEFAULT 0, createdby INTEGER, modifiedby INTEGER);
+CREATE TABLE {prefix}_question_answers (id INTEGER PRIMARY KEY AUTOINCREMENT, question INTEGER, answer TEXT, answerformat INTEGER DEFAULT 0, fraction REAL DEFAULT 0, feedback TEXT, feedbackformat INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_question_bank_entries (id INTEGER PRIMARY KEY AUTOINCREMENT, questioncategoryid INTEGER, idnumber TEXT, ownerid INTEGER);
+CREATE TABLE {prefix}_question_versions (id INTEGER PRIMARY KEY AUTOINCREMENT, questionbankentryid INTEGER, version INTEGER DEFAULT 1, questionid INTEGER, status TEXT);
+CREATE TABLE {prefix}_question_references (id INTEGER PRIMARY KEY AUTOINCREMENT, usingcontextid INTEGER, component TEXT, questionarea TEXT, itemid INTEGER, questionbankentryid INTEGER, version INTEGER);
+CREATE TABLE {prefix}_qtype_ddimageortext (id INTEGER PRIMARY KEY AUTOINCREMENT, questionid INTEGER, shuffleanswers INTEGER DEFAULT 1);
+CREATE TABLE {prefix}_qtype_ddimageortext_drags (id INTEGER PRIMARY KEY AUTOINCREMENT, questionid INTEGER, no INTEGER, label TEXT);
+CREATE TABLE {prefix}_qtype_ddimageortext_drops (id INTEGER PRIMARY KEY AUTOINCREMENT, questionid INTEGER, no INTEGER, xleft INTEGER, ytop INTEGER, choice INTEGER);
+CREATE TABLE {prefix}_qtype_ddmarker (id INTEGER PRIMARY KEY AUTOINCREMENT, questionid INTEGER, shuffleanswers INTEGER DEFAULT 1);
+CREATE TABLE {prefix}_qtype_ddmarker_drags (id INTEGER PRIMARY KEY AUTOINCREMENT, questionid INTEGER, no INTEGER, label TEXT);
+CREATE TABLE {prefix}_qtype_ddmarker_drops (id INTEGER PRIMARY KEY AUTOINCREMENT, questionid INTEGER, no INTEGER, shape TEXT, coords TEXT, choice INTEGER);
+CREATE TABLE {prefix}_qtype_essay_options (id INTEGER PRIMARY KEY AUTOINCREMENT, questionid INTEGER, responseformat TEXT, responsefieldlines INTEGER DEFAULT 15);
+CREATE TABLE {prefix}_qtype_match_options (id INTEGER PRIMARY KEY AUTOINCREMENT, questionid INTEGER, shuffleanswers INTEGER DEFAULT 1);
+CREATE TABLE {prefix}_qtype_match_subquestions (id INTEGER PRIMARY KEY AUTOINCREMENT, questionid INTEGER, questiontext TEXT, answertext TEXT);
+CREATE TABLE {prefix}_qtype_multichoice_options (id INTEGER PRIMARY KEY AUTOINCREMENT, questionid INTEGER, layout INTEGER DEFAULT 0, single INTEGER DEFAULT 1, shuffleanswers INTEGER DEFAULT 1, answernumbering TEXT);
+CREATE TABLE {prefix}_qtype_randomsamatch_options (id INTEGER PRIMARY KEY AUTOINCREMENT, questionid INTEGER, choose INTEGER DEFAULT 4);
+CREATE TABLE {prefix}_qtype_shortanswer_options (id INTEGER PRIMARY KEY AUTOINCREMENT, questionid INTEGER, usecase INTEGER DEFAULT 0);
+CREATE TABLE {prefix}_question_ddwtos (id INTEGER PRIMARY KEY AUTOINCREMENT, questionid INTEGER, shuffleanswers INTEGER DEFAULT 1);
+CREATE TABLE {prefix}_question_gapselect (id INTEGER PRIMARY KEY AUTOINCREMENT, questionid INTEGER, shuffleanswers INTEGER DEFAULT 1);
+CREATE TABLE {prefix}_question_truefalse (id INTEGER PRIMARY KEY AUTOINCREMENT, question INTEGER, trueanswer INTEGER, falseanswer INTEGER, showstandardinstruction INTEGER DEFAULT 0);
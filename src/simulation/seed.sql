@@ -0,0 +1,10 @@
+-- NEW DB reference rows the loader reads (src/reference.py): modules, system + category contexts, customcert templates,
+-- feedback item templates and course custom fields; ids match the ones the loader expects from the production NEW DB
+INSERT INTO {prefix}_modules (id, name) VALUES (1, 'assign'), (5, 'choice'), (7, 'feedback'), (8, 'folder'), (9, 'forum'), (13, 'label'), (16, 'page'), (17, 'quiz'), (18, 'resource'), (21, 'url'), (27, 'hvp'), (29, 'customcert'), (30, 'reengagement');
+INSERT INTO {prefix}_context (id, contextlevel, instanceid, path, depth) VALUES (1, 10, 0, '/1', 1);
+INSERT INTO {prefix}_context (id, contextlevel, instanceid, path, depth) VALUES (2, 40, 1, '/1/2', 2), (5, 40, 4, '/1/5', 2), (7, 40, 6, '/1/7', 2), (11, 40, 10, '/1/11', 2), (12, 40, 11, '/1/12', 2), (13, 40, 12, '/1/13', 2), (14, 40, 13, '/1/14', 2), (15, 40, 14, '/1/15', 2), (17, 40, 16, '/1/17', 2), (18, 40, 17, '/1/18', 2), (21, 40, 20, '/1/21', 2), (22, 40, 21, '/1/22', 2);
+INSERT INTO {prefix}_customcert_templates (id, name, contextid) VALUES (2, 'default_ptbr', 1), (15, 'default_en', 1), (237, 'antigo_vertical', 1), (238, 'dica', 1), (239, 'galaxia_maritima', 1), (240, 'galaxia_navegacao', 1), (241, 'rvelasquez', 1);
+INSERT INTO {prefix}_customcert_pages (id, templateid, width, height, sequence) VALUES (3, 2, 297, 210, 1), (10, 2, 297, 210, 2), (222, 15, 297, 210, 1), (223, 15, 297, 210, 2), (679, 237, 297, 210, 1), (680, 238, 297, 210, 1), (681, 238, 297, 210, 2), (682, 239, 297, 210, 1), (683, 239, 297, 210, 2), (684, 240, 297, 210, 1), (685, 240, 297, 210, 2), (686, 241, 297, 210, 1), (687, 241, 297, 210, 2);
+INSERT INTO {prefix}_customcert_elements (id, pageid, name, element, data, font, fontsize, colour, posx, posy, width, refpoint, alignment, sequence) VALUES (1000, 3, 'Background', 'bgimage', '{"width":297,"height":210}', NULL, 0, NULL, 0, 0, 0, 0, 'L', 1), (1001, 3, 'Student name', 'studentname', NULL, 'helvetica', 16, '#000000', 148, 90, 0, 1, 'C', 2), (1002, 10, 'Background', 'bgimage', '{"width":297,"height":210}', NULL, 0, NULL, 0, 0, 0, 0, 'L', 1), (1003, 10, 'Student name', 'studentname', NULL, 'helvetica', 16, '#000000', 148, 90, 0, 1, 'C', 2), (1004, 222, 'Background', 'bgimage', '{"width":297,"height":210}', NULL, 0, NULL, 0, 0, 0, 0, 'L', 1), (1005, 222, 'Student name', 'studentname', NULL, 'helvetica', 16, '#000000', 148, 90, 0, 1, 'C', 2), (1006, 223, 'Background', 'bgimage', '{"width":297,"height":210}', NULL, 0, NULL, 0, 0, 0, 0, 'L', 1), (1007, 223, 'Student name', 'studentname', NULL, 'helvetica', 16, '#000000', 148, 90, 0, 1, 'C', 2), (1008, 679, 'Background', 'bgimage', '{"width":297,"height":210}', NULL, 0, NULL, 0, 0, 0, 0, 'L', 1), (1009, 679, 'Student name', 'studentname', NULL, 'helvetica', 16, '#000000', 148, 90, 0, 1, 'C', 2), (1010, 680, 'Background', 'bgimage', '{"width":297,"height":210}', NULL, 0, NULL, 0, 0, 0, 0, 'L', 1), (1011, 680, 'Student name', 'studentname', NULL, 'helvetica', 16, '#000000', 148, 90, 0, 1, 'C', 2), (1012, 681, 'Background', 'bgimage', '{"width":297,"height":210}', NULL, 0, NULL, 0, 0, 0, 0, 'L', 1), (1013, 681, 'Student name', 'studentname', NULL, 'helvetica', 16, '#000000', 148, 90, 0, 1, 'C', 2), (1014, 682, 'Background', 'bgimage', '{"width":297,"height":210}', NULL, 0, NULL, 0, 0, 0, 0, 'L', 1), (1015, 682, 'Student name', 'studentname', NULL, 'helvetica', 16, '#000000', 148, 90, 0, 1, 'C', 2), (1016, 683, 'Background', 'bgimage', '{"width":297,"height":210}', NULL, 0, NULL, 0, 0, 0, 0, 'L', 1), (1017, 683, 'Student name', 'studentname', NULL, 'helvetica', 16, '#000000', 148, 90, 0, 1, 'C', 2), (1018, 684, 'Background', 'bgimage', '{"width":297,"height":210}', NULL, 0, NULL, 0, 0, 0, 0, 'L', 1), (1019, 684, 'Student name', 'studentname', NULL, 'helvetica', 16, '#000000', 148, 90, 0, 1, 'C', 2), (1020, 685, 'Background', 'bgimage', '{"width":297,"height":210}', NULL, 0, NULL, 0, 0, 0, 0, 'L', 1), (1021, 685, 'Student name', 'studentname', NULL, 'helvetica', 16, '#000000', 148, 90, 0, 1, 'C', 2), (1022, 686, 'Background', 'bgimage', '{"width":297,"height":210}', NULL, 0, NULL, 0, 0, 0, 0, 'L', 1), (1023, 686, 'Student name', 'studentname', NULL, 'helvetica', 16, '#000000', 148, 90, 0, 1, 'C', 2), (1024, 687, 'Background', 'bgimage', '{"width":297,"height":210}', NULL, 0, NULL, 0, 0, 0, 0, 'L', 1), (1025, 687, 'Student name', 'studentname', NULL, 'helvetica', 16, '#000000', 148, 90, 0, 1, 'C', 2);
+INSERT INTO {prefix}_feedback_item (id, feedback, template, name, label, presentation, typ, hasvalue, position, required, dependitem, dependvalue, options) VALUES (1, 0, 2, 'Question 1', 'q1', 'r>>>>>1|2|3|4|5', 'multichoice', 1, 1, 1, 0, '', ''), (2, 0, 2, 'Question 2', 'q2', 'r>>>>>1|2|3|4|5', 'multichoice', 1, 2, 1, 0, '', ''), (3, 0, 2, 'Question 3', 'q3', 'r>>>>>1|2|3|4|5', 'multichoice', 1, 3, 1, 0, '', ''), (4, 0, 4, 'Question 1', 'q1', 'r>>>>>1|2|3|4|5', 'multichoice', 1, 1, 1, 0, '', ''), (5, 0, 4, 'Question 2', 'q2', 'r>>>>>1|2|3|4|5', 'multichoice', 1, 2, 1, 0, '', ''), (6, 0, 4, 'Question 3', 'q3', 'r>>>>>1|2|3|4|5', 'multichoice', 1, 3, 1, 0, '', '');
+INSERT INTO {prefix}_customfield_field (id, shortname, name, type, categoryid, sortorder) VALUES (1, 'workload', 'Carga horária', 'text', 7, 1), (2, 'modality', 'Modalidade', 'select', 7, 2);
@@ -4,6 +4,7 @@ import html
 import pandas as pd
 from sqlalchemy import text
 from src.logging import start
+from src.metrics import measure
 
 logger = start()
 
@@ -116,21 +117,29 @@ def transform(dataframes):
 
     if "page" in dataframes:
         try:
-            dataframes["page"] = transform_page(dataframes["page"])
+            with measure("transform", "transform_page", len(dataframes["page"])) as metric:
+                dataframes["page"] = transform_page(dataframes["page"])
+                metric.rows_out = len(dataframes["page"])
         except Exception as e:
             logger.error(f"Error transforming PAGE: {e}.")
         
-    dataframes = transform_sections(dataframes)
+    with measure("transform", "transform_sections", len(dataframes.get("course_sections", []))) as metric:
+        dataframes = transform_sections(dataframes)
+        metric.rows_out = len(dataframes.get("course_sections", []))
 
     if "quiz" in dataframes:
         try:
-            dataframes["quiz"] = transform_quiz(dataframes["quiz"])
+            with measure("transform", "transform_quiz", len(dataframes["quiz"])) as metric:
+                dataframes["quiz"] = transform_quiz(dataframes["quiz"])
+                metric.rows_out = len(dataframes["quiz"])
         except Exception as e:
             logger.error(f"Error transforming QUIZ: {e}")
     
     if "reengagement" in dataframes:
         try:
-            dataframes["reengagement"] = transform_reengagement(dataframes["reengagement"])
+            with measure("transform", "transform_reengagement", len(dataframes["reengagement"])) as metric:
+                dataframes["reengagement"] = transform_reengagement(dataframes["reengagement"])
+                metric.rows_out = len(dataframes["reengagement"])
         except Exception as e:
             logger.error(f"Error transforming REENGAGEMENT: {e}")
 
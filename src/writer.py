@@ -0,0 +1,269 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import pandas as pd
+from sqlalchemy import text, table, column
+from src.logging import start
+from src.metrics import record
+
+
+logger = start()
+
+# placeholders per INSERT statement, well under MySQL's 65535 (and SQLite's 32766) bind parameter limits
+MAX_PARAMS_PER_INSERT = 10000
+# tables with at least this many rows are written with LOAD DATA LOCAL INFILE (0 turns the fast path off)
+INFILE_MIN_ROWS = int(os.getenv("LOAD_INFILE_MIN_ROWS", "10000"))
+# LOAD_WRITER: "auto" or one of STRATEGIES, for every table or per table ("question_answers=multirow,qtype_match_subquestions=prepared,default=auto")
+# auto: LOAD DATA from INFILE_MIN_ROWS rows on, else the first frame of a table with LOAD_WRITER_PROBE_ROWS+ rows is split between the
+# strategies and the fastest one (rows/s) is kept for that table for the rest of the run, "multirow" until then
+PROBE_MIN_ROWS = int(os.getenv("LOAD_WRITER_PROBE_ROWS", "2000"))
+PROBE_STRATEGIES = ["executemany", "multirow", "prepared"]
+
+chosen = {}  # table -> strategy picked by the probe, shared by every course and load worker
+timings = {}  # (table, strategy) -> [calls, rows, seconds]
+lock = threading.Lock()
+
+
+def get_writer_config(value):
+    if not value or "=" not in value:
+        return {"default": value or "auto"}
+    config = {}
+    for item in value.split(","):
+        table_name, strategy = item.split("=")
+        config[table_name.strip()] = strategy.strip()
+    return config
+
+
+WRITER_CONFIG = get_writer_config(os.getenv("LOAD_WRITER", "auto"))
+
+
+def configured_strategy(table_name):
+    for key, strategy in WRITER_CONFIG.items():
+        if key != "default" and (table_name == key or table_name.endswith(f"_{key}")):
+            return strategy
+    return WRITER_CONFIG.get("default", "auto")
+
+
+def frame_records(df):
+    # plain Python values (no numpy scalars, NaN/NA -> NULL) for the DBAPI
+    df = df.astype(object)
+    return df.where(pd.notnull(df), None).to_dict("records")
+
+
+def infile_enabled(conn):
+    # LOAD DATA LOCAL INFILE needs MySQL with local_infile=ON and a client allowed to send files (connect_args={"local_infile": True})
+    if "local_infile" in conn.info:
+        return conn.info["local_infile"]
+    enabled = False
+    if conn.dialect.name == "mysql":
+        try:
+            enabled = int(conn.execute(text("SELECT @@local_infile")).scalar()) == 1
+        except Exception as e:
+            logger.warning(f"Could not read @@local_infile, LOAD DATA LOCAL INFILE disabled: {e}")
+        if not enabled:
+            logger.warning("Server has local_infile=OFF, large tables are written with INSERTs.")
+    conn.info["local_infile"] = enabled
+    return enabled
+
+
+def max_packet(conn):
+    # bytes one statement may take (MySQL max_allowed_packet), None when the server has no such limit
+    if "max_allowed_packet" not in conn.info:
+        packet = None
+        if conn.dialect.name == "mysql":
+            packet = int(conn.execute(text("SELECT @@max_allowed_packet")).scalar())
+            logger.info(f"max_allowed_packet = {packet} bytes, multi-row INSERTs are sized under half of it.")
+        conn.info["max_allowed_packet"] = packet
+    return conn.info["max_allowed_packet"]
+
+
+def rows_per_statement(conn, records, columns):
+    rows = max(1, MAX_PARAMS_PER_INSERT // max(1, len(columns)))
+    packet = max_packet(conn)
+    if packet and records:
+        sample = records[:200]
+        # rough size of a rendered row (quotes, commas, escapes), with a 2x margin
+        row_bytes = 2 * sum(len(str(value)) + 4 for record in sample for value in record.values()) / len(sample)
+        rows = min(rows, max(1, int(packet // 2 // max(1.0, row_bytes))))
+    return rows
+
+
+def insert_multirow(conn, table_name, df):
+    # multi-row INSERTs of `df`, returns the first id of every statement with its row count
+    columns = list(df.columns)
+    statement_table = table(table_name, *[column(name) for name in columns])
+    records = frame_records(df)
+    step = rows_per_statement(conn, records, columns)
+    batches = []
+    for start_row in range(0, len(records), step):
+        batch = records[start_row:start_row + step]
+        result = conn.execute(statement_table.insert().values(batch))
+        first_id = result.lastrowid
+        if conn.dialect.name == "sqlite":
+            first_id = first_id - len(batch) + 1  # SQLite reports the last rowid, MySQL the first one
+        batches.append((first_id, len(batch)))
+    return batches
+
+
+def insert_executemany(conn, table_name, df):
+    # pandas' default: one INSERT executed for every row (the DBAPI may batch it)
+    df.to_sql(table_name, conn, if_exists="append", index=False)
+
+
+def insert_prepared(conn, table_name, df):
+    # PyMySQL has no server-side prepared statements: the INSERT is rendered once per table/columns in the driver's paramstyle and
+    # reused through the raw DBAPI executemany, skipping the pandas/SQLAlchemy per-call compilation
+    columns = list(df.columns)
+    key = (conn.dialect.name, table_name, tuple(columns))
+    statement = conn.info.setdefault("prepared", {}).get(key)
+    if statement is None:
+        placeholder = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+        statement = f"INSERT INTO {table_name} ({', '.join(f'`{name}`' for name in columns)}) VALUES ({', '.join([placeholder] * len(columns))})"
+        conn.info["prepared"][key] = statement
+    conn.exec_driver_sql(statement, [tuple(record.values()) for record in frame_records(df)])
+
+
+def tsv_value(value):
+    # LOAD DATA defaults: \N is NULL, backslash escapes tabs, newlines and itself
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return "\\N"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r").replace("\0", "\\0")
+
+
+def load_infile(conn, table_name, df):
+    # stages `df` in a temporary TSV and loads it with one LOAD DATA LOCAL INFILE
+    columns = list(df.columns)
+    handle, path = tempfile.mkstemp(prefix=f"{table_name}_", suffix=".tsv")
+    try:
+        with os.fdopen(handle, "w", encoding="utf-8", newline="") as staging:
+            for row in df.astype(object).itertuples(index=False, name=None):
+                staging.write("\t".join(tsv_value(value) for value in row) + "\n")
+        local_path = path.replace("\\", "/").replace("'", "\\'")
+        result = conn.exec_driver_sql(
+            f"LOAD DATA LOCAL INFILE '{local_path}' INTO TABLE {table_name} CHARACTER SET utf8mb4 "
+            f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+            f"({', '.join(f'`{name}`' for name in columns)})"
+        )
+        # LOCAL makes LOAD DATA behave as IGNORE: duplicate keys are skipped and bad values truncated with a warning, not an error
+        problems = [row for row in conn.exec_driver_sql("SHOW WARNINGS").fetchall() if row[0] in ("Warning", "Error")]
+        if result.rowcount != len(df) or problems:
+            details = "; ".join(f"{level} {code}: {message}" for level, code, message in problems[:3])
+            raise ValueError(f"LOAD DATA LOCAL INFILE wrote {result.rowcount} of {len(df)} row(s) to {table_name} with {len(problems)} warning(s)"
+                             f"{': ' + details if details else ''}")
+    finally:
+        os.remove(path)
+
+
+STRATEGIES = {
+    "executemany": insert_executemany,
+    "multirow": insert_multirow,
+    "prepared": insert_prepared,
+    "infile": load_infile,
+}
+
+
+def use_infile(conn, rows):
+    return bool(INFILE_MIN_ROWS) and rows >= INFILE_MIN_ROWS and infile_enabled(conn)
+
+
+def timed_write(conn, table_name, df, strategy):
+    start_time = time.perf_counter()
+    result = STRATEGIES[strategy](conn, table_name, df)
+    elapsed = time.perf_counter() - start_time
+    with lock:
+        entry = timings.setdefault((table_name, strategy), [0, 0, 0.0])
+        entry[0] += 1
+        entry[1] += len(df)
+        entry[2] += elapsed
+    record("load", table_name, elapsed, rows_out=len(df))
+    logger.debug(f"{len(df)} row(s) written to {table_name} with {strategy} in {elapsed:.3f}s ({len(df) / elapsed if elapsed else 0:.0f} rows/s).")
+    return result, elapsed
+
+
+def probe(conn, table_name, df):
+    # the frame is split in one slice per strategy, every slice is real data so nothing is written twice
+    # - every slice is written inside a SAVEPOINT: a strategy that fails leaves nothing behind, its slice is written again with
+    #   multirow and the strategy is not a candidate (a multirow error is raised, the frame is then the caller's to roll back)
+    candidates = PROBE_STRATEGIES + (["infile"] if infile_enabled(conn) else [])
+    step = -(-len(df) // len(candidates))
+    rates = {}
+    for number, strategy in enumerate(candidates):
+        part = df.iloc[number * step:(number + 1) * step]
+        if part.empty:
+            continue
+        savepoint = conn.begin_nested()
+        try:
+            _, elapsed = timed_write(conn, table_name, part, strategy)
+            savepoint.commit()
+        except Exception as e:
+            savepoint.rollback()
+            if strategy == "multirow":
+                raise
+            logger.warning(f"Writer probe for {table_name}: {strategy} failed ({e}), its {len(part)} row(s) are written with multirow.")
+            timed_write(conn, table_name, part, "multirow")
+            continue
+        rates[strategy] = len(part) / elapsed if elapsed else float("inf")
+    best = max(rates, key=rates.get)
+    with lock:
+        chosen.setdefault(table_name, best)
+    logger.info(f"Writer probe for {table_name}: {', '.join(f'{name} {rate:.0f} rows/s' for name, rate in rates.items())} -> {best}.")
+
+
+def append_rows(conn, table_name, df):
+    # append `df` to `table_name` with its configured (or probed) strategy
+    if df.empty:
+        return
+    strategy = configured_strategy(table_name)
+    if strategy == "auto":
+        if use_infile(conn, len(df)):
+            strategy = "infile"
+        elif table_name in chosen:
+            strategy = chosen[table_name]
+        elif PROBE_MIN_ROWS and len(df) >= PROBE_MIN_ROWS:
+            probe(conn, table_name, df)
+            return
+        else:
+            strategy = "multirow"
+    elif strategy == "infile" and not infile_enabled(conn):
+        strategy = "multirow"
+    timed_write(conn, table_name, df, strategy)
+
+
+def insert_rows(conn, table_name, df):
+    # INSERTs that need their auto-increment ids back: always multi-row, timed with the rest
+    return timed_write(conn, table_name, df, "multirow")[0]
+
+
+def writer_timings():
+    # per strategy totals and per table detail, fastest strategy first
+    with lock:
+        items = [(table_name, strategy, calls, rows, seconds) for (table_name, strategy), (calls, rows, seconds) in timings.items()]
+    strategies = {}
+    for _, strategy, calls, rows, seconds in items:
+        total = strategies.setdefault(strategy, {"calls": 0, "rows": 0, "seconds": 0.0})
+        total["calls"] += calls
+        total["rows"] += rows
+        total["seconds"] += seconds
+    for total in strategies.values():
+        total["rows_per_second"] = round(total["rows"] / total["seconds"], 1) if total["seconds"] else None
+    return {
+        "strategies": dict(sorted(strategies.items(), key=lambda item: -(item[1]["rows_per_second"] or 0))),
+        "tables": [{"table": table_name, "strategy": strategy, "calls": calls, "rows": rows, "seconds": round(seconds, 4),
+                    "rows_per_second": round(rows / seconds, 1) if seconds else None} for table_name, strategy, calls, rows, seconds in sorted(items)],
+        "probed": dict(chosen),
+    }
+
+
+def save_writer_timings(path):
+    report = writer_timings()
+    for strategy, total in report["strategies"].items():
+        logger.info(f"Writer '{strategy}': {total['rows']} row(s) in {total['calls']} call(s), {total['seconds']:.2f}s ({total['rows_per_second']} rows/s).")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    logger.info(f"Writer timings saved: {os.path.basename(path)}.")